@@ -1,2 +1,4 @@
 # -*- coding: utf-8 -*-
 __version__ = '3.0.3'
+
+default_app_config = 'aldryn_forms.apps.AldrynFormsConfig'
@@ -1,9 +1,23 @@
 # -*- coding: utf-8 -*-
+import copy
 import logging
+import threading
+from functools import partial
 
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections, transaction
+from django.utils import timezone, translation
 from django.utils.translation import ugettext_lazy as _
 
 from .action_backends_base import BaseAction
+from .spool import get_spool, serialize_submission
+from .webhooks import check_requests, deliver, get_submission_payload
+
+try:
+    from concurrent.futures import ThreadPoolExecutor, wait
+except ImportError:
+    # python 2 without the futures backport
+    ThreadPoolExecutor = None
 
 logger = logging.getLogger(__name__)
 
@@ -15,7 +29,31 @@ class DefaultAction(BaseAction):
         recipients = cmsplugin.send_notifications(instance, form)
         form.instance.set_recipients(recipients)
         form.save()
-        cmsplugin.send_success_message(instance, request)
+
+        if request is not None:
+            cmsplugin.send_success_message(instance, request)
+
+
+class BufferedAction(BaseAction):
+    """
+    Like the default action, but appends the submission to the local spool
+    stored in the database by the flush_form_submissions command.
+    The submission is appended once the request transaction is committed.
+    """
+    verbose_name = _('Default (buffered)')
+
+    def __init__(self):
+        get_spool()
+
+    def form_valid(self, cmsplugin, instance, request, form):
+        recipients = cmsplugin.send_notifications(instance, form)
+        form.instance.set_recipients(recipients)
+        form.instance.set_form_data(form)
+        form.instance.sent_at = timezone.now()
+        transaction.on_commit(partial(get_spool().append, serialize_submission(form.instance)))
+
+        if request is not None:
+            cmsplugin.send_success_message(instance, request)
 
 
 class EmailAction(BaseAction):
@@ -32,3 +70,189 @@ class NoAction(BaseAction):
     def form_valid(self, cmsplugin, instance, request, form):
         form_id = form.form_plugin.id
         logger.info('Not persisting data for "{}" since action_backend is set to "none"'.format(form_id))
+
+
+class SaveAction(BaseAction):
+    verbose_name = _('Save only')
+
+    def form_valid(self, cmsplugin, instance, request, form):
+        form.save()
+
+
+class WebhookAction(BaseAction):
+    """
+    Stores the submitted fields for the send_form_webhooks command
+    to post to the urls in ALDRYN_FORMS_WEBHOOK_URLS,
+    doesn't store the submission.
+    """
+    verbose_name = _('Webhook')
+
+    def __init__(self):
+        check_requests()
+
+    def form_valid(self, cmsplugin, instance, request, form):
+        deliver(get_submission_payload(form))
+
+
+class Stage(object):
+    """
+    A step of a PipelineAction running the action backends
+    with the given keys of ``ALDRYN_FORMS_ACTION_BACKENDS``.
+
+    Stages run after commit are run on a thread pool, their backends
+    concurrently when ``parallel`` is set, and are waited for
+    up to ``timeout`` seconds. The timeout doesn't cancel the backends,
+    they keep running and occupying their threads. Other stages run
+    in the request transaction, one backend after another.
+    """
+
+    def __init__(self, backends, parallel=False, after_commit=False, timeout=10):
+        if parallel and not after_commit:
+            raise ImproperlyConfigured('Only stages run after commit can run their backends in parallel.')
+
+        self.backends = list(backends)
+        self.parallel = parallel
+        self.after_commit = after_commit
+        self.timeout = timeout
+
+
+class PipelineAction(BaseAction):
+    """
+    Runs other action backends in stages, for example::
+
+        class SubmissionPipeline(PipelineAction):
+            verbose_name = 'Save, then notify'
+            stages = [
+                Stage(['save_only']),
+                Stage(['email_only', 'webhook'], parallel=True, after_commit=True, timeout=10),
+            ]
+
+    A failing backend is logged and doesn't stop the other backends.
+    The backends get no request, the pipeline sends the success message
+    in the request thread. Stages run after commit get a copy of the form
+    taken once the transaction is committed.
+    When all threads are busy and ``queue_size`` tasks are already waiting
+    for one, the backends of further stages run after commit are skipped
+    and logged as errors.
+    """
+    stages = []
+    # threads shared by the submissions processed by the pipeline
+    max_workers = 4
+    queue_size = 16
+
+    def __init__(self):
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        # taken by every task until it's finished, including the timed out ones
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.queue_size)
+
+    def get_stages(self):
+        from .utils import get_action_backends
+
+        backends = get_action_backends()
+
+        for stage in self.stages:
+            for key in stage.backends:
+                if key not in backends:
+                    raise ImproperlyConfigured(
+                        'The "{}" action backend of {} is not configured.'.format(key, type(self).__name__)
+                    )
+        return self.stages
+
+    def get_executor(self):
+        if ThreadPoolExecutor is None:
+            return None
+
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    def form_valid(self, cmsplugin, instance, request, form):
+        for stage in self.get_stages():
+            if stage.after_commit:
+                transaction.on_commit(partial(self.run_stage_after_commit, stage, cmsplugin, instance, form))
+            else:
+                self.run_stage(stage, cmsplugin, instance, form)
+        cmsplugin.send_success_message(instance, request)
+
+    def get_form_snapshot(self, form):
+        """
+        Returns a copy of the form for the backends run after commit,
+        detached from the request and from the form rendered by it.
+        """
+        snapshot = copy.copy(form)
+        snapshot.request = None
+        snapshot.cleaned_data = dict(form.cleaned_data)
+        snapshot.instance = copy.copy(form.instance)
+        return snapshot
+
+    def run_stage(self, stage, cmsplugin, instance, form):
+        for key in stage.backends:
+            self.run_backend(key, cmsplugin, instance, form)
+
+    def run_stage_after_commit(self, stage, cmsplugin, instance, form):
+        executor = self.get_executor()
+
+        if executor is None:
+            self.run_stage(stage, cmsplugin, instance, self.get_form_snapshot(form))
+            return
+
+        if stage.parallel:
+            tasks = [[key] for key in stage.backends]
+        else:
+            tasks = [stage.backends]
+
+        # the threads don't inherit the active language of the request
+        language = translation.get_language()
+        futures = {}
+
+        for keys in tasks:
+            if not self._slots.acquire(False):
+                logger.error(
+                    'Action backends %s were skipped for form %s, the pipeline queue is full.',
+                    ', '.join(keys),
+                    form.form_plugin.pk,
+                )
+                continue
+
+            try:
+                snapshot = self.get_form_snapshot(form)
+                task = executor.submit(self.run_backend_in_thread, keys, language, cmsplugin, instance, snapshot)
+                futures[task] = keys
+            except Exception:
+                self._slots.release()
+                raise
+
+        done, not_done = wait(futures, timeout=stage.timeout)
+
+        if not_done:
+            # the threads can't be stopped, the backends keep running
+            logger.warning(
+                'Action backends %s did not finish within %s seconds.',
+                ', '.join(key for future in not_done for key in futures[future]),
+                stage.timeout,
+            )
+
+    def run_backend(self, key, cmsplugin, instance, form):
+        from .utils import get_action_backend
+
+        try:
+            # the savepoint keeps the transaction usable when the backend fails
+            with transaction.atomic():
+                get_action_backend(key).form_valid(cmsplugin, instance, None, form)
+        except Exception:  # noqa
+            logger.exception('Action backend "%s" failed for form %s.', key, form.form_plugin.pk)
+            return False
+        return True
+
+    def run_backend_in_thread(self, keys, language, cmsplugin, instance, form):
+        try:
+            with translation.override(language):
+                for key in keys:
+                    self.run_backend(key, cmsplugin, instance, form)
+        finally:
+            # the connections of this thread would be left open otherwise
+            for connection in connections.all():
+                connection.close()
+            self._slots.release()
@@ -1,16 +1,167 @@
 # -*- coding: utf-8 -*-
 from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.core.urlresolvers import reverse
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.html import format_html
+from django.utils.translation import ugettext_lazy as _
 
-from ..models import FormSubmission
+from ..models import ExportJob, FormSubmission, OutboxMessage, WebhookDelivery
 from .base import BaseFormSubmissionAdmin
-from .views import FormExportWizardView
+from .views import FormExportWizardView, mimetype_map
 
 
 class FormSubmissionAdmin(BaseFormSubmissionAdmin):
     readonly_fields = BaseFormSubmissionAdmin.readonly_fields + ['form_url']
 
     def get_form_export_view(self):
-        return FormExportWizardView.as_view(admin=self, file_type='xls')
+        return FormExportWizardView.as_view(admin=self, file_type='xlsx')
+
+
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ['subject', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at']
+    list_filter = ['status']
+    readonly_fields = [
+        'subject',
+        'body',
+        'from_email',
+        'to',
+        'cc',
+        'bcc',
+        'reply_to',
+        'status',
+        'attempts',
+        'next_attempt_at',
+        'last_error',
+        'created_at',
+        'sent_at',
+    ]
+    exclude = ['headers', 'alternatives']
+    actions = ['retry_messages']
+
+    def has_add_permission(self, request):
+        return False
+
+    def retry_messages(self, request, queryset):
+        queryset.exclude(status=OutboxMessage.STATUS_SENT).update(
+            status=OutboxMessage.STATUS_PENDING,
+            attempts=0,
+            next_attempt_at=timezone.now(),
+        )
+    retry_messages.short_description = _('Retry sending the selected messages')
+
+
+class WebhookDeliveryAdmin(admin.ModelAdmin):
+    list_display = ['url', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at']
+    list_filter = ['status']
+    readonly_fields = [
+        'url',
+        'payload',
+        'status',
+        'attempts',
+        'next_attempt_at',
+        'last_error',
+        'created_at',
+        'sent_at',
+    ]
+    actions = ['retry_deliveries']
+
+    def has_add_permission(self, request):
+        return False
+
+    def retry_deliveries(self, request, queryset):
+        queryset.exclude(status=WebhookDelivery.STATUS_SENT).update(
+            status=WebhookDelivery.STATUS_PENDING,
+            attempts=0,
+            next_attempt_at=timezone.now(),
+        )
+    retry_deliveries.short_description = _('Retry posting the selected submissions')
+
+
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = [
+        'filename',
+        'status',
+        'get_progress_display',
+        'created_by',
+        'created_at',
+        'finished_at',
+        'get_download_link',
+    ]
+    list_filter = ['status']
+    readonly_fields = [
+        'filename',
+        'form_name',
+        'language',
+        'from_date',
+        'to_date',
+        'file_type',
+        'status',
+        'get_progress_display',
+        'get_download_link',
+        'error',
+        'created_by',
+        'created_at',
+        'started_at',
+        'finished_at',
+    ]
+    exclude = ['fields', 'total', 'processed', 'result', 'attempts', 'lease_expires_at']
+    actions = ['retry_jobs']
+
+    def has_add_permission(self, request):
+        return False
+
+    def get_progress_display(self, obj):
+        return u'{}% ({} / {})'.format(obj.progress, obj.processed, obj.total)
+    get_progress_display.short_description = _('progress')
+
+    def get_download_link(self, obj):
+        if obj.status != ExportJob.STATUS_DONE or not obj.result:
+            return ''
+        url = reverse('admin:aldryn_forms_exportjob_download', args=[obj.pk])
+        return format_html(u'<a href="{}">{}</a>', url, _('Download'))
+    get_download_link.short_description = _('download')
+
+    def get_urls(self):
+        from django.conf.urls import url
+
+        url_patterns = [
+            url(
+                r'^(?P<job_id>\d+)/download/$',
+                self.admin_site.admin_view(self.download_view),
+                name='aldryn_forms_exportjob_download',
+            ),
+        ]
+        return url_patterns + super(ExportJobAdmin, self).get_urls()
+
+    def download_view(self, request, job_id):
+        # the export storage isn't served publicly as the exports contain personal data
+        if not self.has_change_permission(request):
+            raise PermissionDenied
+
+        job = get_object_or_404(ExportJob, pk=job_id, status=ExportJob.STATUS_DONE)
+
+        if not job.result:
+            raise Http404
+
+        content_type = mimetype_map.get(job.file_type, 'application/octet-stream')
+        response = FileResponse(job.result.storage.open(job.result.name, 'rb'), content_type=content_type)
+        response['Content-Disposition'] = 'attachment; filename=%s' % job.filename
+        return response
+
+    def retry_jobs(self, request, queryset):
+        queryset.filter(status=ExportJob.STATUS_FAILED).update(
+            status=ExportJob.STATUS_PENDING,
+            processed=0,
+            attempts=0,
+            error='',
+        )
+    retry_jobs.short_description = _('Retry the selected failed exports')
 
 
 admin.site.register(FormSubmission, FormSubmissionAdmin)
+admin.site.register(OutboxMessage, OutboxMessageAdmin)
+admin.site.register(ExportJob, ExportJobAdmin)
+admin.site.register(WebhookDelivery, WebhookDeliveryAdmin)
@@ -1,22 +1,44 @@
 # -*- coding: utf-8 -*-
 from email.utils import formataddr
 
+from django.conf import settings
 from django.contrib import admin
 from django.core.urlresolvers import reverse
 from django.template.loader import render_to_string
 from django.utils import six
 from django.utils.translation import ugettext_lazy as _
 
+from ..models import FormSubmissionCount
+from .changelist import KeysetChangeList
+
 if six.PY2:
     str_dunder_method = '__unicode__'
 else:
     str_dunder_method = '__str__'
 
 
+class FormNameListFilter(admin.SimpleListFilter):
+    """
+    Lists the submitted forms from their counts
+    instead of selecting the distinct names of all submissions.
+    """
+    title = _('form name')
+    parameter_name = 'name'
+
+    def lookups(self, request, model_admin):
+        for name, count in FormSubmissionCount.get_form_names():
+            yield (name, u'{} ({})'.format(name, count))
+
+    def queryset(self, request, queryset):
+        if self.value() is None:
+            return queryset
+        return queryset.filter(name=self.value())
+
+
 class BaseFormSubmissionAdmin(admin.ModelAdmin):
     date_hierarchy = 'sent_at'
     list_display = [str_dunder_method, 'sent_at', 'language']
-    list_filter = ['name', 'language']
+    list_filter = [FormNameListFilter, 'language']
     readonly_fields = [
         'name',
         'get_data_for_display',
@@ -24,10 +46,19 @@ class BaseFormSubmissionAdmin(admin.ModelAdmin):
         'sent_at',
         'get_recipients_for_display',
     ]
+    # paginate on (sent_at, id) instead of offsets, recommended for large tables
+    keyset_pagination = getattr(settings, 'ALDRYN_FORMS_SUBMISSION_ADMIN_KEYSET_PAGINATION', False)
+    # fields loaded for the changelist when using keyset pagination
+    list_only_fields = ['name', 'sent_at', 'language']
 
     def has_add_permission(self, request):
         return False
 
+    def get_changelist(self, request, **kwargs):
+        if self.keyset_pagination:
+            return KeysetChangeList
+        return super(BaseFormSubmissionAdmin, self).get_changelist(request, **kwargs)
+
     def get_data_for_display(self, obj):
         data = obj.get_form_data()
         html = render_to_string(
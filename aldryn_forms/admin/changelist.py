@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+import json
+
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ChangeList
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.six import string_types
+
+
+# Keyset pagination settings
+OLDER_VAR = 'older'
+NEWER_VAR = 'newer'
+
+
+def estimate_count(queryset):
+    """
+    Returns the number of rows the database expects the queryset to return,
+    estimated from its table statistics by PostgreSQL and MySQL.
+
+    Returns None on other databases, counting the rows is what the
+    estimate avoids.
+    """
+    connection = connections[queryset.db]
+
+    if connection.vendor not in ('postgresql', 'mysql'):
+        return None
+
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            cursor.execute('EXPLAIN ' + sql, params)
+            columns = [column[0].lower() for column in cursor.description]
+            plan = dict(zip(columns, cursor.fetchone()))
+            # the share of the examined rows matching the conditions, since 5.7
+            return int((plan['rows'] or 0) * float(plan.get('filtered') or 100) / 100)
+
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+
+    if isinstance(plan, string_types):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def get_cursor(obj):
+    return u'{}_{}'.format(obj.sent_at.isoformat(), obj.pk)
+
+
+def parse_cursor(value):
+    sent_at, _, pk = value.rpartition('_')
+
+    try:
+        sent_at = parse_datetime(sent_at)
+        pk = int(pk)
+    except ValueError:
+        sent_at = None
+
+    if sent_at is None:
+        raise IncorrectLookupParameters
+    return sent_at, pk
+
+
+class KeysetChangeList(ChangeList):
+    """
+    Paginates submissions newest first on (sent_at, id) so every page
+    is read using an index no matter how deep it is, and shows
+    an estimated count of the submissions instead of counting them,
+    if the database provides one.
+
+    Custom ordering and the date hierarchy aren't supported.
+    """
+    keyset_pagination = True
+
+    def __init__(self, request, model, list_display, list_display_links,
+                 list_filter, date_hierarchy, *args, **kwargs):
+        super(KeysetChangeList, self).__init__(
+            request, model, list_display, list_display_links,
+            list_filter, None, *args, **kwargs
+        )
+
+    def get_filters_params(self, params=None):
+        lookup_params = super(KeysetChangeList, self).get_filters_params(params)
+        lookup_params.pop(OLDER_VAR, None)
+        lookup_params.pop(NEWER_VAR, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # changing the filters starts over from the newest submissions
+        remove = list(remove or []) + [OLDER_VAR, NEWER_VAR]
+        return super(KeysetChangeList, self).get_query_string(new_params, remove)
+
+    def get_ordering(self, request, queryset):
+        return ['-sent_at', '-pk']
+
+    def get_results(self, request):
+        queryset = self.queryset.only(*self.model_admin.list_only_fields)
+        page_size = self.list_per_page
+
+        if NEWER_VAR in request.GET:
+            sent_at, pk = parse_cursor(request.GET[NEWER_VAR])
+            queryset = queryset.filter(Q(sent_at__gt=sent_at) | Q(sent_at=sent_at, pk__gt=pk))
+            # read the page oldest first, starting right after the cursor
+            result_list = list(queryset.order_by('sent_at', 'pk')[:page_size + 1])
+            has_newer = len(result_list) > page_size
+            result_list = result_list[:page_size][::-1]
+            has_older = True
+        else:
+            if OLDER_VAR in request.GET:
+                sent_at, pk = parse_cursor(request.GET[OLDER_VAR])
+                queryset = queryset.filter(Q(sent_at__lt=sent_at) | Q(sent_at=sent_at, pk__lt=pk))
+                has_newer = True
+            else:
+                has_newer = False
+            result_list = list(queryset[:page_size + 1])
+            has_older = len(result_list) > page_size
+            result_list = result_list[:page_size]
+
+        self.estimated_count = estimate_count(self.queryset)
+        # the admin templates expect a number
+        self.result_count = len(result_list) if self.estimated_count is None else self.estimated_count
+        self.full_result_count = None
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.result_list = result_list
+        self.can_show_all = False
+        self.multi_page = has_newer or has_older
+        self.paginator = None
+
+        self.newer_url = None
+        self.older_url = None
+
+        if result_list and has_newer:
+            self.newer_url = self.get_query_string({NEWER_VAR: get_cursor(result_list[0])})
+
+        if result_list and has_older:
+            self.older_url = self.get_query_string({OLDER_VAR: get_cursor(result_list[-1])})
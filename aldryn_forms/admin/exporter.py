@@ -1,57 +1,350 @@
 # -*- coding: utf-8 -*-
+import csv
+import multiprocessing
+from collections import deque
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Min, Q
+from django.utils import six, timezone
+from django.utils.translation import ugettext
+from openpyxl import Workbook
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
 from tablib import Dataset
 
+from ..export_workers import assemble_rows
+from ..models import FormSubmission, SubmittedField, get_field_registry_resolution
+from ..utils import iterate_in_chunks
+
+try:
+    from concurrent.futures import ProcessPoolExecutor
+except ImportError:
+    # python 2 without the futures backport
+    ProcessPoolExecutor = None
+
+
+class Echo(object):
+    """
+    File like object which returns the written value instead of storing it,
+    allows streaming the output of csv.writer.
+    """
+
+    def write(self, value):
+        return value
+
+
+def encode_csv_row(row):
+    if six.PY2:
+        # the python 2 csv module doesn't support unicode
+        return [six.text_type(value).encode('utf-8') for value in row]
+    return row
+
+
+def clean_xlsx_row(row):
+    # openpyxl refuses to write control characters
+    return [ILLEGAL_CHARACTERS_RE.sub('', value) if isinstance(value, six.string_types) else value
+            for value in row]
+
 
 class Exporter(object):
+    # number of submissions loaded into memory at once
+    chunk_size = 1000
+    # number of csv rows sent to the client at once
+    csv_rows_per_chunk = 100
+    # rows per xlsx sheet, including the headers row
+    xlsx_max_rows = 1048576
 
-    def __init__(self, queryset):
+    def __init__(self, queryset, progress_callback=None):
         self.queryset = queryset
+        # called with the number of processed submissions after each chunk
+        self.progress_callback = progress_callback
+
+    def get_headers(self, fields):
+        return [field.rpartition('-')[0] for field in fields]
 
     def get_dataset(self, fields):
-        headers = [field.rpartition('-')[0] for field in fields]
-        dataset = Dataset(headers=headers)
-
-        for submission in self.queryset.only('data').iterator():
-            row_data = []
-            form_fields = [field for field in submission.get_form_data()
-                           if field.field_id in fields]
-
-            for header in fields:
-                for field in form_fields:
-                    if field.field_id == header:
-                        row_data.append(field.value)
-                        break
-                else:
-                    row_data.append('')
+        dataset = Dataset(headers=self.get_headers(fields))
 
-            if row_data:
-                dataset.append(row_data)
+        for row in self.iter_rows(fields):
+            dataset.append(row)
         return dataset
 
-    def get_fields_for_export(self):
-        old_fields = []
-        old_field_ids = []
+    def iter_submissions(self):
+        queryset = self.queryset.only('pk', *FormSubmission.get_form_data_fields())
+        return iterate_in_chunks(queryset, chunk_size=self.chunk_size)
+
+    def get_columns(self, fields):
+        """
+        Returns a mapping of field id to column index.
+        """
+        return dict((field_id, index) for index, field_id in enumerate(fields))
+
+    def get_row(self, submission, columns):
+        row_data = [''] * len(columns)
+
+        # reversed so the first field with a given id wins
+        for field in reversed(submission.get_form_data()):
+            index = columns.get(field.field_id)
+
+            if index is not None:
+                row_data[index] = field.value
+        return row_data
+
+    def iter_rows(self, fields):
+        columns = self.get_columns(fields)
 
+        for processed, submission in enumerate(self.iter_submissions(), 1):
+            row_data = self.get_row(submission, columns)
+
+            if row_data:
+                yield row_data
+
+            if self.progress_callback and processed % self.chunk_size == 0:
+                self.progress_callback(processed)
+
+    def iter_csv(self, fields):
+        """
+        Yields the export as csv, starting with the headers row.
+        """
+        writer = csv.writer(Echo())
+        yield writer.writerow(encode_csv_row(self.get_headers(fields)))
+
+        lines = []
+
+        for row in self.iter_rows(fields):
+            lines.append(writer.writerow(encode_csv_row(row)))
+
+            if len(lines) >= self.csv_rows_per_chunk:
+                yield ''.join(lines)
+                lines = []
+
+        if lines:
+            yield ''.join(lines)
+
+    def write_csv(self, fields, fileobj):
+        """
+        Writes the export as utf-8 encoded csv to the given binary file object.
+        """
+        for chunk in self.iter_csv(fields):
+            if isinstance(chunk, six.text_type):
+                chunk = chunk.encode('utf-8')
+            fileobj.write(chunk)
+
+    def write_xlsx(self, fields, fileobj):
+        """
+        Writes the export as xlsx to the given file object.
+
+        The workbook is written in write only mode which keeps memory
+        usage constant, rows which don't fit in a sheet
+        are written to additional sheets.
+        """
+        workbook = Workbook(write_only=True)
+        headers = self.get_headers(fields)
+        rows_per_sheet = self.xlsx_max_rows - 1
+        sheet = None
+
+        for index, row in enumerate(self.iter_rows(fields)):
+            if index % rows_per_sheet == 0:
+                sheet = self._add_xlsx_sheet(workbook, headers)
+            sheet.append(clean_xlsx_row(row))
+
+        if sheet is None:
+            self._add_xlsx_sheet(workbook, headers)
+        workbook.save(fileobj)
+
+    def _add_xlsx_sheet(self, workbook, headers):
+        title = ugettext('Submissions')
+
+        if workbook.worksheets:
+            title = u'{} {}'.format(title, len(workbook.worksheets) + 1)
+        sheet = workbook.create_sheet(title=title)
+        sheet.append(clean_xlsx_row(headers))
+        return sheet
+
+    def get_fields_for_export(self):
+        """
+        Returns the fields of the latest submission
+        and the fields only found in older submissions.
+        """
         # A user can add fields to the form over time,
         # knowing this we use the latest form submission as a way
         # to get the latest form state.
-        submissions = self.queryset.only('data').iterator()
+        fields = ['name', 'language', 'sent_at'] + FormSubmission.get_form_data_fields()
+        latest_submission = self.queryset.only(*fields).first()
 
-        latest_data = next(submissions)
-        latest_fields = [field for field in latest_data.get_form_data()
+        if latest_submission is None:
+            return ([], [])
+
+        latest_fields = [field for field in latest_submission.get_form_data()
                          if field.label]
-        latest_field_ids = [field.field_id for field in latest_fields]
+        latest_field_ids = set(field.field_id for field in latest_fields)
+
+        registry = SubmittedField.objects.filter(
+            form_name=latest_submission.name,
+            language=latest_submission.language,
+        )
 
-        for submission in submissions:
-            fields = submission.get_form_data()
+        if not registry.exists():
+            # submissions sent before the registry was introduced
+            # which haven't been registered with build_form_field_registry.
+            return (latest_fields, self._scan_old_fields(latest_field_ids))
 
-            for field in fields:
+        oldest_sent_at = self.queryset.aggregate(oldest=Min('sent_at'))['oldest']
+
+        registered_fields = (
+            registry
+            .filter(
+                first_seen_at__lte=latest_submission.sent_at,
+                # the last time a field was seen is only updated periodically
+                last_seen_at__gte=oldest_sent_at - get_field_registry_resolution(),
+            )
+            .order_by('-last_seen_at', 'pk')
+        )
+
+        old_fields = []
+
+        for registered_field in registered_fields:
+            if registered_field.field_id not in latest_field_ids:
+                # skips fields registered twice as well
+                latest_field_ids.add(registered_field.field_id)
+                old_fields.append(registered_field.get_serialized_field())
+        return (latest_fields, old_fields)
+
+    def _scan_old_fields(self, latest_field_ids):
+        old_fields = []
+        seen_field_ids = set(latest_field_ids)
+
+        for submission in self.iter_submissions():
+            for field in submission.get_form_data():
                 if not field.label:
                     continue
 
                 field_id = field.field_id
 
-                if (field_id not in old_field_ids) and (field_id not in latest_field_ids):
+                if field_id not in seen_field_ids:
                     old_fields.append(field)
-                    old_field_ids.append(field_id)
-        return (latest_fields, old_fields)
+                    seen_field_ids.add(field_id)
+        return old_fields
+
+
+class ParallelExporter(Exporter):
+    """
+    Decodes the submissions and assembles their rows in a pool of
+    worker processes, one chunk of submissions at a time.
+
+    The raw data is read in pk ranges of ``chunk_size`` submissions
+    and the rows are yielded in the same order as ``Exporter``.
+    Falls back to assembling the rows in the current process
+    when there's a single worker or ``concurrent.futures``
+    isn't available.
+    """
+    # number of chunks queued per worker, bounds the memory usage
+    chunks_per_worker = 2
+
+    def __init__(self, queryset, workers=None, **kwargs):
+        super(ParallelExporter, self).__init__(queryset=queryset, **kwargs)
+        self.workers = workers or multiprocessing.cpu_count()
+
+    def iter_raw_data_chunks(self):
+        """
+        Yields lists of the json data of the submissions, newest first.
+        """
+        queryset = self.queryset.order_by('-pk').values_list('pk', 'data')
+        chunk = list(queryset[:self.chunk_size])
+
+        while chunk:
+            yield [data for pk, data in chunk]
+
+            if len(chunk) < self.chunk_size:
+                break
+            chunk = list(queryset.filter(pk__lt=chunk[-1][0])[:self.chunk_size])
+
+    def iter_row_chunks(self, fields):
+        columns = self.get_columns(fields)
+        tasks = ((raw_data_list, columns) for raw_data_list in self.iter_raw_data_chunks())
+
+        if self.workers < 2 or ProcessPoolExecutor is None:
+            for task in tasks:
+                yield assemble_rows(task)
+            return
+
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            # unlike Executor.map, only a few chunks are queued at once
+            pending = deque()
+
+            for task in tasks:
+                pending.append(executor.submit(assemble_rows, task))
+
+                if len(pending) >= self.workers * self.chunks_per_worker:
+                    yield pending.popleft().result()
+
+            while pending:
+                yield pending.popleft().result()
+
+    def iter_rows(self, fields):
+        processed = 0
+
+        for rows in self.iter_row_chunks(fields):
+            for row in rows:
+                yield row
+
+            processed += len(rows)
+
+            if self.progress_callback:
+                self.progress_callback(processed)
+
+
+class IncrementalExporter(Exporter):
+    """
+    Exports the submissions stored after the position of an ExportCursor,
+    oldest first, reading them in chunks over (inserted_at, id).
+
+    Buffered submissions keep the date they were sent at but are stored
+    later, so the cursor follows the date they were inserted at. Submissions
+    inserted in the last ``ALDRYN_FORMS_INCREMENTAL_EXPORT_DELAY`` seconds
+    are left for the next export, a transaction committing late could
+    otherwise add submissions behind the cursor.
+    """
+
+    def __init__(self, cursor, **kwargs):
+        delay = getattr(settings, 'ALDRYN_FORMS_INCREMENTAL_EXPORT_DELAY', 60)
+        queryset = cursor.get_queryset().filter(inserted_at__lt=timezone.now() - timedelta(seconds=delay))
+        super(IncrementalExporter, self).__init__(queryset=queryset, **kwargs)
+        self.cursor = cursor
+        self.last_inserted_at = cursor.last_inserted_at
+        self.last_id = cursor.last_id
+        self.exported = 0
+
+    def iter_submissions(self):
+        fields = ['pk', 'inserted_at'] + FormSubmission.get_form_data_fields()
+        queryset = self.queryset.only(*fields).order_by('inserted_at', 'pk')
+
+        while True:
+            chunk_queryset = queryset
+
+            if self.last_inserted_at is not None:
+                chunk_queryset = (
+                    chunk_queryset
+                    .filter(inserted_at__gte=self.last_inserted_at)
+                    .filter(Q(inserted_at__gt=self.last_inserted_at) | Q(pk__gt=self.last_id))
+                )
+
+            chunk = list(chunk_queryset[:self.chunk_size])
+
+            for submission in chunk:
+                self.last_inserted_at = submission.inserted_at
+                self.last_id = submission.pk
+                self.exported += 1
+                yield submission
+
+            if len(chunk) < self.chunk_size:
+                break
+
+    def save_cursor(self):
+        """
+        Moves the cursor to the last exported submission,
+        call it once the export has been stored.
+        """
+        self.cursor.last_inserted_at = self.last_inserted_at
+        self.cursor.last_id = self.last_id
+        self.cursor.save()
@@ -1,6 +1,4 @@
 # -*- coding: utf-8 -*-
-from datetime import datetime, timedelta
-
 from django import forms
 from django.conf import settings
 from django.contrib.admin.widgets import AdminDateWidget
@@ -9,13 +7,14 @@ from django.utils.text import slugify
 from django.utils.translation import ugettext, ugettext_lazy as _
 
 from .exporter import Exporter
-from ..models import FormSubmission
+from ..exports import is_export_jobs_enabled
+from ..models import FormSubmission, FormSubmissionCount
 
 
 def form_choices(modelClass):
-    form_names = modelClass.objects.values_list('name', flat=True).distinct()
-
-    for name in form_names.order_by('name'):
+    # the counts are kept up to date on every submission,
+    # reading them avoids scanning all of the submissions
+    for name, count in FormSubmissionCount.get_form_names():
         yield (name, name)
 
 
@@ -27,6 +26,11 @@ def form_field_choices(fields):
 class BaseFormExportForm(forms.Form):
     excel_limit = 65536
     export_filename = 'export-{language}-{form_name}-%Y-%m-%d'
+    file_type_choices = (
+        ('xlsx', _('Excel (.xlsx)')),
+        ('xls', _('Excel 97-2003 (.xls)')),
+        ('csv', _('CSV')),
+    )
 
     form_name = forms.ChoiceField(choices=[])
     from_date = forms.DateField(
@@ -43,19 +47,39 @@ class BaseFormExportForm(forms.Form):
         label=_('language'),
         choices=settings.LANGUAGES
     )
+    file_type = forms.ChoiceField(
+        label=_('file type'),
+        choices=[],
+        initial='xlsx',
+    )
+    background = forms.BooleanField(
+        label=_('export in the background'),
+        required=False,
+        help_text=_('The export is prepared by a worker and can be downloaded '
+                    'from the export jobs once it\'s done.'),
+    )
 
     def __init__(self, *args, **kwargs):
         super(BaseFormExportForm, self).__init__(*args, **kwargs)
         self.fields['form_name'].choices = form_choices(modelClass=self.model)
+        self.fields['file_type'].choices = self.file_type_choices
+
+        if not is_export_jobs_enabled():
+            del self.fields['background']
 
     def clean(self):
         if self.errors:
             return self.cleaned_data
 
+        if self.cleaned_data['file_type'] != 'xls':
+            # only the legacy excel format is limited
+            return self.cleaned_data
+
         queryset = self.get_queryset()
 
         if queryset.count() >= self.excel_limit:
-            error_message = _("Export failed! More than 65,536 entries found, exceeded Excel limitation!")
+            error_message = _("Export failed! More than 65,536 entries found, exceeded the .xls limitation! "
+                              "Please export to .xlsx or CSV instead.")
             raise forms.ValidationError(error_message)
 
         return self.cleaned_data
@@ -75,23 +99,13 @@ class BaseFormExportForm(forms.Form):
 
     def get_queryset(self):
         data = self.cleaned_data
-        from_date, to_date = data.get('from_date'), data.get('to_date')
-
-        queryset = self.model.objects.filter(
+        return self.model.objects.for_export(
             name=data['form_name'],
             language=data['language'],
+            from_date=data.get('from_date'),
+            to_date=data.get('to_date'),
         )
 
-        if from_date:
-            lower = datetime(*from_date.timetuple()[:6])  # inclusive
-            queryset = queryset.filter(sent_at__gte=lower)
-
-        if to_date:
-            upper = datetime(*to_date.timetuple()[:6]) + timedelta(days=1)  # exclusive
-            queryset = queryset.filter(sent_at__lt=upper)
-
-        return queryset
-
 
 class FormSubmissionExportForm(BaseFormExportForm):
     model = FormSubmission
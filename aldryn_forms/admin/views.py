@@ -1,17 +1,20 @@
 # -*- coding: utf-8 -*-
 from django import get_version
 from django.contrib import messages
-from django.http import HttpResponse
+from django.core.files.temp import NamedTemporaryFile
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
 from django.shortcuts import redirect
 from django.utils.translation import get_language_from_request, ugettext
 
 from ..compat import SessionWizardView
+from ..models import ExportJob
 from .exporter import Exporter
 from .forms import FormExportStep1Form, FormExportStep2Form
 
 
 mimetype_map = {
     'xls': 'application/vnd.ms-excel',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
     'csv': 'text/csv',
     'html': 'text/html',
     'yaml': 'text/yaml',
@@ -42,6 +45,9 @@ class FormExportWizardView(SessionWizardView):
                 request=self.request,
                 check_path=True
             )
+
+            if self.file_type:
+                initial['file_type'] = self.file_type
         return initial
 
     def get_form_kwargs(self, step=None):
@@ -71,9 +77,9 @@ class FormExportWizardView(SessionWizardView):
             return redirect(export_url)
         return super(FormExportWizardView, self).render_next_step(form, **kwargs)
 
-    def get_content_type(self):
+    def get_content_type(self, file_type=None):
         content_type = mimetype_map.get(
-            self.file_type,
+            file_type or self.file_type,
             'application/octet-stream'
         )
         return content_type
@@ -88,12 +94,16 @@ class FormExportWizardView(SessionWizardView):
 
         fields = step_2_form.get_fields()
         queryset = step_1_form.get_queryset()
+        file_type = step_1_form.cleaned_data['file_type']
+
+        filename = step_1_form.get_filename(extension=file_type)
 
-        dataset = Exporter(queryset=queryset).get_dataset(fields=fields)
+        if step_1_form.cleaned_data.get('background'):
+            return self.create_export_job(step_1_form, fields=fields, filename=filename)
 
-        filename = step_1_form.get_filename(extension=self.file_type)
+        exporter = Exporter(queryset=queryset)
 
-        content_type = self.get_content_type()
+        content_type = self.get_content_type(file_type)
 
         response_kwargs = {}
 
@@ -103,6 +113,35 @@ class FormExportWizardView(SessionWizardView):
             # Django <= 1.6 compatibility
             response_kwargs['mimetype'] = content_type
 
-        response = HttpResponse(dataset.xls, **response_kwargs)
+        if file_type == 'csv':
+            # csv rows are sent as they're read from the database
+            response = StreamingHttpResponse(exporter.iter_csv(fields=fields), **response_kwargs)
+        elif file_type == 'xlsx':
+            # the file is deleted once the response is closed
+            export_file = NamedTemporaryFile(suffix='.xlsx')
+            exporter.write_xlsx(fields=fields, fileobj=export_file)
+            export_file.seek(0)
+            response = FileResponse(export_file, **response_kwargs)
+        else:
+            dataset = exporter.get_dataset(fields=fields)
+            response = HttpResponse(dataset.xls, **response_kwargs)
         response['Content-Disposition'] = 'attachment; filename=%s' % filename
         return response
+
+    def create_export_job(self, form, fields, filename):
+        data = form.cleaned_data
+        job = ExportJob(
+            form_name=data['form_name'],
+            language=data['language'],
+            from_date=data.get('from_date'),
+            to_date=data.get('to_date'),
+            file_type=data['file_type'],
+            filename=filename,
+            created_by=self.request.user,
+        )
+        job.set_fields(fields)
+        job.save()
+
+        message = ugettext('The export was queued, it can be downloaded here once it\'s done.')
+        self.admin.message_user(self.request, message, level=messages.SUCCESS)
+        return redirect('admin:aldryn_forms_exportjob_change', job.pk)
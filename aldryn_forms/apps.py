@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+from django.apps import AppConfig
+from django.core.signals import setting_changed
+from django.db.models.signals import post_delete, post_save
+
+
+class AldrynFormsConfig(AppConfig):
+    name = 'aldryn_forms'
+
+    def ready(self):
+        from .cache import evict_form_tree_caches
+        from .models import ExportJob, FormSubmission, decrement_submission_count, delete_export_job_result
+        from .utils import get_action_backends, reset_action_backends
+
+        # fails early when the action backends are misconfigured
+        get_action_backends()
+        setting_changed.connect(
+            reset_action_backends,
+            dispatch_uid='aldryn_forms_reset_action_backends',
+        )
+
+        post_save.connect(
+            evict_form_tree_caches,
+            dispatch_uid='aldryn_forms_evict_form_tree_caches_on_save',
+        )
+        post_delete.connect(
+            evict_form_tree_caches,
+            dispatch_uid='aldryn_forms_evict_form_tree_caches_on_delete',
+        )
+        post_delete.connect(
+            decrement_submission_count,
+            sender=FormSubmission,
+            dispatch_uid='aldryn_forms_decrement_submission_count',
+        )
+        post_delete.connect(
+            delete_export_job_result,
+            sender=ExportJob,
+            dispatch_uid='aldryn_forms_delete_export_job_result',
+        )
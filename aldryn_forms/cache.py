@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+import threading
+from collections import namedtuple
+
+from django.conf import settings
+from django.utils import timezone
+
+from .compat import OrderedDict
+
+
+CacheEntry = namedtuple(
+    'CacheEntry',
+    field_names=['version', 'plugin_ids', 'value']
+)
+
+
+class FormTreeCache(object):
+    """
+    Process local LRU cache for values computed from a form plugin tree.
+
+    Entries are keyed by the form plugin pk and are only returned
+    while the version of the form tree they were computed from is current.
+    Entries are also evicted eagerly when any plugin or option
+    belonging to the cached tree is saved or deleted.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, form_plugin):
+        version = form_plugin.get_form_version()
+
+        with self._lock:
+            entry = self._entries.pop(form_plugin.pk, None)
+
+            if entry is None or entry.version != version:
+                return None
+            # re-insert to mark the entry as most recently used
+            self._entries[form_plugin.pk] = entry
+        return entry.value
+
+    def set(self, form_plugin, value):
+        entry = CacheEntry(
+            version=form_plugin.get_form_version(),
+            plugin_ids=frozenset(
+                [form_plugin.pk] + [element.pk for element in form_plugin.get_form_elements()]
+            ),
+            value=value,
+        )
+
+        with self._lock:
+            self._entries.pop(form_plugin.pk, None)
+            self._entries[form_plugin.pk] = entry
+
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def evict(self, plugin_ids):
+        """
+        Removes all entries computed from a tree containing
+        any of the given plugin ids.
+        """
+        plugin_ids = set(plugin_ids)
+
+        with self._lock:
+            stale = [key for key, entry in self._entries.items()
+                     if not entry.plugin_ids.isdisjoint(plugin_ids)]
+
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+form_class_cache = FormTreeCache(
+    maxsize=getattr(settings, 'ALDRYN_FORMS_FORM_CLASS_CACHE_SIZE', 128),
+)
+
+form_schema_cache = FormTreeCache(
+    maxsize=getattr(settings, 'ALDRYN_FORMS_FORM_SCHEMA_CACHE_SIZE', 128),
+)
+
+form_tree_caches = [form_class_cache, form_schema_cache]
+
+
+def evict_form_tree_caches(sender, instance, **kwargs):
+    """
+    Signal receiver evicting cached form trees whenever
+    a cms plugin or a field option is saved or deleted.
+
+    The caches of other processes are only evicted once the form version
+    changes, saving an option touches the changed date of its field.
+    """
+    from cms.models import CMSPlugin
+
+    from .models import Option
+
+    if isinstance(instance, CMSPlugin):
+        # the parent is included to catch new children being added to a form
+        plugin_ids = [instance.pk, instance.parent_id]
+    elif isinstance(instance, Option):
+        plugin_ids = [instance.field_id]
+        CMSPlugin.objects.filter(pk=instance.field_id).update(changed_date=timezone.now())
+    else:
+        return
+
+    for cache in form_tree_caches:
+        cache.evict(plugin_ids)
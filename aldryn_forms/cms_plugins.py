@@ -6,6 +6,7 @@ from django.db.models import query
 from django.contrib import messages
 from django.contrib.admin import TabularInline
 from django.core.validators import MinLengthValidator
+from django.db import transaction
 from django.template.loader import select_template
 from django.utils.safestring import mark_safe
 from django.utils.six import text_type
@@ -14,13 +15,16 @@ from django.utils.translation import ugettext, ugettext_lazy as _
 from cms.plugin_base import CMSPluginBase
 from cms.plugin_pool import plugin_pool
 
-from emailit.api import send_mail
+from emailit.api import construct_mail
 
 from filer.models import filemodels, imagemodels
 from sizefield.utils import filesizeformat
 
 from . import models
+from .cache import form_class_cache
 from .forms import (
+    OptionChoiceField,
+    OptionMultipleChoiceField,
     RestrictedFileField,
     RestrictedImageField,
     EmailFieldForm,
@@ -39,8 +43,17 @@ from .forms import (
 )
 from .helpers import get_user_name
 from .models import SerializedFormField
+from .outbox import send_messages
 from .signals import form_pre_save, form_post_save
-from .utils import get_action_backends
+from .utils import (
+    SUBMISSION_TOKEN_DONE,
+    claim_submission_token,
+    complete_submission_token,
+    get_action_backend,
+    get_processed_forms,
+    get_submission_token_state,
+    release_submission_token,
+)
 from .validators import (
     is_valid_recipient,
     MinChoicesValidator,
@@ -105,73 +118,139 @@ class FormPlugin(FieldContainer):
         return instance.form_template
 
     def form_valid(self, instance, request, form):
-        action_backend = get_action_backends()[form.form_plugin.action_backend]()
+        action_backend = get_action_backend(form.form_plugin.action_backend)
         return action_backend.form_valid(self, instance, request, form)
 
     def form_invalid(self, instance, request, form):
         if instance.error_message:
             form._add_error(message=instance.error_message)
 
-    def process_form(self, instance, request):
+    def process_form(self, instance, request, form_url=None):
+        """
+        Validates the submitted form and saves it if it's valid.
+
+        ``form_url`` is the url of the page hosting the form,
+        by default the url the form was posted to.
+        """
+        processed_forms = get_processed_forms(request)
+
+        if instance.pk in processed_forms:
+            # The submit view processes the form and then renders the page
+            # which contains the same form, don't validate, store
+            # and notify about the same submission twice.
+            return processed_forms[instance.pk]
+
         form_class = self.get_form_class(instance)
         form_kwargs = self.get_form_kwargs(instance, request)
+
+        if form_url:
+            form_kwargs['form_url'] = form_url
+
         form = form_class(**form_kwargs)
+        processed_forms[instance.pk] = form
+        token = form.get_idempotency_token()
+
+        if not form.is_valid():
+            if token and get_submission_token_state(instance.pk, token) == SUBMISSION_TOKEN_DONE:
+                # A retry of an accepted submission can fail to validate,
+                # e.g. a captcha can only be solved once.
+                form.set_duplicate()
+            elif request.method == 'POST':
+                # only call form_invalid if request is POST and form is not valid
+                self.form_invalid(instance, request, form)
+            return form
+
+        # The token is only claimed by valid submissions,
+        # the corrected form is submitted with the same token.
+        token_state = claim_submission_token(instance.pk, token) if token else None
+
+        if token_state == SUBMISSION_TOKEN_DONE:
+            # A double click or a retry of a submission which was accepted,
+            # respond as if it was processed again.
+            form.set_duplicate()
+            return form
+
+        if token_state is not None:
+            # The same submission is being processed by another request
+            # which can still fail, don't report it as accepted yet.
+            form._add_error(message=ugettext(
+                'The form is already being submitted, please wait a moment before sending it again.'
+            ))
+            return form
 
-        if form.is_valid():
-            fields = [field for field in form.base_fields.values()
-                      if hasattr(field, '_plugin_instance')]
-
-            # pre save field hooks
-            for field in fields:
-                field._plugin_instance.form_pre_save(
-                    instance=field._model_instance,
-                    form=form,
-                    request=request,
-                )
-
-            form_pre_save.send(
-                sender=models.FormPlugin,
-                instance=instance,
+        try:
+            # The submission and the outbox messages
+            # created by its notifications are stored together.
+            with transaction.atomic():
+                self.save_form(instance, request, form)
+        except Exception:
+            if token:
+                release_submission_token(instance.pk, token)
+            raise
+
+        if token:
+            complete_submission_token(instance.pk, token)
+        return form
+
+    def save_form(self, instance, request, form):
+        fields = [field for field in form.base_fields.values()
+                  if hasattr(field, '_plugin_instance')]
+
+        # pre save field hooks
+        for field in fields:
+            field._plugin_instance.form_pre_save(
+                instance=field._model_instance,
                 form=form,
                 request=request,
             )
 
-            self.form_valid(instance, request, form)
+        form_pre_save.send(
+            sender=models.FormPlugin,
+            instance=instance,
+            form=form,
+            request=request,
+        )
 
-            # post save field hooks
-            for field in fields:
-                field._plugin_instance.form_post_save(
-                    instance=field._model_instance,
-                    form=form,
-                    request=request,
-                )
+        self.form_valid(instance, request, form)
 
-            form_post_save.send(
-                sender=models.FormPlugin,
-                instance=instance,
+        # post save field hooks
+        for field in fields:
+            field._plugin_instance.form_post_save(
+                instance=field._model_instance,
                 form=form,
                 request=request,
             )
-        elif request.method == 'POST':
-            # only call form_invalid if request is POST and form is not valid
-            self.form_invalid(instance, request, form)
-        return form
+
+        form_post_save.send(
+            sender=models.FormPlugin,
+            instance=instance,
+            form=form,
+            request=request,
+        )
 
     def get_form_class(self, instance):
         """
         Constructs form class basing on children plugin instances.
+
+        The compiled class is cached per form plugin and form version.
         """
-        fields = self.get_form_fields(instance)
-        formClass = (
-            type(FormSubmissionBaseForm)
-            ('AldrynDynamicForm', (FormSubmissionBaseForm,), fields)
-        )
+        formClass = form_class_cache.get(instance)
+
+        if formClass is None:
+            fields = self.get_form_fields(instance)
+            formClass = (
+                type(FormSubmissionBaseForm)
+                ('AldrynDynamicForm', (FormSubmissionBaseForm,), fields)
+            )
+            form_class_cache.set(instance, formClass)
         return formClass
 
     def get_form_fields(self, instance):
         form_fields = {}
         fields = instance.get_form_fields()
 
+        instance.prefetch_field_options()
+
         for field in fields:
             plugin_instance = field.plugin_instance
             field_plugin = plugin_instance.get_plugin_class_instance()
@@ -214,13 +293,16 @@ class FormPlugin(FieldContainer):
             'form_plugin': instance,
         }
 
-        send_mail(
-            recipients=[user.email for user in recipients],
-            context=context,
-            template_base='aldryn_forms/emails/notification',
-            language=instance.language,
-        )
+        if recipients:
+            email = construct_mail(
+                recipients=[user.email for user in recipients],
+                context=context,
+                template_base='aldryn_forms/emails/notification',
+                language=instance.language,
+            )
+            send_messages([email])
 
+        # the email is only queued, a failed delivery is recorded in the outbox or logged
         users_notified = [
             (get_user_name(user), user.email) for user in recipients]
         return users_notified
@@ -282,6 +364,10 @@ class Field(FormElement):
     ]
     form_field_disabled_options = []
 
+    # Whether the field is built from Option instances
+    # which should be prefetched together with the rest of the form.
+    has_options = False
+
     # Used to configure default fieldset in admin form
     fieldset_general_fields = [
         'label',
@@ -298,7 +384,7 @@ class Field(FormElement):
     ]
 
     def serialize_value(self, instance, value, is_confirmation=False):
-        if isinstance(value, query.QuerySet):
+        if isinstance(value, (query.QuerySet, list, tuple)):
             value = u', '.join(map(text_type, value))
         elif value is None:
             value = '-'
@@ -319,6 +405,20 @@ class Field(FormElement):
         )
         return serialized_field
 
+    def get_field_schema(self, field):
+        """
+        Returns a JSON serializable description of the given form field.
+        """
+        instance = field.plugin_instance
+        allowed_options = self.get_field_enabled_options()
+        schema = {
+            'name': field.name,
+            'label': field.label,
+            'type': instance.field_type,
+            'required': 'required' in allowed_options and bool(instance.required),
+        }
+        return schema
+
     def get_form_field(self, instance):
         form_field_class = self.get_form_field_class(instance)
         form_field_kwargs = self.get_form_field_kwargs(instance)
@@ -484,6 +584,18 @@ class BaseTextField(Field):
         attrs['type'] = self.form_field_widget_input_type
         return attrs
 
+    def get_field_schema(self, field):
+        schema = super(BaseTextField, self).get_field_schema(field)
+        instance = field.plugin_instance
+        schema['input_type'] = self.form_field_widget_input_type
+
+        if instance.min_value:
+            schema['min_length'] = instance.min_value
+
+        if instance.max_value:
+            schema['max_length'] = instance.max_value
+        return schema
+
 
 class TextField(BaseTextField):
     name = _('Text Field')
@@ -568,12 +680,13 @@ class EmailField(BaseTextField):
             'form_data': form.get_serialized_field_choices(is_confirmation=True),
             'body_text': form_field_instance.email_body,
         }
-        send_mail(
+        email = construct_mail(
             recipients=[email],
             context=context,
             subject=form_field_instance.email_subject,
             template_base=self.email_template_base
         )
+        send_messages([email])
 
     def form_post_save(self, instance, form, **kwargs):
         field_name = form.form_plugin.get_form_field_name(field=instance)
@@ -608,6 +721,14 @@ class FileField(Field):
         'custom_classes',
     ]
 
+    def get_field_schema(self, field):
+        schema = super(FileField, self).get_field_schema(field)
+        instance = field.plugin_instance
+
+        if instance.max_size:
+            schema['max_size'] = instance.max_size
+        return schema
+
     def get_form_field_kwargs(self, instance):
         kwargs = super(FileField, self).get_form_field_kwargs(instance)
         if instance.max_size:
@@ -682,6 +803,17 @@ class ImageField(FileField):
         'custom_classes',
     ]
 
+    def get_field_schema(self, field):
+        schema = super(ImageField, self).get_field_schema(field)
+        instance = field.plugin_instance
+
+        if instance.max_width:
+            schema['max_width'] = instance.max_width
+
+        if instance.max_height:
+            schema['max_height'] = instance.max_height
+        return schema
+
     def get_form_field_kwargs(self, instance):
         kwargs = super(ImageField, self).get_form_field_kwargs(instance)
 
@@ -734,11 +866,18 @@ class SelectOptionInline(TabularInline):
     model = models.Option
 
 
+def get_options_schema(instance):
+    return [
+        {'value': option.pk, 'label': option.value, 'default': option.default_value}
+        for option in instance.option_set.all()
+    ]
+
+
 class SelectField(Field):
     name = _('Select Field')
 
     form = SelectFieldForm
-    form_field = forms.ModelChoiceField
+    form_field = OptionChoiceField
     form_field_widget = form_field.widget
     form_field_enabled_options = [
         'label',
@@ -759,11 +898,17 @@ class SelectField(Field):
     ]
 
     inlines = [SelectOptionInline]
+    has_options = True
+
+    def get_field_schema(self, field):
+        schema = super(SelectField, self).get_field_schema(field)
+        schema['options'] = get_options_schema(field.plugin_instance)
+        return schema
 
     def get_form_field_kwargs(self, instance):
         kwargs = super(SelectField, self).get_form_field_kwargs(instance)
-        kwargs['queryset'] = instance.option_set.all()
-        for opt in kwargs['queryset']:
+        kwargs['options'] = list(instance.option_set.all())
+        for opt in kwargs['options']:
             if opt.default_value:
                 kwargs['initial'] = opt.pk
                 break
@@ -774,7 +919,7 @@ class MultipleSelectField(SelectField):
     name = _('Multiple Select Field')
 
     form = MultipleSelectFieldForm
-    form_field = forms.ModelMultipleChoiceField
+    form_field = OptionMultipleChoiceField
     form_field_widget = forms.CheckboxSelectMultiple
     form_field_enabled_options = [
         'label',
@@ -800,12 +945,27 @@ class MultipleSelectField(SelectField):
             validators.append(MaxChoicesValidator(limit_value=instance.max_value))
         return validators
 
+    def get_field_schema(self, field):
+        schema = super(MultipleSelectField, self).get_field_schema(field)
+        instance = field.plugin_instance
+        schema['multiple'] = True
+
+        if instance.min_value == 0:
+            schema['required'] = False
+
+        if instance.min_value:
+            schema['min_choices'] = instance.min_value
+
+        if instance.max_value:
+            schema['max_choices'] = instance.max_value
+        return schema
+
     def get_form_field_kwargs(self, instance):
         kwargs = super(MultipleSelectField, self).get_form_field_kwargs(instance)
         if hasattr(instance, 'min_value') and instance.min_value == 0:
             kwargs['required'] = False
 
-        kwargs['initial'] = [o.pk for o in kwargs['queryset'] if o.default_value]
+        kwargs['initial'] = [o.pk for o in kwargs['options'] if o.default_value]
         return kwargs
 
 
@@ -817,7 +977,7 @@ class RadioSelectField(Field):
     name = _('Radio Select Field')
 
     form = RadioFieldForm
-    form_field = forms.ModelChoiceField
+    form_field = OptionChoiceField
     form_field_widget = forms.RadioSelect
     form_field_enabled_options = [
         'label',
@@ -838,12 +998,18 @@ class RadioSelectField(Field):
     ]
 
     inlines = [SelectOptionInline]
+    has_options = True
+
+    def get_field_schema(self, field):
+        schema = super(RadioSelectField, self).get_field_schema(field)
+        schema['options'] = get_options_schema(field.plugin_instance)
+        return schema
 
     def get_form_field_kwargs(self, instance):
         kwargs = super(RadioSelectField, self).get_form_field_kwargs(instance)
-        kwargs['queryset'] = instance.option_set.all()
+        kwargs['options'] = list(instance.option_set.all())
         kwargs['empty_label'] = None
-        for opt in kwargs['queryset']:
+        for opt in kwargs['options']:
             if opt.default_value:
                 kwargs['initial'] = opt.pk
                 break
@@ -873,6 +1039,10 @@ else:
             # None means don't serialize me
             return None
 
+        def get_field_schema(self, field):
+            # captchas can't be validated on the client
+            return None
+
     plugin_pool.register_plugin(CaptchaField)
 
 
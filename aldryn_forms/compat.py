@@ -9,3 +9,12 @@ try:
     from formtools.wizard.views import SessionWizardView
 except ImportError:
     from django.contrib.formtools.wizard.views import SessionWizardView  # noqa
+
+try:
+    from django.db.models import prefetch_related_objects
+except ImportError:
+    # Django < 1.10
+    from django.db.models.query import prefetch_related_objects as _prefetch_related_objects
+
+    def prefetch_related_objects(model_instances, *related_lookups):
+        return _prefetch_related_objects(model_instances, related_lookups)
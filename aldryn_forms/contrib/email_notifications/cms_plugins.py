@@ -1,24 +1,19 @@
 # -*- coding: utf-8 -*-
-import logging
-
 from email.utils import parseaddr
 
 from django.contrib import admin
-from django.core.mail import get_connection
 from django.utils.translation import ugettext_lazy as _
 
 from cms.plugin_pool import plugin_pool
 
 from aldryn_forms.cms_plugins import FormPlugin
+from aldryn_forms.outbox import send_messages
 from aldryn_forms.validators import is_valid_recipient
 
 from .notification import DefaultNotificationConf
 from .models import EmailNotification, EmailNotificationFormPlugin
 
 
-logger = logging.getLogger(__name__)
-
-
 class NewEmailNotificationInline(admin.StackedInline):
     extra = 1
     fields = ['theme']
@@ -157,15 +152,6 @@ class EmailNotificationForm(FormPlugin):
         return inlines
 
     def send_notifications(self, instance, form):
-        try:
-            connection = get_connection(fail_silently=False)
-            connection.open()
-        except:  # noqa
-            # I use a "catch all" in order to not couple this handler to a specific email backend
-            # different email backends have different exceptions.
-            logger.exception("Could not send notification emails.")
-            return []
-
         notifications = instance.email_notifications.select_related('form')
 
         emails = []
@@ -180,12 +166,10 @@ class EmailNotificationForm(FormPlugin):
                 emails.append(email)
                 recipients.append(parseaddr(to_email))
 
-        try:
-            connection.send_messages(emails)
-        except:  # noqa
-            # again, we catch all exceptions to be backend agnostic
-            logger.exception("Could not send notification emails.")
-            recipients = []
+        # queued in the outbox or sent once the submission is committed,
+        # the recipients are the ones the emails were queued for,
+        # failed deliveries are recorded in the outbox or logged
+        send_messages(emails)
         return recipients
 
 
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+Row assembly for exports running in worker processes.
+
+The functions in this module only depend on the standard library and
+``aldryn_forms.helpers`` so they can be pickled and run in processes
+which don't set up Django.
+They follow ``FormSubmission.get_form_data`` and ``Exporter.get_row``.
+"""
+import json
+
+from .helpers import get_field_id, get_field_occurrence_key
+
+
+def get_field_ids(form_data):
+    """
+    Returns the field id of each serialized field of a submission.
+    """
+    occurrences = {}
+    field_ids = []
+
+    for data in form_data:
+        occurrence_key = get_field_occurrence_key(data['name'], data['label'])
+        occurrences[occurrence_key] = occurrences.get(occurrence_key, 0) + 1
+        field_ids.append(get_field_id(data['name'], data['label'], occurrences[occurrence_key]))
+    return field_ids
+
+
+def decode_form_data(raw_data):
+    try:
+        return json.loads(raw_data) if raw_data else []
+    except ValueError:
+        return []
+
+
+def assemble_row(raw_data, columns):
+    """
+    Returns the export row of a submission from its json data.
+
+    ``columns`` maps the exported field ids to their column index.
+    """
+    form_data = decode_form_data(raw_data)
+    row = [''] * len(columns)
+
+    # reversed so the first field with a given id wins
+    for data, field_id in reversed(list(zip(form_data, get_field_ids(form_data)))):
+        index = columns.get(field_id)
+
+        if index is not None:
+            row[index] = data['value']
+    return row
+
+
+def assemble_rows(task):
+    """
+    Returns the export rows of a chunk of submissions.
+
+    ``task`` is a (raw_data_list, columns) tuple so the function
+    can be used with ``Executor.map``.
+    """
+    raw_data_list, columns = task
+    return [assemble_row(raw_data, columns) for raw_data in raw_data_list]
@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""
+Background exports of form submissions.
+
+When ``ALDRYN_FORMS_EXPORT_JOBS`` is enabled, the export wizard can store
+the export as an ``ExportJob`` instead of preparing it in the request.
+The ``process_form_exports`` management command writes the pending exports
+to the export storage, reporting the progress after every chunk
+of submissions. The rows are assembled by ``ALDRYN_FORMS_EXPORT_WORKERS``
+processes.
+
+The exports contain personal data, they're written to a private storage
+shared by the workers and the web servers (``ALDRYN_FORMS_EXPORT_STORAGE``
+or ``ALDRYN_FORMS_EXPORT_ROOT``) under random names and only served
+by the admin. A job whose worker died is picked up again once its lease
+(``ALDRYN_FORMS_EXPORT_JOB_LEASE``) expires, the lease is renewed
+after every chunk.
+"""
+from datetime import timedelta
+import logging
+from tempfile import TemporaryFile
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, Storage, get_storage_class
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+from django.utils.encoding import force_text
+
+
+logger = logging.getLogger(__name__)
+
+
+def is_export_jobs_enabled():
+    return getattr(settings, 'ALDRYN_FORMS_EXPORT_JOBS', False)
+
+
+def get_export_workers():
+    """
+    Returns the number of processes assembling the rows of an export,
+    None uses one process per cpu.
+    """
+    return getattr(settings, 'ALDRYN_FORMS_EXPORT_WORKERS', 1)
+
+
+def get_export_job_lease():
+    return timedelta(seconds=getattr(settings, 'ALDRYN_FORMS_EXPORT_JOB_LEASE', 60 * 10))
+
+
+def get_export_job_max_attempts():
+    return getattr(settings, 'ALDRYN_FORMS_EXPORT_JOB_MAX_ATTEMPTS', 3)
+
+
+def get_export_storage():
+    """
+    Returns the storage of the export results, which must not be served
+    publicly and must be shared by the workers and the web servers.
+    """
+    storage_class = getattr(settings, 'ALDRYN_FORMS_EXPORT_STORAGE', None)
+    location = getattr(settings, 'ALDRYN_FORMS_EXPORT_ROOT', None)
+
+    if storage_class:
+        return get_storage_class(storage_class)()
+
+    if not location:
+        raise ImproperlyConfigured(
+            'Background exports require ALDRYN_FORMS_EXPORT_STORAGE or ALDRYN_FORMS_EXPORT_ROOT to be set.'
+        )
+    return FileSystemStorage(location=location)
+
+
+@deconstructible
+class ExportStorage(Storage):
+    """
+    Delegates to the storage returned by get_export_storage,
+    so the settings aren't read when the models are imported.
+    """
+
+    def _open(self, name, mode='rb'):
+        return get_export_storage().open(name, mode)
+
+    def _save(self, name, content):
+        return get_export_storage().save(name, content)
+
+    def get_available_name(self, name, max_length=None):
+        return get_export_storage().get_available_name(name, max_length=max_length)
+
+    def delete(self, name):
+        get_export_storage().delete(name)
+
+    def exists(self, name):
+        return get_export_storage().exists(name)
+
+    def size(self, name):
+        return get_export_storage().size(name)
+
+
+def claim_export_job():
+    """
+    Returns the oldest pending export job, or a running job whose lease
+    expired, after marking it as running so concurrent workers
+    don't pick it up, None if there's none.
+    """
+    from .models import ExportJob
+
+    now = timezone.now()
+    pending = Q(status=ExportJob.STATUS_PENDING)
+    stalled = Q(status=ExportJob.STATUS_RUNNING, lease_expires_at__lt=now)
+
+    with transaction.atomic():
+        job = (
+            ExportJob
+            .objects
+            .select_for_update()
+            .filter(pending | stalled)
+            .order_by('created_at', 'pk')
+            .first()
+        )
+
+        if job is None:
+            return None
+
+        job.status = ExportJob.STATUS_RUNNING
+        job.started_at = now
+        job.attempts += 1
+        job.lease_expires_at = now + get_export_job_lease()
+        job.save(update_fields=['status', 'started_at', 'attempts', 'lease_expires_at'])
+    return job
+
+
+def write_export(exporter, fields, file_type, fileobj):
+    if file_type == 'csv':
+        exporter.write_csv(fields=fields, fileobj=fileobj)
+    elif file_type == 'xlsx':
+        exporter.write_xlsx(fields=fields, fileobj=fileobj)
+    else:
+        fileobj.write(exporter.get_dataset(fields=fields).xls)
+
+
+def run_export_job(job):
+    """
+    Writes the export of the given job to the export storage.
+
+    Returns True if the export succeeded, False otherwise.
+    """
+    from .admin.exporter import ParallelExporter
+    from .models import ExportJob
+
+    jobs = ExportJob.objects.filter(pk=job.pk)
+
+    def update_progress(processed):
+        jobs.update(processed=processed, lease_expires_at=timezone.now() + get_export_job_lease())
+
+    if job.attempts > get_export_job_max_attempts():
+        # the worker keeps dying on this export, e.g. running out of memory
+        job.status = ExportJob.STATUS_FAILED
+        job.error = 'The export was interrupted {} times.'.format(job.attempts - 1)
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'error', 'finished_at'])
+        return False
+
+    try:
+        queryset = job.get_queryset()
+        job.total = queryset.count()
+        jobs.update(total=job.total)
+
+        exporter = ParallelExporter(
+            queryset=queryset,
+            workers=get_export_workers(),
+            progress_callback=update_progress,
+        )
+
+        with TemporaryFile() as export_file:
+            write_export(exporter, job.get_fields(), job.file_type, export_file)
+            export_file.seek(0)
+            job.result.save(job.filename, File(export_file), save=False)
+    except Exception as error:  # noqa
+        logger.exception('Could not export the submissions of export job %s.', job.pk)
+        job.status = ExportJob.STATUS_FAILED
+        job.error = force_text(error)
+        # keeps the progress stored by update_progress
+        update_fields = ['total', 'result', 'status', 'error', 'finished_at']
+    else:
+        job.status = ExportJob.STATUS_DONE
+        job.processed = job.total
+        job.error = ''
+        update_fields = ['total', 'processed', 'result', 'status', 'error', 'finished_at']
+
+    job.finished_at = timezone.now()
+    job.save(update_fields=update_fields)
+    return job.status == ExportJob.STATUS_DONE
+
+
+def process_export_jobs(max_jobs=None):
+    """
+    Runs the pending export jobs, oldest first.
+
+    Returns a (done, failed) tuple with the number of jobs which succeeded
+    and the number of jobs which failed.
+    """
+    done = failed = 0
+
+    while max_jobs is None or done + failed < max_jobs:
+        job = claim_export_job()
+
+        if job is None:
+            break
+
+        if run_export_job(job):
+            done += 1
+        else:
+            failed += 1
+    return done, failed
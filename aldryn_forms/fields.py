@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+import json
+
+from django.db import models
+from django.utils.six import string_types
+from django.utils.translation import ugettext_lazy as _
+
+
+class FormDataField(models.Field):
+    """
+    Stores serialized form data as a native jsonb column on PostgreSQL
+    and as json text on other databases, which SQLite
+    can query using its JSON1 extension.
+    """
+    description = _('Form data')
+
+    def db_type(self, connection):
+        if connection.vendor == 'postgresql':
+            return 'jsonb'
+        return models.TextField().db_type(connection)
+
+    def from_db_value(self, value, *args, **kwargs):
+        if value is None or not isinstance(value, string_types):
+            # psycopg2 decodes jsonb on its own
+            return value
+        return json.loads(value)
+
+    def to_python(self, value):
+        if isinstance(value, string_types):
+            return json.loads(value)
+        return value
+
+    def get_prep_value(self, value):
+        if value is None:
+            return None
+        return json.dumps(value)
+
+    def value_to_string(self, obj):
+        return self.get_prep_value(self.value_from_object(obj))
@@ -1,9 +1,14 @@
 # -*- coding: utf-8 -*-
+import re
+from uuid import uuid4
+
 from PIL import Image
 
 from django import forms
 from django.conf import settings
 from django.forms.forms import NON_FIELD_ERRORS
+from django.forms.utils import ErrorDict
+from django.utils.six import text_type
 from django.utils.translation import ugettext, ugettext_lazy as _
 
 from sizefield.utils import filesizeformat
@@ -12,6 +17,9 @@ from .models import FormSubmission, FormPlugin
 from .utils import add_form_error, get_user_model
 
 
+IDEMPOTENCY_TOKEN_RE = re.compile(r'^[0-9a-f]{32}$')
+
+
 class FileSizeCheckMixin(object):
     def __init__(self, *args, **kwargs):
         self.max_size = kwargs.pop('max_size', None)
@@ -80,6 +88,68 @@ class RestrictedImageField(FileSizeCheckMixin, forms.ImageField):
         return data
 
 
+class OptionChoicesMixin(object):
+    """
+    Serves the choices of a field from a list of already loaded options.
+
+    Unlike ModelChoiceField, neither rendering the field
+    nor validating the submitted option pks queries the database.
+    The cleaned value is the Option instance.
+    """
+
+    def __init__(self, options, empty_label=None, *args, **kwargs):
+        super(OptionChoicesMixin, self).__init__(*args, **kwargs)
+        self.options = list(options)
+        self.options_by_pk = dict((text_type(option.pk), option) for option in self.options)
+
+        choices = [(option.pk, text_type(option)) for option in self.options]
+
+        # same behaviour as ModelChoiceField
+        if empty_label is not None and not (self.required and self.initial is not None):
+            choices.insert(0, ('', empty_label))
+        self.choices = choices
+
+    def get_option(self, value):
+        try:
+            return self.options_by_pk[text_type(value)]
+        except KeyError:
+            raise forms.ValidationError(
+                self.error_messages['invalid_choice'],
+                code='invalid_choice',
+                params={'value': value},
+            )
+
+
+class OptionChoiceField(OptionChoicesMixin, forms.ChoiceField):
+
+    def __init__(self, options, empty_label='---------', *args, **kwargs):
+        super(OptionChoiceField, self).__init__(options, empty_label, *args, **kwargs)
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        return self.get_option(value)
+
+    def validate(self, value):
+        # to_python already made sure the option is valid
+        forms.Field.validate(self, value)
+
+
+class OptionMultipleChoiceField(OptionChoicesMixin, forms.MultipleChoiceField):
+
+    def to_python(self, value):
+        if not value:
+            return []
+        elif not isinstance(value, (list, tuple)):
+            raise forms.ValidationError(self.error_messages['invalid_list'], code='invalid_list')
+        return [self.get_option(val) for val in value]
+
+    def validate(self, value):
+        # to_python already made sure the options are valid
+        if self.required and not value:
+            raise forms.ValidationError(self.error_messages['required'], code='required')
+
+
 class FormSubmissionBaseForm(forms.Form):
 
     # these fields are internal.
@@ -89,20 +159,25 @@ class FormSubmissionBaseForm(forms.Form):
         widget=forms.HiddenInput()
     )
     form_plugin_id = forms.IntegerField(widget=forms.HiddenInput())
+    # identifies a rendered form so submitting it twice is processed once
+    idempotency_token = forms.CharField(widget=forms.HiddenInput(), required=False)
 
     def __init__(self, *args, **kwargs):
         self.form_plugin = kwargs.pop('form_plugin')
         self.request = kwargs.pop('request')
+        form_url = kwargs.pop('form_url', None)
         super(FormSubmissionBaseForm, self).__init__(*args, **kwargs)
         language = self.form_plugin.language
 
         self.instance = FormSubmission(
             name=self.form_plugin.name,
             language=language,
-            form_url=self.request.build_absolute_uri(self.request.path),
+            form_url=form_url or self.request.build_absolute_uri(self.request.path),
         )
         self.fields['language'].initial = language
         self.fields['form_plugin_id'].initial = self.form_plugin.pk
+        self.fields['idempotency_token'].initial = uuid4().hex
+        self.is_duplicate = False
 
     def _add_error(self, message, field=NON_FIELD_ERRORS):
         try:
@@ -110,6 +185,28 @@ class FormSubmissionBaseForm(forms.Form):
         except KeyError:
             self._errors[field] = self.error_class([message])
 
+    def get_idempotency_token(self):
+        """
+        Returns the submitted idempotency token, None if there's no valid one.
+        """
+        if not self.is_bound:
+            return None
+
+        token = self.data.get(self.add_prefix('idempotency_token')) or ''
+
+        if not IDEMPOTENCY_TOKEN_RE.match(token):
+            return None
+        return token
+
+    def set_duplicate(self):
+        """
+        Marks the form as a repeated submission of an accepted form.
+        It's then valid without being validated again.
+        """
+        self.is_duplicate = True
+        self._errors = ErrorDict()
+        self.cleaned_data = {}
+
     def get_serialized_fields(self, is_confirmation=False):
         """
         The `is_confirmation` flag indicates if the data will be used in a
@@ -10,6 +10,31 @@ def get_user_name(user):
     return name
 
 
+def get_field_occurrence_key(name, label):
+    """
+    Returns the key the occurrences of a submitted field are counted by,
+    fields with a label are counted per type and label.
+    """
+    label = label.strip()
+
+    if label:
+        return u'{}_{}'.format(name.rpartition('_')[0], label)
+    return name
+
+
+def get_field_id(name, label, occurrence):
+    """
+    Returns the id identifying a submitted field across submissions.
+    """
+    label = label.strip()
+
+    if label:
+        field_as_string = u'{}-{}'.format(label, name.rpartition('_')[0])
+    else:
+        field_as_string = name
+    return u'{}:{}'.format(field_as_string, occurrence)
+
+
 def is_form_element(plugin):
     # import here due because of circular imports
     from .cms_plugins import FormElement
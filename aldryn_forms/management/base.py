@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+import time
+
+from django.core.management.base import BaseCommand
+
+
+class RetryCommand(BaseCommand):
+    """
+    Base of the commands delivering pending rows in batches until
+    none is left, once or every --interval seconds.
+
+    Subclasses implement get_max_attempts, get_limit and send_pending.
+    """
+    # formatted with the number of sent and failed rows
+    summary = 'Sent {}, {} failed.'
+    max_attempts_help = 'Number of attempts after which a row is marked as failed.'
+    interval_help = 'Keep running and check for pending rows every given seconds.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-attempts',
+            type=int,
+            default=self.get_max_attempts(),
+            dest='max_attempts',
+            help=self.max_attempts_help,
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            dest='interval',
+            help=self.interval_help,
+        )
+
+    def get_max_attempts(self):
+        raise NotImplementedError
+
+    def get_limit(self, options):
+        """
+        Returns the number of rows sent per call of send_pending.
+        """
+        raise NotImplementedError
+
+    def send_pending(self, options):
+        """
+        Sends a batch of pending rows, returns a (sent, failed) tuple.
+        """
+        raise NotImplementedError
+
+    def handle(self, *args, **options):
+        while True:
+            total_sent = total_failed = 0
+
+            while True:
+                sent, failed = self.send_pending(options)
+                total_sent += sent
+                total_failed += failed
+
+                if sent + failed < self.get_limit(options):
+                    break
+
+            if total_sent or total_failed or not options['interval']:
+                self.stdout.write(self.summary.format(total_sent, total_failed))
+
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
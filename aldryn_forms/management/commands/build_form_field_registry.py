@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+from django.core.management.base import BaseCommand
+
+from aldryn_forms.models import FormSubmission, SubmittedField
+from aldryn_forms.utils import iterate_in_chunks
+
+
+class Command(BaseCommand):
+    help = 'Registers the fields of existing form submissions for export.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            dest='chunk_size',
+            help='Number of submissions loaded into memory at once.',
+        )
+
+    def handle(self, *args, **options):
+        fields = ['pk', 'name', 'language', 'sent_at'] + FormSubmission.get_form_data_fields()
+        submissions = FormSubmission.objects.only(*fields)
+        found_fields = {}
+
+        for submission in iterate_in_chunks(submissions, chunk_size=options['chunk_size']):
+            for field in submission.get_form_data():
+                if not field.label:
+                    continue
+
+                key = (submission.name, submission.language, field.field_id)
+                found_field = found_fields.get(key)
+
+                if found_field is None:
+                    found_fields[key] = SubmittedField.from_serialized_field(
+                        field,
+                        form_name=submission.name,
+                        language=submission.language,
+                        sent_at=submission.sent_at,
+                    )
+                else:
+                    found_field.first_seen_at = min(found_field.first_seen_at, submission.sent_at)
+                    found_field.last_seen_at = max(found_field.last_seen_at, submission.sent_at)
+
+        new_fields = []
+
+        for found_field in found_fields.values():
+            registered = SubmittedField.objects.filter(
+                form_name=found_field.form_name,
+                language=found_field.language,
+                field_id=found_field.field_id,
+            )
+
+            if not registered.exists():
+                new_fields.append(found_field)
+                continue
+
+            (
+                registered
+                .filter(first_seen_at__gt=found_field.first_seen_at)
+                .update(first_seen_at=found_field.first_seen_at)
+            )
+            (
+                registered
+                .filter(last_seen_at__lt=found_field.last_seen_at)
+                .update(last_seen_at=found_field.last_seen_at)
+            )
+
+        SubmittedField.objects.bulk_create(new_fields, batch_size=500)
+        self.stdout.write('Registered {} fields, {} new.'.format(len(found_fields), len(new_fields)))
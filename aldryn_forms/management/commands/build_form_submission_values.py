@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from aldryn_forms.models import FormSubmission, FormSubmissionValue
+from aldryn_forms.utils import iterate_in_chunks
+
+
+class Command(BaseCommand):
+    help = 'Stores the field values of form submissions which have none.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            dest='chunk_size',
+            help='Number of submissions processed at once.',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        submissions = (
+            FormSubmission
+            .objects
+            # a left join, unlike NOT IN it isn't reevaluated over the whole
+            # value table for every chunk
+            .filter(values__isnull=True)
+            .only('pk', *FormSubmission.get_form_data_fields())
+        )
+        values = []
+        count = 0
+
+        for submission in iterate_in_chunks(submissions, chunk_size=chunk_size):
+            values.extend(submission.build_values())
+            count += 1
+
+            if count % chunk_size == 0:
+                self.save_values(values)
+                values = []
+
+        self.save_values(values)
+        self.stdout.write('Stored the values of {} submissions.'.format(count))
+
+    def save_values(self, values):
+        if values:
+            with transaction.atomic():
+                FormSubmissionValue.objects.bulk_create(values, batch_size=500)
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from aldryn_forms.admin.exporter import Exporter, IncrementalExporter
+from aldryn_forms.models import ExportCursor
+
+
+class Command(BaseCommand):
+    help = (
+        'Exports the submissions of a form sent since the previous export '
+        'to the same consumer.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--consumer',
+            required=True,
+            dest='consumer',
+            help='Name of the consumer the export position is kept for.',
+        )
+        parser.add_argument(
+            '--form',
+            required=True,
+            dest='form_name',
+            help='Name of the exported form.',
+        )
+        parser.add_argument(
+            '--language',
+            default=settings.LANGUAGE_CODE,
+            dest='language',
+            help='Language of the exported form.',
+        )
+        parser.add_argument(
+            '--output',
+            required=True,
+            dest='output',
+            help='Path of the written file.',
+        )
+        parser.add_argument(
+            '--file-type',
+            default='csv',
+            choices=['csv', 'xlsx'],
+            dest='file_type',
+            help='Format of the written file.',
+        )
+        parser.add_argument(
+            '--fields',
+            default=None,
+            dest='fields',
+            help='Comma separated ids of the exported fields, defaults to all fields of the form.',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            dest='chunk_size',
+            help='Number of submissions loaded into memory at once.',
+        )
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            default=False,
+            dest='reset',
+            help='Export all submissions of the form again.',
+        )
+
+    def handle(self, *args, **options):
+        cursor, created = ExportCursor.objects.get_or_create(
+            consumer=options['consumer'],
+            form_name=options['form_name'],
+            language=options['language'],
+        )
+
+        if options['reset']:
+            cursor.reset()
+
+        if options['fields']:
+            fields = [field.strip() for field in options['fields'].split(',') if field.strip()]
+        else:
+            fields = self.get_all_fields(cursor)
+
+        if not fields:
+            raise CommandError('The form has no fields to export.')
+
+        exporter = IncrementalExporter(cursor=cursor)
+        exporter.chunk_size = options['chunk_size']
+
+        with open(options['output'], 'wb') as fileobj:
+            if options['file_type'] == 'xlsx':
+                exporter.write_xlsx(fields=fields, fileobj=fileobj)
+            else:
+                exporter.write_csv(fields=fields, fileobj=fileobj)
+
+        # only moved once the file is written so a failed export is repeated
+        if exporter.exported or options['reset']:
+            exporter.save_cursor()
+        self.stdout.write('Exported {} submissions.'.format(exporter.exported))
+
+    def get_all_fields(self, cursor):
+        current_fields, old_fields = Exporter(queryset=cursor.get_queryset()).get_fields_for_export()
+        return [field.field_id for field in current_fields + old_fields]
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+import time
+
+from django.core.management.base import BaseCommand
+
+from aldryn_forms.spool import flush_spool, get_flush_batch_size
+
+
+class Command(BaseCommand):
+    help = 'Stores the form submissions spooled by the buffered action in the database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=get_flush_batch_size(),
+            dest='batch_size',
+            help='Number of submissions stored at once.',
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            dest='interval',
+            help='Keep running and check for spooled submissions every given seconds.',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            stored = flush_spool(batch_size=options['batch_size'])
+
+            if stored or not options['interval']:
+                self.stdout.write('Stored {} submissions.'.format(stored))
+
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
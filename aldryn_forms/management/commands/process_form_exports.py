@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+import time
+
+from django.core.management.base import BaseCommand
+
+from aldryn_forms.exports import get_export_storage, process_export_jobs
+
+
+class Command(BaseCommand):
+    help = 'Writes the pending form submission exports to the export storage.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-jobs',
+            type=int,
+            default=None,
+            dest='max_jobs',
+            help='Number of exports processed before stopping.',
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            dest='interval',
+            help='Keep running and check for pending exports every given seconds.',
+        )
+
+    def handle(self, *args, **options):
+        # fails early if the storage isn't configured
+        get_export_storage()
+
+        while True:
+            done, failed = process_export_jobs(max_jobs=options['max_jobs'])
+
+            if done or failed or not options['interval']:
+                self.stdout.write('Processed {} exports, {} failed.'.format(done, failed))
+
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
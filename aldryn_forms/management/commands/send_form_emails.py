@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from aldryn_forms.management.base import RetryCommand
+from aldryn_forms.outbox import get_max_attempts, send_pending_messages
+
+
+class Command(RetryCommand):
+    help = 'Sends the form emails queued in the outbox.'
+    summary = 'Sent {} emails, {} failed.'
+    max_attempts_help = 'Number of attempts after which an email is marked as failed.'
+    interval_help = 'Keep running and check the outbox every given seconds.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            dest='batch_size',
+            help='Number of emails sent over a single connection.',
+        )
+        super(Command, self).add_arguments(parser)
+
+    def get_max_attempts(self):
+        return get_max_attempts()
+
+    def get_limit(self, options):
+        return options['batch_size']
+
+    def send_pending(self, options):
+        return send_pending_messages(batch_size=options['batch_size'], max_attempts=options['max_attempts'])
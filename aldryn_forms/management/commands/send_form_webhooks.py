@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from aldryn_forms.management.base import RetryCommand
+from aldryn_forms.webhooks import get_max_attempts, send_pending_deliveries
+
+
+class Command(RetryCommand):
+    help = 'Posts the batched and failed form submissions to the webhooks.'
+    summary = 'Posted {} submissions, {} failed.'
+    max_attempts_help = 'Number of attempts after which a submission is marked as failed.'
+    interval_help = 'Keep running and check for pending submissions every given seconds.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=100,
+            dest='limit',
+            help='Number of submissions claimed at once.',
+        )
+        super(Command, self).add_arguments(parser)
+
+    def get_max_attempts(self):
+        return get_max_attempts()
+
+    def get_limit(self, options):
+        return options['limit']
+
+    def send_pending(self, options):
+        return send_pending_deliveries(limit=options['limit'], max_attempts=options['max_attempts'])
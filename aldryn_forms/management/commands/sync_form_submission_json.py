@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from aldryn_forms.models import FormSubmission, is_json_data_storage_enabled
+from aldryn_forms.utils import iterate_in_chunks
+
+
+class Command(BaseCommand):
+    help = 'Copies the data of form submissions to the native json column.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            dest='chunk_size',
+            help='Number of submissions updated in a single transaction.',
+        )
+
+    def handle(self, *args, **options):
+        if not is_json_data_storage_enabled():
+            raise CommandError('ALDRYN_FORMS_JSON_DATA_STORAGE is not enabled.')
+
+        chunk_size = options['chunk_size']
+        submissions = FormSubmission.objects.filter(data_json__isnull=True).only('pk', 'data')
+        chunk = []
+        count = 0
+
+        for submission in iterate_in_chunks(submissions, chunk_size=chunk_size):
+            chunk.append(submission)
+            count += 1
+
+            if len(chunk) == chunk_size:
+                self.sync(chunk)
+                chunk = []
+
+        self.sync(chunk)
+        self.stdout.write('Synced the data of {} submissions.'.format(count))
+
+    def sync(self, submissions):
+        with transaction.atomic():
+            for submission in submissions:
+                (
+                    FormSubmission
+                    .objects
+                    .filter(pk=submission.pk)
+                    .update(data_json=submission.get_raw_form_data())
+                )
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-17 10:29
+from __future__ import unicode_literals
+
+from collections import OrderedDict
+import json
+
+from django.db import migrations, models
+
+
+def get_field_ids(form_data):
+    """
+    Returns the field ids of the serialized fields of a submission,
+    frozen as they were when the registry was added.
+    """
+    occurrences = {}
+    field_ids = []
+
+    for data in form_data:
+        label = data['label'].strip()
+        field_type = data['name'].rpartition('_')[0]
+
+        if label:
+            occurrence_key = u'{}_{}'.format(field_type, label)
+            field_as_string = u'{}-{}'.format(label, field_type)
+        else:
+            occurrence_key = data['name']
+            field_as_string = data['name']
+
+        occurrences[occurrence_key] = occurrences.get(occurrence_key, 0) + 1
+        field_ids.append(u'{}:{}'.format(field_as_string, occurrences[occurrence_key]))
+    return field_ids
+
+
+def register_submitted_fields(apps, schema_editor):
+    """
+    Registers the labeled fields of the existing submissions
+    so exports list the fields only found in old submissions.
+    """
+    db_alias = schema_editor.connection.alias
+    FormSubmission = apps.get_model('aldryn_forms', 'FormSubmission')
+    SubmittedField = apps.get_model('aldryn_forms', 'SubmittedField')
+    submissions = (
+        FormSubmission
+        .objects
+        .using(db_alias)
+        .order_by('pk')
+        .values_list('pk', 'name', 'language', 'sent_at', 'data')
+    )
+    found_fields = OrderedDict()
+    last_pk = 0
+
+    while True:
+        chunk = list(submissions.filter(pk__gt=last_pk)[:1000])
+
+        if not chunk:
+            break
+
+        for pk, name, language, sent_at, data in chunk:
+            try:
+                form_data = json.loads(data) if data else []
+            except ValueError:
+                form_data = []
+
+            for field, field_id in zip(form_data, get_field_ids(form_data)):
+                if not field['label']:
+                    continue
+
+                key = (name, language, field_id)
+                found_field = found_fields.get(key)
+
+                if found_field is None:
+                    found_fields[key] = SubmittedField(
+                        form_name=name,
+                        language=language,
+                        field_id=field_id,
+                        name=field['name'],
+                        label=field['label'],
+                        field_occurrence=int(field_id.rpartition(':')[2]),
+                        first_seen_at=sent_at,
+                        last_seen_at=sent_at,
+                    )
+                else:
+                    found_field.first_seen_at = min(found_field.first_seen_at, sent_at)
+                    found_field.last_seen_at = max(found_field.last_seen_at, sent_at)
+        last_pk = chunk[-1][0]
+
+    SubmittedField.objects.using(db_alias).bulk_create(found_fields.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aldryn_forms', '0012_outboxmessage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubmittedField',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('form_name', models.CharField(max_length=255, verbose_name='form name')),
+                ('language', models.CharField(max_length=10, verbose_name='form language')),
+                ('field_id', models.TextField(verbose_name='field id')),
+                ('name', models.CharField(max_length=255, verbose_name='name')),
+                ('label', models.TextField(verbose_name='label')),
+                ('field_occurrence', models.PositiveIntegerField(default=1, verbose_name='field occurrence')),
+                ('first_seen_at', models.DateTimeField(verbose_name='first seen at')),
+                ('last_seen_at', models.DateTimeField(verbose_name='last seen at')),
+            ],
+            options={
+                'verbose_name': 'Submitted field',
+                'verbose_name_plural': 'Submitted fields',
+            },
+        ),
+        migrations.AlterIndexTogether(
+            name='submittedfield',
+            index_together=set([('form_name', 'language')]),
+        ),
+        migrations.RunPython(register_submitted_fields, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-17 10:30
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aldryn_forms', '0013_submittedfield'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FormSubmissionValue',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field_id', models.CharField(db_index=True, max_length=512, verbose_name='field id')),
+                ('name', models.CharField(max_length=255, verbose_name='name')),
+                ('label', models.CharField(blank=True, max_length=255, verbose_name='label')),
+                ('value', models.TextField(blank=True, verbose_name='value')),
+                ('value_prefix', models.CharField(blank=True, editable=False, max_length=255, verbose_name='value prefix')),
+                ('submission', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='values', to='aldryn_forms.FormSubmission', verbose_name='form submission')),
+            ],
+            options={
+                'verbose_name': 'Form submission value',
+                'verbose_name_plural': 'Form submission values',
+            },
+        ),
+        migrations.AlterIndexTogether(
+            name='formsubmissionvalue',
+            index_together=set([('name', 'value_prefix')]),
+        ),
+    ]
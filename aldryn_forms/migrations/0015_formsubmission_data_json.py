@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-17 10:32
+from __future__ import unicode_literals
+
+import json
+
+import aldryn_forms.fields
+from django.conf import settings
+from django.db import migrations
+
+
+def forward_migration(apps, schema_editor):
+    if not getattr(settings, 'ALDRYN_FORMS_JSON_DATA_STORAGE', False):
+        # use the sync_form_submission_json command when enabling it later
+        return
+
+    db_alias = schema_editor.connection.alias
+    FormSubmission = apps.get_model('aldryn_forms', 'FormSubmission')
+    submissions = FormSubmission.objects.using(db_alias).filter(data_json__isnull=True).order_by('pk')
+    last_pk = 0
+
+    while True:
+        chunk = list(submissions.filter(pk__gt=last_pk).values_list('pk', 'data')[:1000])
+
+        if not chunk:
+            break
+
+        for pk, data in chunk:
+            try:
+                data_json = json.loads(data)
+            except ValueError:
+                data_json = []
+            submissions.filter(pk=pk).update(data_json=data_json)
+        last_pk = chunk[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aldryn_forms', '0014_formsubmissionvalue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='formsubmission',
+            name='data_json',
+            field=aldryn_forms.fields.FormDataField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(forward_migration, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-17 10:33
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aldryn_forms', '0015_formsubmission_data_json'),
+    ]
+
+    # the composite indexes are created before dropping
+    # the name index which they replace.
+    operations = [
+        migrations.AlterIndexTogether(
+            name='formsubmission',
+            index_together=set([('sent_at', 'id'), ('name', 'language', 'sent_at'), ('name', 'sent_at')]),
+        ),
+        migrations.AlterField(
+            model_name='formsubmission',
+            name='name',
+            field=models.CharField(editable=False, max_length=255, verbose_name='form name'),
+        ),
+    ]
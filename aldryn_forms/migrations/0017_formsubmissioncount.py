@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-17 10:38
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def forward_migration(apps, schema_editor):
+    db_alias = schema_editor.connection.alias
+    FormSubmission = apps.get_model('aldryn_forms', 'FormSubmission')
+    FormSubmissionCount = apps.get_model('aldryn_forms', 'FormSubmissionCount')
+    counts = (
+        FormSubmission
+        .objects
+        .using(db_alias)
+        .order_by()
+        .values_list('name', 'language')
+        .annotate(count=Count('pk'))
+    )
+    FormSubmissionCount.objects.using(db_alias).bulk_create(
+        FormSubmissionCount(name=name, language=language, count=count)
+        for name, language, count in counts
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aldryn_forms', '0016_formsubmission_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FormSubmissionCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, verbose_name='form name')),
+                ('language', models.CharField(max_length=10, verbose_name='form language')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='count')),
+            ],
+            options={
+                'verbose_name': 'Form submission count',
+                'verbose_name_plural': 'Form submission counts',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='formsubmissioncount',
+            unique_together=set([('name', 'language')]),
+        ),
+        migrations.RunPython(forward_migration, migrations.RunPython.noop),
+    ]
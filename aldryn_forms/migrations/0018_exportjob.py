@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-17 10:42
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+import aldryn_forms.exports
+import aldryn_forms.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('aldryn_forms', '0017_formsubmissioncount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('form_name', models.CharField(max_length=255, verbose_name='form name')),
+                ('language', models.CharField(max_length=10, verbose_name='form language')),
+                ('from_date', models.DateField(blank=True, null=True, verbose_name='from date')),
+                ('to_date', models.DateField(blank=True, null=True, verbose_name='to date')),
+                ('fields', models.TextField(verbose_name='fields')),
+                ('file_type', models.CharField(max_length=10, verbose_name='file type')),
+                ('filename', models.CharField(max_length=255, verbose_name='filename')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10, verbose_name='status')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='total')),
+                ('processed', models.PositiveIntegerField(default=0, verbose_name='processed')),
+                ('result', models.FileField(blank=True, max_length=255, storage=aldryn_forms.exports.ExportStorage(), upload_to=aldryn_forms.models.get_export_result_path, verbose_name='result')),
+                ('error', models.TextField(blank=True, verbose_name='error')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created at')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='started at')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='finished at')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='attempts')),
+                ('lease_expires_at', models.DateTimeField(blank=True, null=True, verbose_name='lease expires at')),
+                ('created_by', models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='created by')),
+            ],
+            options={
+                'verbose_name': 'Export job',
+                'verbose_name_plural': 'Export jobs',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AlterIndexTogether(
+            name='exportjob',
+            index_together=set([('status', 'created_at')]),
+        ),
+    ]
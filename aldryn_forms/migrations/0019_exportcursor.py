@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-17 10:44
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def set_inserted_at(apps, schema_editor):
+    """
+    Starts the incremental exports of the existing submissions
+    from the dates they were sent at.
+    """
+    db_alias = schema_editor.connection.alias
+    FormSubmission = apps.get_model('aldryn_forms', 'FormSubmission')
+    submissions = FormSubmission.objects.using(db_alias).order_by('pk')
+    last_pk = 0
+
+    while True:
+        pks = list(submissions.filter(pk__gt=last_pk).values_list('pk', flat=True)[:1000])
+
+        if not pks:
+            break
+
+        submissions.filter(pk__gte=pks[0], pk__lte=pks[-1]).update(inserted_at=models.F('sent_at'))
+        last_pk = pks[-1]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aldryn_forms', '0018_exportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='formsubmission',
+            name='inserted_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='inserted at'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(set_inserted_at, migrations.RunPython.noop),
+        migrations.AlterIndexTogether(
+            name='formsubmission',
+            index_together=set([
+                ('name', 'language', 'sent_at'),
+                ('name', 'sent_at'),
+                ('sent_at', 'id'),
+                ('name', 'language', 'inserted_at'),
+            ]),
+        ),
+        migrations.CreateModel(
+            name='ExportCursor',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('consumer', models.CharField(max_length=100, verbose_name='consumer')),
+                ('form_name', models.CharField(max_length=255, verbose_name='form name')),
+                ('language', models.CharField(max_length=10, verbose_name='form language')),
+                ('last_inserted_at', models.DateTimeField(blank=True, null=True, verbose_name='last inserted at')),
+                ('last_id', models.PositiveIntegerField(blank=True, null=True, verbose_name='last id')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='updated at')),
+            ],
+            options={
+                'verbose_name': 'Export cursor',
+                'verbose_name_plural': 'Export cursors',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='exportcursor',
+            unique_together=set([('consumer', 'form_name', 'language')]),
+        ),
+    ]
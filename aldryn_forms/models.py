@@ -1,15 +1,22 @@
 # -*- coding: utf-8 -*-
-from collections import defaultdict, namedtuple, OrderedDict
+from collections import Counter, defaultdict, namedtuple, OrderedDict
+from datetime import datetime, timedelta
 from functools import partial
 import json
+import os
 import warnings
+from uuid import uuid4
 
 from cms.models.fields import PageField
 from cms.models.pluginmodel import CMSPlugin
 from cms.utils.plugins import build_plugin_tree, downcast_plugins
 from django.conf import settings
-from django.db import models
+from django.core.mail import EmailMultiAlternatives
+from django.db import IntegrityError, OperationalError, connections, models, router, transaction
+from django.db.models import Case, F, Sum, Value, When
+from django.db.models.expressions import RawSQL
 from django.db.models.functions import Coalesce
+from django.utils import timezone
 from django.utils.encoding import python_2_unicode_compatible
 from django.utils.functional import cached_property
 from django.utils.six import text_type
@@ -19,7 +26,11 @@ from djangocms_attributes_field.fields import AttributesField
 from filer.fields.folder import FilerFolderField
 from sizefield.models import FileSizeField
 
-from .helpers import is_form_element
+from .cache import form_schema_cache
+from .compat import prefetch_related_objects
+from .exports import ExportStorage
+from .fields import FormDataField
+from .helpers import get_field_id, get_field_occurrence_key, is_form_element
 from .utils import ALDRYN_FORMS_ACTION_BACKEND_KEY_MAX_SIZE, action_backend_choices
 
 AUTH_USER_MODEL = getattr(settings, 'AUTH_USER_MODEL', 'auth.User')
@@ -63,6 +74,62 @@ BaseSerializedFormField = namedtuple(
 )
 
 
+class FormFields(object):
+    """
+    Immutable, ordered collection of the fields of a form.
+
+    Fields can be looked up by name, by plugin pk or by label
+    without iterating over the whole collection.
+    """
+
+    __slots__ = ('_fields', '_by_name', '_by_pk', '_by_label', '_form_elements')
+
+    def __init__(self, fields, form_elements):
+        fields = tuple(fields)
+        by_label = defaultdict(list)
+
+        for field in fields:
+            by_label[field.label].append(field)
+
+        set_attribute = super(FormFields, self).__setattr__
+        set_attribute('_fields', fields)
+        set_attribute('_by_name', OrderedDict((field.name, field) for field in fields))
+        set_attribute('_by_pk', dict((field.plugin_instance.pk, field) for field in fields))
+        set_attribute('_by_label', dict((label, tuple(_fields)) for label, _fields in by_label.items()))
+        # the form elements these fields were computed from
+        set_attribute('_form_elements', form_elements)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('{} is immutable.'.format(self.__class__.__name__))
+
+    def __iter__(self):
+        return iter(self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def __getitem__(self, index):
+        return self._fields[index]
+
+    def __repr__(self):
+        return '<{}: {!r}>'.format(self.__class__.__name__, list(self._fields))
+
+    def is_computed_from(self, form_elements):
+        return self._form_elements is form_elements
+
+    def get_by_name(self, name):
+        return self._by_name[name]
+
+    def get_by_pk(self, pk):
+        return self._by_pk[pk]
+
+    def get_by_label(self, label):
+        return self._by_label.get(label, ())
+
+    def as_ordered_dict(self):
+        return OrderedDict(self._by_name)
+
+
 class SerializedFormField(BaseSerializedFormField):
 
     # For _asdict() with Py3K
@@ -70,14 +137,7 @@ class SerializedFormField(BaseSerializedFormField):
 
     @property
     def field_id(self):
-        field_label = self.label.strip()
-
-        if field_label:
-            field_as_string = u'{}-{}'.format(field_label, self.field_type)
-        else:
-            field_as_string = self.name
-        field_id = u'{}:{}'.format(field_as_string, self.field_occurrence)
-        return field_id
+        return get_field_id(self.name, self.label, self.field_occurrence)
 
     @property
     def field_type_occurrence(self):
@@ -107,7 +167,7 @@ class BaseFormPlugin(CMSPlugin):
     ]
 
     _form_elements = None
-    _form_field_key_cache = None
+    _form_fields = None
 
     name = models.CharField(
         verbose_name=_('Name'),
@@ -222,6 +282,20 @@ class BaseFormPlugin(CMSPlugin):
         return
 
     def get_form_fields(self):
+        """
+        Returns the fields of this form as a FormFields collection.
+
+        The result is computed once per plugin instance and
+        is recomputed only if the form elements are reset.
+        """
+        form_elements = self.get_form_elements()
+
+        if self._form_fields is None or not self._form_fields.is_computed_from(form_elements):
+            fields = self._get_form_fields(form_elements)
+            self._form_fields = FormFields(fields, form_elements=form_elements)
+        return self._form_fields
+
+    def _get_form_fields(self, form_elements):
         from .cms_plugins import Field
 
         fields = []
@@ -236,7 +310,6 @@ class BaseFormPlugin(CMSPlugin):
         # This is used as an identifier for the field within this form.
         field_type_occurrences = defaultdict(lambda: 1)
 
-        form_elements = self.get_form_elements()
         field_plugins = [
             plugin for plugin in form_elements
             if issubclass(plugin.get_plugin_class(), Field)
@@ -275,15 +348,59 @@ class BaseFormPlugin(CMSPlugin):
         return fields
 
     def get_form_field_name(self, field):
-        if self._form_field_key_cache is None:
-            self._form_field_key_cache = {}
+        return self.get_form_fields().get_by_pk(field.pk).name
+
+    def prefetch_field_options(self):
+        """
+        Loads the options of all the choice fields
+        of this form with a single query.
+        """
+        option_plugins = [
+            field.plugin_instance for field in self.get_form_fields()
+            if field.plugin_instance.get_plugin_class().has_options
+        ]
+
+        if option_plugins:
+            prefetch_related_objects(option_plugins, 'option_set')
+
+    def get_form_schema(self):
+        """
+        Returns a JSON serializable description of the form fields
+        which allows clients to validate submissions before sending them.
+
+        The schema is cached per form version and must not be modified.
+        """
+        schema = form_schema_cache.get(self)
+
+        if schema is None:
+            self.prefetch_field_options()
+
+            fields = []
+
+            for field in self.get_form_fields():
+                plugin = field.plugin_instance.get_plugin_class_instance()
+                # get_field_schema can return None
+                # to exclude the field from the schema.
+                field_schema = plugin.get_field_schema(field)
+
+                if field_schema:
+                    fields.append(field_schema)
 
-        if field.pk not in self._form_field_key_cache:
-            fields_by_key = self.get_form_fields_by_name()
+            schema = {
+                'id': self.pk,
+                'name': self.name,
+                'fields': fields,
+            }
+            form_schema_cache.set(self, schema)
+        return schema
 
-            for name, _field in fields_by_key.items():
-                self._form_field_key_cache[_field.plugin_instance.pk] = name
-        return self._form_field_key_cache[field.pk]
+    def get_form_version(self):
+        """
+        Returns a value which changes whenever the form
+        or any of its elements is changed, added, removed or moved.
+        """
+        plugins = [self] + self.get_form_elements()
+        return tuple((plugin.pk, plugin.changed_date) for plugin in plugins)
 
     def get_form_fields_as_choices(self):
         fields = self.get_form_fields()
@@ -292,9 +409,7 @@ class BaseFormPlugin(CMSPlugin):
             yield (field.name, field.label)
 
     def get_form_fields_by_name(self):
-        fields = self.get_form_fields()
-        fields_by_name = OrderedDict((field.name, field) for field in fields)
-        return fields_by_name
+        return self.get_form_fields().as_ordered_dict()
 
     def get_form_elements(self):
         from .utils import get_nested_plugins
@@ -317,9 +432,13 @@ class BaseFormPlugin(CMSPlugin):
 
         if self._form_elements is None:
             children = get_nested_plugins(self)
-            children_instances = downcast_plugins(children)
+
+            if any(child.__class__ is CMSPlugin for child in children):
+                # Plugins rendered by the cms or loaded through get_plugin_tree
+                # are already downcasted, only hit the database if needed.
+                children = downcast_plugins(children)
             self._form_elements = [
-                p for p in children_instances if is_form_element(p)]
+                p for p in children if is_form_element(p)]
         return self._form_elements
 
 
@@ -536,15 +655,127 @@ class FormButtonPlugin(CMSPlugin):
         return self.label
 
 
+def is_json_data_storage_enabled():
+    return getattr(settings, 'ALDRYN_FORMS_JSON_DATA_STORAGE', False)
+
+
+_json1_extension = {}
+
+
+def has_json1_extension(connection):
+    """
+    Returns True if the SQLite library of the connection
+    has the JSON1 functions, which are optional before 3.38.
+    """
+    if connection.alias not in _json1_extension:
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT json('[]')")
+        except OperationalError:
+            _json1_extension[connection.alias] = False
+        else:
+            _json1_extension[connection.alias] = True
+    return _json1_extension[connection.alias]
+
+
+def get_field_registry_resolution():
+    """
+    Returns how outdated the last time a registered field
+    was seen can be, exports account for it.
+    """
+    return timedelta(seconds=getattr(settings, 'ALDRYN_FORMS_FIELD_REGISTRY_RESOLUTION', 60 * 60 * 24))
+
+
+class FormSubmissionQuerySet(models.QuerySet):
+
+    def for_export(self, name, language, from_date=None, to_date=None):
+        """
+        Returns the submissions of the given form and language
+        sent between the given dates, both inclusive.
+        """
+        queryset = self.filter(name=name, language=language)
+
+        if from_date:
+            lower = datetime(*from_date.timetuple()[:6])  # inclusive
+            queryset = queryset.filter(sent_at__gte=lower)
+
+        if to_date:
+            upper = datetime(*to_date.timetuple()[:6]) + timedelta(days=1)  # exclusive
+            queryset = queryset.filter(sent_at__lt=upper)
+        return queryset
+
+    def with_field_value(self, name, value, lookup='exact'):
+        """
+        Returns the submissions where the field with the given name
+        matches the value, filtered in the database.
+
+        Exact lookups query the json data directly when json data storage
+        is enabled on PostgreSQL or SQLite, other lookups use
+        the values stored in FormSubmissionValue. Exact and startswith
+        lookups use its (name, value prefix) index.
+        """
+        if lookup == 'exact' and self._can_filter_json_data():
+            return self._filter_json_data({'name': name, 'value': value})
+
+        values = FormSubmissionValue.objects.filter(name=name)
+
+        if lookup == 'exact':
+            values = values.filter(value_prefix=FormSubmissionValue.get_value_prefix(value))
+        elif lookup == 'startswith':
+            values = values.filter(value_prefix__startswith=FormSubmissionValue.get_value_prefix(value))
+
+        values = values.filter(**{'value__{}'.format(lookup): value})
+        return self.filter(pk__in=values.values('submission'))
+
+    def with_field(self, name):
+        """
+        Returns the submissions which contain a field with the given name.
+        """
+        if self._can_filter_json_data():
+            return self._filter_json_data({'name': name})
+
+        values = FormSubmissionValue.objects.filter(name=name)
+        return self.filter(pk__in=values.values('submission'))
+
+    def _can_filter_json_data(self):
+        if not is_json_data_storage_enabled():
+            return False
+
+        connection = connections[self.db]
+
+        if connection.vendor == 'sqlite':
+            return has_json1_extension(connection)
+        return connection.vendor == 'postgresql'
+
+    def _filter_json_data(self, field_data):
+        connection = connections[self.db]
+        quote_name = connection.ops.quote_name
+        column = '{}.{}'.format(quote_name(self.model._meta.db_table), quote_name('data_json'))
+
+        if connection.vendor == 'postgresql':
+            sql = '{} @> %s::jsonb'.format(column)
+            params = [json.dumps([field_data])]
+        else:
+            # the keys are passed as json paths
+            keys = sorted(field_data)
+            conditions = ' AND '.join(['json_extract(json_each.value, %s) = %s'] * len(keys))
+            sql = 'EXISTS (SELECT 1 FROM json_each({}) WHERE {})'.format(column, conditions)
+            params = [param for key in keys for param in ('$.' + key, field_data[key])]
+
+        expression = RawSQL(sql, params, output_field=models.BooleanField())
+        return self.annotate(_has_field_data=expression).filter(_has_field_data=True)
+
+
 @python_2_unicode_compatible
 class FormSubmission(models.Model):
     name = models.CharField(
         max_length=255,
         verbose_name=_('form name'),
-        db_index=True,
         editable=False
     )
     data = models.TextField(blank=True, editable=False)
+    # only used when ALDRYN_FORMS_JSON_DATA_STORAGE is enabled
+    data_json = FormDataField(blank=True, null=True, editable=False)
     recipients = models.TextField(
         verbose_name=_('users notified'),
         blank=True,
@@ -563,9 +794,26 @@ class FormSubmission(models.Model):
         blank=True,
     )
     sent_at = models.DateTimeField(auto_now_add=True)
+    # unlike sent_at, set when the row is stored, e.g. when flushing
+    # buffered submissions, orders the incremental exports
+    inserted_at = models.DateTimeField(verbose_name=_('inserted at'), auto_now_add=True)
+    # identifies a buffered submission so flushing it again doesn't store it twice
+    spool_uuid = models.UUIDField(verbose_name=_('spool uuid'), blank=True, null=True, unique=True, editable=False)
+
+    objects = FormSubmissionQuerySet.as_manager()
 
     class Meta:
         ordering = ['-sent_at']
+        # match the export filters and the admin filters and ordering,
+        # name lookups use the leading column of both.
+        # (sent_at, id) matches the admin keyset pagination,
+        # (name, language, inserted_at) the incremental exports.
+        index_together = [
+            ['name', 'language', 'sent_at'],
+            ['name', 'sent_at'],
+            ['sent_at', 'id'],
+            ['name', 'language', 'inserted_at'],
+        ]
         verbose_name = _('Form submission')
         verbose_name_plural = _('Form submissions')
 
@@ -573,38 +821,46 @@ class FormSubmission(models.Model):
         return self.name
 
     def _form_data_hook(self, data, occurrences):
-        field_label = data['label'].strip()
+        occurrence_key = get_field_occurrence_key(data['name'], data['label'])
 
-        if field_label:
-            field_type = data['name'].rpartition('_')[0]
-            field_id = u'{}_{}'.format(field_type, field_label)
-        else:
-            field_id = data['name']
-
-        if field_id in occurrences:
-            occurrences[field_id] += 1
+        if occurrence_key in occurrences:
+            occurrences[occurrence_key] += 1
 
-        data['field_occurrence'] = occurrences[field_id]
+        data['field_occurrence'] = occurrences[occurrence_key]
         return SerializedFormField(**data)
 
     def _recipients_hook(self, data):
         return Recipient(**data)
 
-    def get_form_data(self):
-        occurrences = defaultdict(lambda: 1)
+    @classmethod
+    def get_form_data_fields(cls):
+        """
+        Returns the names of the fields to load
+        for reading the form data of submissions.
+
+        The json column isn't used, it's empty for submissions which
+        weren't synced and decoding it isn't measurably faster.
+        """
+        return ['data']
 
-        data_hook = partial(self._form_data_hook, occurrences=occurrences)
+    def get_raw_form_data(self):
+        if 'data_json' not in self.get_deferred_fields() and self.data_json is not None:
+            return self.data_json
 
         try:
-            form_data = json.loads(
-                self.data,
-                object_hook=data_hook,
-            )
+            form_data = json.loads(self.data)
         except ValueError:
             # TODO: Log this?
             form_data = []
         return form_data
 
+    def get_form_data(self):
+        occurrences = defaultdict(lambda: 1)
+        # The data is decoded without an object hook
+        # because the hook can't be used for native json columns.
+        return [self._form_data_hook(dict(data), occurrences)
+                for data in self.get_raw_form_data()]
+
     def get_recipients(self):
         try:
             recipients = json.loads(
@@ -622,7 +878,581 @@ class FormSubmission(models.Model):
 
         self.data = json.dumps(fields_as_dicts)
 
+        if is_json_data_storage_enabled():
+            self.data_json = fields_as_dicts
+
     def set_recipients(self, recipients):
         raw_recipients = [
             {'name': rec[0], 'email': rec[1]} for rec in recipients]
         self.recipients = json.dumps(raw_recipients)
+
+    def save(self, *args, **kwargs):
+        created = self._state.adding
+        super(FormSubmission, self).save(*args, **kwargs)
+
+        form_data = self.get_form_data()
+
+        if created:
+            FormSubmissionCount.increment_on_commit(name=self.name, language=self.language)
+        else:
+            self.values.all().delete()
+        FormSubmissionValue.objects.bulk_create(self.build_values(form_data))
+        self.update_field_registry(form_data)
+
+    def build_values(self, form_data=None):
+        """
+        Returns the unsaved FormSubmissionValue instances
+        for the fields of this submission.
+        """
+        if form_data is None:
+            form_data = self.get_form_data()
+        return [FormSubmissionValue.from_serialized_field(self, field) for field in form_data]
+
+    def update_field_registry(self, form_data=None):
+        """
+        Records the labeled fields of this submission in the field registry
+        used to list the fields available for export.
+        """
+        if form_data is None:
+            form_data = self.get_form_data()
+
+        SubmittedField.register_fields(
+            form_name=self.name,
+            language=self.language,
+            seen_fields=[(form_data, self.sent_at)],
+        )
+
+    @classmethod
+    def bulk_save(cls, submissions):
+        """
+        Stores new submissions with their values, counts and registered
+        fields using a few queries per batch instead of per submission.
+        The dates the submissions were sent at are kept.
+
+        Databases which can't return the ids of bulk inserted rows
+        insert the submissions one by one, in a single transaction.
+        """
+        if not submissions:
+            return
+
+        sent_at = [submission.sent_at for submission in submissions]
+        connection = connections[router.db_for_write(cls)]
+
+        with transaction.atomic():
+            if getattr(connection.features, 'can_return_ids_from_bulk_insert', False):
+                cls.objects.bulk_create(submissions)
+            else:
+                for submission in submissions:
+                    # skips storing the values, counts and fields one by one
+                    super(FormSubmission, submission).save(force_insert=True)
+
+            # auto_now_add replaced the dates
+            for submission, submission_sent_at in zip(submissions, sent_at):
+                submission.sent_at = submission_sent_at or submission.sent_at
+
+            (
+                cls
+                .objects
+                .filter(pk__in=[submission.pk for submission in submissions])
+                .update(sent_at=Case(
+                    *[When(pk=submission.pk, then=Value(submission.sent_at)) for submission in submissions],
+                    output_field=models.DateTimeField()
+                ))
+            )
+
+            form_data = [(submission, submission.get_form_data()) for submission in submissions]
+            FormSubmissionValue.objects.bulk_create(
+                value for submission, data in form_data
+                for value in submission.build_values(data)
+            )
+
+            counts = Counter((submission.name, submission.language) for submission in submissions)
+
+            for (name, language), count in counts.items():
+                FormSubmissionCount.increment_on_commit(name=name, language=language, count=count)
+
+            seen_fields = defaultdict(list)
+
+            for submission, data in form_data:
+                seen_fields[(submission.name, submission.language)].append((data, submission.sent_at))
+
+            for (name, language), fields in seen_fields.items():
+                SubmittedField.register_fields(form_name=name, language=language, seen_fields=fields)
+
+
+@python_2_unicode_compatible
+class FormSubmissionCount(models.Model):
+    """
+    The number of submissions per form and language,
+    allows listing the submitted forms without scanning all submissions.
+    """
+    name = models.CharField(verbose_name=_('form name'), max_length=255)
+    language = models.CharField(verbose_name=_('form language'), max_length=10)
+    count = models.PositiveIntegerField(verbose_name=_('count'), default=0)
+
+    class Meta:
+        unique_together = [['name', 'language']]
+        verbose_name = _('Form submission count')
+        verbose_name_plural = _('Form submission counts')
+
+    def __str__(self):
+        return u'{} ({})'.format(self.name, self.language)
+
+    @classmethod
+    def increment(cls, name, language, count=1):
+        counts = cls.objects.filter(name=name, language=language)
+
+        if counts.update(count=F('count') + count):
+            return
+
+        try:
+            with transaction.atomic():
+                cls.objects.create(name=name, language=language, count=count)
+        except IntegrityError:
+            # created by a concurrent submission
+            counts.update(count=F('count') + count)
+
+    @classmethod
+    def increment_on_commit(cls, name, language, count=1):
+        """
+        Increments the count once the current transaction is committed,
+        concurrent submissions of a form don't wait for each other
+        while their counter row is locked.
+        """
+        transaction.on_commit(partial(cls.increment, name=name, language=language, count=count))
+
+    @classmethod
+    def decrement(cls, name, language):
+        counts = cls.objects.filter(name=name, language=language)
+        counts.filter(count__gt=0).update(count=F('count') - 1)
+        counts.filter(count=0).delete()
+
+    @classmethod
+    def get_form_names(cls):
+        """
+        Returns (name, count) tuples of the submitted forms ordered by name.
+        """
+        return (
+            cls
+            .objects
+            .values_list('name')
+            .annotate(total=Sum('count'))
+            .order_by('name')
+        )
+
+
+def decrement_submission_count(sender, instance, **kwargs):
+    transaction.on_commit(partial(FormSubmissionCount.decrement, name=instance.name, language=instance.language))
+
+
+@python_2_unicode_compatible
+class FormSubmissionValue(models.Model):
+    """
+    The value of a single submitted field,
+    allows filtering submissions by field value in the database.
+    """
+    submission = models.ForeignKey(
+        FormSubmission,
+        verbose_name=_('form submission'),
+        related_name='values',
+        on_delete=models.CASCADE,
+    )
+    field_id = models.CharField(verbose_name=_('field id'), max_length=512, db_index=True)
+    name = models.CharField(verbose_name=_('name'), max_length=255)
+    label = models.CharField(verbose_name=_('label'), max_length=255, blank=True)
+    value = models.TextField(verbose_name=_('value'), blank=True)
+    # text columns can't be indexed on every database
+    value_prefix = models.CharField(verbose_name=_('value prefix'), max_length=255, blank=True, editable=False)
+
+    class Meta:
+        index_together = [['name', 'value_prefix']]
+        verbose_name = _('Form submission value')
+        verbose_name_plural = _('Form submission values')
+
+    def __str__(self):
+        return self.field_id
+
+    @classmethod
+    def get_value_prefix(cls, value):
+        return text_type(value)[:cls._meta.get_field('value_prefix').max_length]
+
+    @classmethod
+    def from_serialized_field(cls, submission, field):
+        value = text_type(field.value)
+        return cls(
+            submission=submission,
+            field_id=field.field_id,
+            name=field.name,
+            label=field.label,
+            value=value,
+            value_prefix=cls.get_value_prefix(value),
+        )
+
+
+@python_2_unicode_compatible
+class SubmittedField(models.Model):
+    """
+    A field found in the submissions of a form,
+    allows listing the fields of a form without reading its submissions.
+
+    There's no unique constraint because field ids can be longer
+    than an index allows, concurrent submissions
+    can register the same field twice.
+    """
+    form_name = models.CharField(verbose_name=_('form name'), max_length=255)
+    language = models.CharField(verbose_name=_('form language'), max_length=10)
+    field_id = models.TextField(verbose_name=_('field id'))
+    name = models.CharField(verbose_name=_('name'), max_length=255)
+    label = models.TextField(verbose_name=_('label'))
+    field_occurrence = models.PositiveIntegerField(verbose_name=_('field occurrence'), default=1)
+    first_seen_at = models.DateTimeField(verbose_name=_('first seen at'))
+    last_seen_at = models.DateTimeField(verbose_name=_('last seen at'))
+
+    class Meta:
+        index_together = [['form_name', 'language']]
+        verbose_name = _('Submitted field')
+        verbose_name_plural = _('Submitted fields')
+
+    def __str__(self):
+        return self.field_id
+
+    @classmethod
+    def from_serialized_field(cls, field, form_name, language, sent_at):
+        return cls(
+            form_name=form_name,
+            language=language,
+            field_id=field.field_id,
+            name=field.name,
+            label=field.label,
+            field_occurrence=field.field_occurrence,
+            first_seen_at=sent_at,
+            last_seen_at=sent_at,
+        )
+
+    @classmethod
+    def register_fields(cls, form_name, language, seen_fields):
+        """
+        Records the labeled fields seen in submissions of the given form.
+
+        ``seen_fields`` is a list of (form data, sent at) tuples.
+        """
+        # field id: [field, first seen at, last seen at]
+        fields = OrderedDict()
+
+        for form_data, sent_at in seen_fields:
+            for field in form_data:
+                if not field.label:
+                    continue
+
+                seen = fields.get(field.field_id)
+
+                if seen is None:
+                    fields[field.field_id] = [field, sent_at, sent_at]
+                else:
+                    seen[1] = min(seen[1], sent_at)
+                    seen[2] = max(seen[2], sent_at)
+
+        if not fields:
+            return
+
+        registry = cls.objects.filter(form_name=form_name, language=language)
+        registered = dict(registry.filter(field_id__in=list(fields)).values_list('field_id', 'last_seen_at'))
+        resolution = get_field_registry_resolution()
+        stale_by_last_seen = defaultdict(list)
+
+        for field_id, stored_last_seen_at in registered.items():
+            last_seen_at = fields[field_id][2]
+
+            # the rows of fields seen in every submission aren't rewritten each time
+            if last_seen_at - stored_last_seen_at >= resolution:
+                stale_by_last_seen[last_seen_at].append(field_id)
+
+        for last_seen_at, field_ids in stale_by_last_seen.items():
+            (
+                registry
+                .filter(field_id__in=field_ids, last_seen_at__lt=last_seen_at)
+                .update(last_seen_at=last_seen_at)
+            )
+
+        new_fields = []
+
+        for field_id, (field, first_seen_at, last_seen_at) in fields.items():
+            if field_id in registered:
+                continue
+
+            new_field = cls.from_serialized_field(
+                field,
+                form_name=form_name,
+                language=language,
+                sent_at=first_seen_at,
+            )
+            new_field.last_seen_at = last_seen_at
+            new_fields.append(new_field)
+
+        if new_fields:
+            cls.objects.bulk_create(new_fields)
+
+    def get_serialized_field(self):
+        return SerializedFormField(
+            name=self.name,
+            label=self.label,
+            field_occurrence=self.field_occurrence,
+            value='',
+        )
+
+
+@python_2_unicode_compatible
+class OutboxMessage(models.Model):
+    """
+    An email constructed during a form submission
+    which is delivered later on by the send_form_emails command.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+
+    STATUS_CHOICES = (
+        (STATUS_PENDING, _('Pending')),
+        (STATUS_SENT, _('Sent')),
+        (STATUS_FAILED, _('Failed')),
+    )
+
+    subject = models.TextField(verbose_name=_('subject'), blank=True)
+    body = models.TextField(verbose_name=_('body'), blank=True)
+    from_email = models.CharField(verbose_name=_('from email'), max_length=255, blank=True)
+    # recipients, headers and alternatives are stored as json
+    to = models.TextField(verbose_name=_('to'), blank=True)
+    cc = models.TextField(verbose_name=_('cc'), blank=True)
+    bcc = models.TextField(verbose_name=_('bcc'), blank=True)
+    reply_to = models.TextField(verbose_name=_('reply to'), blank=True)
+    headers = models.TextField(verbose_name=_('headers'), blank=True)
+    alternatives = models.TextField(verbose_name=_('alternatives'), blank=True)
+    status = models.CharField(
+        verbose_name=_('status'),
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING,
+    )
+    attempts = models.PositiveSmallIntegerField(verbose_name=_('attempts'), default=0)
+    next_attempt_at = models.DateTimeField(verbose_name=_('next attempt at'), default=timezone.now)
+    last_error = models.TextField(verbose_name=_('last error'), blank=True)
+    created_at = models.DateTimeField(verbose_name=_('created at'), auto_now_add=True)
+    sent_at = models.DateTimeField(verbose_name=_('sent at'), blank=True, null=True)
+
+    class Meta:
+        ordering = ['created_at']
+        index_together = [['status', 'next_attempt_at']]
+        verbose_name = _('Outbox message')
+        verbose_name_plural = _('Outbox messages')
+
+    def __str__(self):
+        return self.subject
+
+    @classmethod
+    def from_email_message(cls, message):
+        """
+        Returns an unsaved outbox message for the given EmailMessage.
+        Attachments are not supported.
+        """
+        alternatives = getattr(message, 'alternatives', [])
+        return cls(
+            subject=message.subject,
+            body=message.body,
+            from_email=message.from_email,
+            to=json.dumps(list(message.to)),
+            cc=json.dumps(list(message.cc)),
+            bcc=json.dumps(list(message.bcc)),
+            reply_to=json.dumps(list(message.reply_to)),
+            headers=json.dumps(message.extra_headers),
+            alternatives=json.dumps([list(alternative) for alternative in alternatives]),
+        )
+
+    def get_email_message(self, connection=None):
+        return EmailMultiAlternatives(
+            subject=self.subject,
+            body=self.body,
+            from_email=self.from_email,
+            to=json.loads(self.to or '[]'),
+            cc=json.loads(self.cc or '[]'),
+            bcc=json.loads(self.bcc or '[]'),
+            reply_to=json.loads(self.reply_to or '[]'),
+            headers=json.loads(self.headers or '{}'),
+            alternatives=[tuple(alternative) for alternative in json.loads(self.alternatives or '[]')],
+            connection=connection,
+        )
+
+
+def get_export_result_path(instance, filename):
+    # the names of files in the export storage aren't guessable
+    return 'aldryn_forms/exports/{}{}'.format(uuid4().hex, os.path.splitext(filename)[1])
+
+
+@python_2_unicode_compatible
+class ExportJob(models.Model):
+    """
+    An export of form submissions written to the export storage
+    by the process_form_exports command instead of the admin request.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    STATUS_CHOICES = (
+        (STATUS_PENDING, _('Pending')),
+        (STATUS_RUNNING, _('Running')),
+        (STATUS_DONE, _('Done')),
+        (STATUS_FAILED, _('Failed')),
+    )
+
+    form_name = models.CharField(verbose_name=_('form name'), max_length=255)
+    language = models.CharField(verbose_name=_('form language'), max_length=10)
+    from_date = models.DateField(verbose_name=_('from date'), blank=True, null=True)
+    to_date = models.DateField(verbose_name=_('to date'), blank=True, null=True)
+    # ids of the exported fields, stored as json
+    fields = models.TextField(verbose_name=_('fields'))
+    file_type = models.CharField(verbose_name=_('file type'), max_length=10)
+    filename = models.CharField(verbose_name=_('filename'), max_length=255)
+    status = models.CharField(
+        verbose_name=_('status'),
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING,
+    )
+    total = models.PositiveIntegerField(verbose_name=_('total'), default=0)
+    processed = models.PositiveIntegerField(verbose_name=_('processed'), default=0)
+    result = models.FileField(
+        verbose_name=_('result'),
+        upload_to=get_export_result_path,
+        storage=ExportStorage(),
+        max_length=255,
+        blank=True,
+    )
+    error = models.TextField(verbose_name=_('error'), blank=True)
+    created_by = models.ForeignKey(
+        to=getattr(settings, 'AUTH_USER_MODEL', 'auth.User'),
+        verbose_name=_('created by'),
+        blank=True,
+        null=True,
+        on_delete=models.SET_NULL,
+        editable=False,
+    )
+    created_at = models.DateTimeField(verbose_name=_('created at'), auto_now_add=True)
+    started_at = models.DateTimeField(verbose_name=_('started at'), blank=True, null=True)
+    finished_at = models.DateTimeField(verbose_name=_('finished at'), blank=True, null=True)
+    attempts = models.PositiveIntegerField(verbose_name=_('attempts'), default=0)
+    # a running job is picked up again by another worker after this time
+    lease_expires_at = models.DateTimeField(verbose_name=_('lease expires at'), blank=True, null=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        index_together = [['status', 'created_at']]
+        verbose_name = _('Export job')
+        verbose_name_plural = _('Export jobs')
+
+    def __str__(self):
+        return self.filename
+
+    def get_fields(self):
+        return json.loads(self.fields or '[]')
+
+    def set_fields(self, fields):
+        self.fields = json.dumps(list(fields))
+
+    def get_queryset(self):
+        return FormSubmission.objects.for_export(
+            name=self.form_name,
+            language=self.language,
+            from_date=self.from_date,
+            to_date=self.to_date,
+        )
+
+    @property
+    def progress(self):
+        """
+        Returns the percentage of the processed submissions.
+        """
+        if self.status == self.STATUS_DONE:
+            return 100
+
+        if not self.total:
+            return 0
+        return min(100, self.processed * 100 // self.total)
+
+
+def delete_export_job_result(sender, instance, **kwargs):
+    if instance.result:
+        instance.result.delete(save=False)
+
+
+@python_2_unicode_compatible
+class ExportCursor(models.Model):
+    """
+    The position of the last submission of a form exported to a consumer,
+    allows exporting only the submissions stored since the previous export.
+    """
+    consumer = models.CharField(verbose_name=_('consumer'), max_length=100)
+    form_name = models.CharField(verbose_name=_('form name'), max_length=255)
+    language = models.CharField(verbose_name=_('form language'), max_length=10)
+    last_inserted_at = models.DateTimeField(verbose_name=_('last inserted at'), blank=True, null=True)
+    last_id = models.PositiveIntegerField(verbose_name=_('last id'), blank=True, null=True)
+    updated_at = models.DateTimeField(verbose_name=_('updated at'), auto_now=True)
+
+    class Meta:
+        unique_together = [['consumer', 'form_name', 'language']]
+        verbose_name = _('Export cursor')
+        verbose_name_plural = _('Export cursors')
+
+    def __str__(self):
+        return u'{} ({}, {})'.format(self.consumer, self.form_name, self.language)
+
+    def get_queryset(self):
+        return FormSubmission.objects.filter(name=self.form_name, language=self.language)
+
+    def reset(self):
+        self.last_inserted_at = None
+        self.last_id = None
+
+
+@python_2_unicode_compatible
+class WebhookDelivery(models.Model):
+    """
+    A submission payload waiting to be posted to a webhook url
+    by the send_form_webhooks command, either batched or retried.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+
+    STATUS_CHOICES = (
+        (STATUS_PENDING, _('Pending')),
+        (STATUS_SENT, _('Sent')),
+        (STATUS_FAILED, _('Failed')),
+    )
+
+    url = models.URLField(verbose_name=_('url'), max_length=255)
+    # stored as json
+    payload = models.TextField(verbose_name=_('payload'))
+    status = models.CharField(
+        verbose_name=_('status'),
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING,
+    )
+    attempts = models.PositiveSmallIntegerField(verbose_name=_('attempts'), default=0)
+    next_attempt_at = models.DateTimeField(verbose_name=_('next attempt at'), default=timezone.now)
+    last_error = models.TextField(verbose_name=_('last error'), blank=True)
+    created_at = models.DateTimeField(verbose_name=_('created at'), auto_now_add=True)
+    sent_at = models.DateTimeField(verbose_name=_('sent at'), blank=True, null=True)
+
+    class Meta:
+        ordering = ['created_at']
+        index_together = [['status', 'next_attempt_at']]
+        verbose_name = _('Webhook delivery')
+        verbose_name_plural = _('Webhook deliveries')
+
+    def __str__(self):
+        return self.url
+
+    def get_payload(self):
+        return json.loads(self.payload)
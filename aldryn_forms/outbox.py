@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+Deferred delivery of the emails sent on form submission.
+
+When ``ALDRYN_FORMS_EMAIL_OUTBOX`` is enabled, emails are stored as
+``OutboxMessage`` rows in the submission transaction instead of being sent
+in the request, otherwise they're sent once the submission is committed.
+The ``send_form_emails`` management command delivers them in batches
+over a single connection, retrying failures with an exponential backoff.
+"""
+from functools import partial
+import logging
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.db import transaction
+
+from . import retries
+
+
+logger = logging.getLogger(__name__)
+
+
+def is_outbox_enabled():
+    return getattr(settings, 'ALDRYN_FORMS_EMAIL_OUTBOX', False)
+
+
+def get_max_attempts():
+    return getattr(settings, 'ALDRYN_FORMS_EMAIL_OUTBOX_MAX_ATTEMPTS', 5)
+
+
+def get_retry_delay(attempts):
+    """
+    Returns the delay before retrying a message which failed
+    to be sent the given number of times.
+    """
+    return retries.get_retry_delay(
+        attempts,
+        base_delay=getattr(settings, 'ALDRYN_FORMS_EMAIL_OUTBOX_RETRY_DELAY', 60),
+        max_delay=getattr(settings, 'ALDRYN_FORMS_EMAIL_OUTBOX_MAX_RETRY_DELAY', 60 * 60 * 6),
+    )
+
+
+def send_messages(messages, connection=None):
+    """
+    Queues the given email messages in the outbox if it's enabled,
+    sends them once the current transaction is committed otherwise.
+    """
+    from .models import OutboxMessage
+
+    if not messages:
+        return
+
+    if is_outbox_enabled():
+        OutboxMessage.objects.bulk_create(
+            [OutboxMessage.from_email_message(message) for message in messages]
+        )
+    else:
+        # the mail server isn't waited for while holding database locks
+        # and a failure doesn't roll back the submission
+        transaction.on_commit(partial(deliver_messages, messages, connection=connection))
+
+
+def deliver_messages(messages, connection=None):
+    try:
+        (connection or get_connection(fail_silently=False)).send_messages(messages)
+    except Exception:  # noqa
+        # Any exception is possible, different email backends
+        # raise different exceptions.
+        logger.exception('Could not send %s form emails.', len(messages))
+
+
+def claim_pending_messages(batch_size):
+    """
+    Returns up to batch_size messages due for delivery and postpones
+    their next attempt so concurrent workers don't pick them up.
+    """
+    from .models import OutboxMessage
+
+    lease = getattr(settings, 'ALDRYN_FORMS_EMAIL_OUTBOX_LEASE', 60 * 10)
+    return retries.claim_due(OutboxMessage, batch_size, lease=lease)
+
+
+def send_pending_messages(batch_size=100, max_attempts=None, connection=None):
+    """
+    Sends a batch of pending outbox messages over a single connection.
+
+    Returns a (sent, failed) tuple with the number of messages delivered
+    and the number of messages which failed to be delivered.
+    """
+    from .models import OutboxMessage
+
+    if max_attempts is None:
+        max_attempts = get_max_attempts()
+
+    outbox_messages = claim_pending_messages(batch_size)
+
+    if not outbox_messages:
+        return 0, 0
+
+    sent = []
+    failed = []
+    connection = connection or get_connection(fail_silently=False)
+
+    try:
+        connection.open()
+    except Exception as error:  # noqa
+        # Any exception is possible, different email backends
+        # raise different exceptions.
+        logger.exception('Could not open a connection to send form emails.')
+        failed = [(message, error) for message in outbox_messages]
+    else:
+        try:
+            for message in outbox_messages:
+                try:
+                    connection.send_messages([message.get_email_message(connection=connection)])
+                except Exception as error:  # noqa
+                    logger.exception('Could not send form email %s.', message.pk)
+                    failed.append((message, error))
+                else:
+                    sent.append(message)
+        finally:
+            connection.close()
+
+    retries.record_attempts(OutboxMessage, sent, failed, max_attempts=max_attempts, retry_delay=get_retry_delay)
+    return len(sent), len(failed)
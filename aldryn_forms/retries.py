@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Claiming and retrying the rows delivered by background commands.
+
+The outbox messages and the webhook deliveries share the same lifecycle:
+pending rows are due at ``next_attempt_at``, a worker claims them by
+postponing that time by a lease, and failures are retried with an exponential
+backoff until the maximum number of attempts is reached.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.encoding import force_text
+
+
+def get_retry_delay(attempts, base_delay, max_delay):
+    """
+    Returns the delay before retrying a row which failed the given
+    number of times, doubling base_delay seconds up to max_delay seconds.
+    """
+    return timedelta(seconds=min(base_delay * 2 ** (attempts - 1), max_delay))
+
+
+def claim_due(model, limit, lease):
+    """
+    Returns up to limit pending rows of the model which are due
+    and postpones their next attempt by lease seconds so concurrent
+    workers don't pick them up. If the worker dies, the rows
+    are retried after the lease.
+    """
+    now = timezone.now()
+
+    with transaction.atomic():
+        rows = list(
+            model
+            .objects
+            .select_for_update()
+            .filter(status=model.STATUS_PENDING, next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'pk')[:limit]
+        )
+        (
+            model
+            .objects
+            .filter(pk__in=[row.pk for row in rows])
+            .update(next_attempt_at=now + timedelta(seconds=lease))
+        )
+    return rows
+
+
+def record_attempts(model, sent, failed, max_attempts, retry_delay):
+    """
+    Marks the sent rows as sent and schedules the next attempt
+    of the failed (row, error) tuples, or marks them as failed after
+    max_attempts. retry_delay returns the delay for a number of attempts.
+    """
+    now = timezone.now()
+
+    if sent:
+        (
+            model
+            .objects
+            .filter(pk__in=[row.pk for row in sent])
+            .update(status=model.STATUS_SENT, sent_at=now, last_error='')
+        )
+
+    for row, error in failed:
+        row.attempts += 1
+        row.last_error = force_text(error)
+
+        if row.attempts >= max_attempts:
+            row.status = model.STATUS_FAILED
+        else:
+            row.next_attempt_at = now + retry_delay(row.attempts)
+        row.save(update_fields=['attempts', 'last_error', 'status', 'next_attempt_at'])
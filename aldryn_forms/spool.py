@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+Write-behind storage of form submissions.
+
+``BufferedAction`` appends the validated submissions to a local SQLite
+journal at ``ALDRYN_FORMS_SUBMISSION_SPOOL_PATH`` instead of saving them
+in the request. The ``flush_form_submissions`` management command stores
+the spooled submissions in the database in batches, with their values,
+counts and registered fields, and removes them from the journal.
+
+The journal lives on the server which received the submission, the command
+has to run on every server using the buffered action. A submission
+is removed from the journal after its batch is committed, if the command
+dies in between the batch is read again and the submissions already stored,
+identified by their unique ``spool_uuid``, are skipped.
+"""
+import json
+import sqlite3
+import threading
+from uuid import UUID, uuid4
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.dateparse import parse_datetime
+
+
+_spools = {}
+_spools_lock = threading.Lock()
+
+
+def get_spool_path():
+    return getattr(settings, 'ALDRYN_FORMS_SUBMISSION_SPOOL_PATH', None)
+
+
+def get_flush_batch_size():
+    return getattr(settings, 'ALDRYN_FORMS_SUBMISSION_SPOOL_BATCH_SIZE', 500)
+
+
+class SubmissionSpool(object):
+    """
+    A SQLite journal of serialized submissions, oldest first.
+
+    Each thread uses its own connection. The journal is written
+    in WAL mode so the flusher doesn't block the requests appending to it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def get_connection(self):
+        connection = getattr(self._local, 'connection', None)
+
+        if connection is None:
+            # autocommit, every append is durable once it returns
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=FULL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS submissions '
+                '(id INTEGER PRIMARY KEY AUTOINCREMENT, payload TEXT NOT NULL)'
+            )
+            self._local.connection = connection
+        return connection
+
+    def append(self, payload):
+        self.get_connection().execute('INSERT INTO submissions (payload) VALUES (?)', [json.dumps(payload)])
+
+    def read(self, limit):
+        """
+        Returns up to limit (id, payload) tuples, oldest first.
+        """
+        rows = self.get_connection().execute(
+            'SELECT id, payload FROM submissions ORDER BY id LIMIT ?', [limit]
+        )
+        return [(spool_id, json.loads(payload)) for spool_id, payload in rows]
+
+    def remove(self, last_id):
+        """
+        Removes the submissions up to and including the given id.
+        """
+        self.get_connection().execute('DELETE FROM submissions WHERE id <= ?', [last_id])
+
+    def count(self):
+        return self.get_connection().execute('SELECT COUNT(*) FROM submissions').fetchone()[0]
+
+
+def get_spool():
+    """
+    Returns the spool at ALDRYN_FORMS_SUBMISSION_SPOOL_PATH,
+    shared by the process.
+    """
+    path = get_spool_path()
+
+    if not path:
+        raise ImproperlyConfigured(
+            'The buffered action requires ALDRYN_FORMS_SUBMISSION_SPOOL_PATH to be set.'
+        )
+
+    with _spools_lock:
+        if path not in _spools:
+            _spools[path] = SubmissionSpool(path)
+    return _spools[path]
+
+
+def serialize_submission(submission):
+    return {
+        'uuid': uuid4().hex,
+        'name': submission.name,
+        'language': submission.language,
+        'form_url': submission.form_url,
+        'data': submission.data,
+        'recipients': submission.recipients,
+        'sent_at': submission.sent_at.isoformat(),
+    }
+
+
+def deserialize_submission(payload):
+    from .models import FormSubmission, is_json_data_storage_enabled
+
+    submission = FormSubmission(
+        name=payload['name'],
+        language=payload['language'],
+        form_url=payload['form_url'],
+        data=payload['data'],
+        recipients=payload['recipients'],
+        sent_at=parse_datetime(payload['sent_at']),
+        # submissions spooled before the uuids were added have none
+        spool_uuid=UUID(payload['uuid']) if payload.get('uuid') else None,
+    )
+
+    if is_json_data_storage_enabled():
+        submission.data_json = json.loads(submission.data)
+    return submission
+
+
+def flush_spool(batch_size=None):
+    """
+    Stores the spooled submissions in the database, batch_size at a time.
+
+    Returns the number of submissions stored.
+    """
+    from .models import FormSubmission
+
+    if batch_size is None:
+        batch_size = get_flush_batch_size()
+
+    spool = get_spool()
+    stored = 0
+
+    while True:
+        rows = spool.read(batch_size)
+
+        if not rows:
+            break
+
+        submissions = [deserialize_submission(payload) for spool_id, payload in rows]
+        spool_uuids = [submission.spool_uuid for submission in submissions if submission.spool_uuid]
+        # stored by a flush which died before removing them from the journal
+        stored_uuids = set(
+            FormSubmission
+            .objects
+            .filter(spool_uuid__in=spool_uuids)
+            .values_list('spool_uuid', flat=True)
+        )
+        submissions = [submission for submission in submissions if submission.spool_uuid not in stored_uuids]
+        FormSubmission.bulk_save(submissions)
+        spool.remove(rows[-1][0])
+        stored += len(submissions)
+
+        if len(rows) < batch_size:
+            break
+    return stored
@@ -1,8 +1,10 @@
 # -*- coding: utf-8 -*-
 from django.conf.urls import url
 
-from .views import submit_form_view
+from .views import form_schema_view, submit_form_view, submit_form_json_view
 
 urlpatterns = [
     url(r'^$', submit_form_view, name='aldryn_forms_submit_form'),
+    url(r'^json/$', submit_form_json_view, name='aldryn_forms_submit_form_json'),
+    url(r'^(?P<form_plugin_id>\d+)/schema/$', form_schema_view, name='aldryn_forms_form_schema'),
 ]
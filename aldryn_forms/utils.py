@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 from django.conf import settings
+from django.core.cache import caches
 from django.core.exceptions import ImproperlyConfigured
 from django.forms.forms import NON_FIELD_ERRORS
 from django.utils.module_loading import import_string
@@ -18,7 +19,16 @@ DEFAULT_ALDRYN_FORMS_ACTION_BACKENDS = {
 ALDRYN_FORMS_ACTION_BACKEND_KEY_MAX_SIZE = 15
 
 
-def get_action_backends():
+# the configured action backends, loaded once per process
+_action_backends = None
+
+
+def load_action_backends():
+    """
+    Imports and validates the configured action backends.
+
+    Returns a (classes, instances) tuple of dictionaries keyed by backend key.
+    """
     base_error_msg = 'Invalid settings.ALDRYN_FORMS_ACTION_BACKENDS.'
     max_key_size = ALDRYN_FORMS_ACTION_BACKEND_KEY_MAX_SIZE
 
@@ -47,10 +57,60 @@ def get_action_backends():
         raise ImproperlyConfigured('{} Key "default" is missing.'.format(base_error_msg))
 
     try:
-        [x() for x in backends.values()]  # check abstract base classes sanity
+        # also checks abstract base classes sanity
+        instances = {key: klass() for key, klass in backends.items()}
     except TypeError as e:
         raise ImproperlyConfigured('{} {}'.format(base_error_msg, e))
-    return backends
+    return backends, instances
+
+
+def _get_action_backend_registry():
+    global _action_backends
+
+    if _action_backends is None:
+        _action_backends = load_action_backends()
+    return _action_backends
+
+
+def get_action_backends():
+    """
+    Returns a dictionary of the action backend classes keyed by backend key.
+
+    The backends are imported and validated once per process,
+    changing the returned dictionary doesn't change the registry.
+    """
+    classes, instances = _get_action_backend_registry()
+    return dict(classes)
+
+
+def get_action_backend(key):
+    """
+    Returns the shared instance of the action backend with the given key,
+    backends must not keep state between submissions.
+    """
+    classes, instances = _get_action_backend_registry()
+    return instances[key]
+
+
+def reload_action_backends():
+    """
+    Loads the action backends from the settings again.
+    """
+    global _action_backends
+
+    _action_backends = None
+    return get_action_backends()
+
+
+def reset_action_backends(setting, **kwargs):
+    """
+    Receiver of setting_changed, the backends are loaded again
+    when they're used next.
+    """
+    global _action_backends
+
+    if setting == 'ALDRYN_FORMS_ACTION_BACKENDS':
+        _action_backends = None
 
 
 def action_backend_choices(*args, **kwargs):
@@ -96,24 +156,108 @@ def get_plugin_tree(model, **kwargs):
 
     This function builds a plugin tree for a plugin with no placeholder context.
 
-    Makes as many database queries as many levels are in the tree.
-
-    This is ok as forms shouldn't form very deep trees.
+    The whole subtree is fetched in a single query using the plugin's
+    tree path as a prefix, downcasted with one query per plugin model
+    and then assembled in memory. The number of queries doesn't depend
+    on how deep the tree is.
     """
     plugin = model.objects.get(**kwargs)
+    # Set parent to None in order to fool the build_plugin_tree function
+    # and avoid getting all nodes higher than the plugin.
     plugin.parent = None
-    current_level = [plugin]
-    plugin_list = [plugin]
-    while get_next_level(current_level).exists():
-        current_level = get_next_level(current_level)
-        current_level = downcast_plugins(current_level)
-        plugin_list += current_level
+    descendants = get_cmsplugin_queryset().filter(
+        path__startswith=plugin.path,
+        depth__gt=plugin.depth,
+    ).order_by('path')
+    plugin_list = [plugin] + list(downcast_plugins(descendants))
     return build_plugin_tree(plugin_list)[0]
 
 
-def get_next_level(current_level):
-    all_plugins = get_cmsplugin_queryset()
-    return all_plugins.filter(parent__in=[x.pk for x in current_level])
+def get_processed_forms(request):
+    """
+    Returns a dictionary of the forms already processed
+    during the given request, keyed by form plugin id.
+    """
+    try:
+        processed_forms = request._aldryn_forms_processed_forms
+    except AttributeError:
+        processed_forms = request._aldryn_forms_processed_forms = {}
+    return processed_forms
+
+
+SUBMISSION_TOKEN_PENDING = 'pending'
+SUBMISSION_TOKEN_DONE = 'done'
+
+
+def get_submission_token_cache():
+    return caches[getattr(settings, 'ALDRYN_FORMS_SUBMISSION_TOKEN_CACHE', 'default')]
+
+
+def get_submission_token_key(form_plugin_id, token):
+    return 'aldryn_forms:submission_token:{}:{}'.format(form_plugin_id, token)
+
+
+def get_submission_token_state(form_plugin_id, token):
+    """
+    Returns SUBMISSION_TOKEN_PENDING or SUBMISSION_TOKEN_DONE for
+    a claimed token, None if the token wasn't claimed.
+    """
+    return get_submission_token_cache().get(get_submission_token_key(form_plugin_id, token))
+
+
+def claim_submission_token(form_plugin_id, token):
+    """
+    Records the idempotency token of a valid submission as pending.
+
+    Returns None if the token was claimed, otherwise the state of
+    the submission which claimed it within its timeout, pending
+    for ALDRYN_FORMS_SUBMISSION_TOKEN_PENDING_TIMEOUT seconds
+    and done for ALDRYN_FORMS_SUBMISSION_TOKEN_TIMEOUT seconds.
+    """
+    timeout = getattr(settings, 'ALDRYN_FORMS_SUBMISSION_TOKEN_PENDING_TIMEOUT', 60)
+    key = get_submission_token_key(form_plugin_id, token)
+    cache = get_submission_token_cache()
+
+    if cache.add(key, SUBMISSION_TOKEN_PENDING, timeout):
+        return None
+    # the claim may have expired since, it's then pending again
+    return cache.get(key, SUBMISSION_TOKEN_PENDING)
+
+
+def complete_submission_token(form_plugin_id, token):
+    """
+    Records that the submission with the token was stored.
+    """
+    timeout = getattr(settings, 'ALDRYN_FORMS_SUBMISSION_TOKEN_TIMEOUT', 60 * 60)
+    key = get_submission_token_key(form_plugin_id, token)
+    get_submission_token_cache().set(key, SUBMISSION_TOKEN_DONE, timeout)
+
+
+def release_submission_token(form_plugin_id, token):
+    """
+    Forgets the token of a submission which failed to be stored
+    so it can be submitted again.
+    """
+    get_submission_token_cache().delete(get_submission_token_key(form_plugin_id, token))
+
+
+def iterate_in_chunks(queryset, chunk_size=1000):
+    """
+    Yields the objects of the queryset newest first, loading them in chunks
+    over the primary key so memory usage doesn't grow with the
+    number of objects, unlike iterator() which fetches
+    all rows at once on most database backends.
+    """
+    queryset = queryset.order_by('-pk')
+    chunk = list(queryset[:chunk_size])
+
+    while chunk:
+        for obj in chunk:
+            yield obj
+
+        if len(chunk) < chunk_size:
+            break
+        chunk = list(queryset.filter(pk__lt=chunk[-1].pk)[:chunk_size])
 
 
 def add_form_error(form, message, field=NON_FIELD_ERRORS):
@@ -1,7 +1,13 @@
 # -*- coding: utf-8 -*-
 from django.core.urlresolvers import resolve
-from django.http import HttpResponseRedirect, HttpResponseBadRequest
+from django.http import Http404, HttpResponseRedirect, HttpResponseBadRequest, JsonResponse
 from django.shortcuts import render
+from django.utils.encoding import force_text
+from django.utils.http import is_safe_url
+from django.utils.six.moves.urllib.parse import urlsplit
+from django.views.decorators.http import require_GET, require_POST
+
+from cms.models import StaticPlaceholder
 
 try:
     from cms.utils.page import get_page_from_request
@@ -9,10 +15,82 @@ except ImportError:
     # for django-cms<3.5
     from cms.utils.page_resolver import get_page_from_request
 
+try:
+    from cms.utils.page_permissions import user_can_view_page
+except ImportError:
+    # for django-cms<3.4
+    user_can_view_page = None
+
 from .models import FormPlugin
 from .utils import get_plugin_tree
 
 
+def get_submitted_form_plugin(request):
+    """
+    Returns the form plugin tree for the form_plugin_id
+    submitted with the request or None if it's invalid.
+    """
+    form_plugin_id = request.POST.get('form_plugin_id') or ''
+
+    if not form_plugin_id.isdigit():
+        # fail if plugin_id has been tampered with
+        return None
+
+    try:
+        # I believe this could be an issue as we don't check if the form submitted
+        # is in anyway tied to this page.
+        # But then we have a problem with static placeholders :(
+        return get_plugin_tree(FormPlugin, pk=form_plugin_id)
+    except FormPlugin.DoesNotExist:
+        return None
+
+
+def is_public_form_plugin(request, form_plugin):
+    """
+    Returns True if the form is on the published version of a page
+    the user can view or of a static placeholder.
+    """
+    placeholder = form_plugin.placeholder
+
+    if placeholder is None:
+        return False
+
+    page = placeholder.page
+
+    if page is None:
+        return StaticPlaceholder.objects.filter(public=placeholder).exists()
+
+    if page.publisher_is_draft or not page.is_published(form_plugin.language):
+        return False
+
+    if user_can_view_page is None:
+        return page.has_view_permission(request)
+    return user_can_view_page(request.user, page)
+
+
+def get_form_page_url(request, form_plugin):
+    """
+    Returns the absolute url of the page hosting the submitted form.
+
+    Forms in static placeholders don't belong to a page, the posted
+    form_url or the referer is used if it points to this site,
+    otherwise the page of the forms apphook.
+    """
+    placeholder = form_plugin.placeholder
+    page = placeholder.page if placeholder else None
+
+    if page is None:
+        url = request.POST.get('form_url') or request.META.get('HTTP_REFERER') or ''
+
+        if url and is_safe_url(url, host=request.get_host()):
+            return request.build_absolute_uri(urlsplit(url).path)
+        page = get_page_from_request(request)
+
+    if page is None:
+        return None
+    return request.build_absolute_uri(page.get_absolute_url(form_plugin.language))
+
+
 def submit_form_view(request):
     cms_page = get_page_from_request(request)
 
@@ -27,18 +105,9 @@ def submit_form_view(request):
     }
 
     if request.method == 'POST':
-        form_plugin_id = request.POST.get('form_plugin_id') or ''
+        form_plugin = get_submitted_form_plugin(request)
 
-        if not form_plugin_id.isdigit():
-            # fail if plugin_id has been tampered with
-            return HttpResponseBadRequest()
-
-        try:
-            # I believe this could be an issue as we don't check if the form submitted
-            # is in anyway tied to this page.
-            # But then we have a problem with static placeholders :(
-            form_plugin = get_plugin_tree(FormPlugin, pk=form_plugin_id)
-        except FormPlugin.DoesNotExist:
+        if form_plugin is None:
             return HttpResponseBadRequest()
 
         form_plugin_instance = form_plugin.get_plugin_instance()[1]
@@ -49,3 +118,50 @@ def submit_form_view(request):
         if form.is_valid() and success_url:
             return HttpResponseRedirect(success_url)
     return render(request, template, context)
+
+
+@require_POST
+def submit_form_json_view(request):
+    """
+    Processes a form submission like submit_form_view does
+    but responds with JSON instead of rendering the CMS page.
+    """
+    form_plugin = get_submitted_form_plugin(request)
+
+    if form_plugin is None:
+        return HttpResponseBadRequest()
+
+    form_plugin_instance = form_plugin.get_plugin_instance()[1]
+    form_url = get_form_page_url(request, form_plugin)
+    # saves the form if it's valid
+    form = form_plugin_instance.process_form(form_plugin, request, form_url=form_url)
+
+    if form.is_valid():
+        data = {
+            'success': True,
+            'redirect_url': form_plugin_instance.get_success_url(instance=form_plugin),
+        }
+        return JsonResponse(data)
+
+    errors = dict(
+        (field, [force_text(error) for error in field_errors])
+        for field, field_errors in form.errors.items()
+    )
+    return JsonResponse({'success': False, 'errors': errors}, status=400)
+
+
+@require_GET
+def form_schema_view(request, form_plugin_id):
+    """
+    Returns the schema of the form fields as JSON
+    so clients can validate submissions before sending them.
+    Only forms published on pages the user can view are served.
+    """
+    try:
+        form_plugin = get_plugin_tree(FormPlugin, pk=form_plugin_id)
+    except FormPlugin.DoesNotExist:
+        raise Http404
+
+    if not is_public_form_plugin(request, form_plugin):
+        raise Http404
+    return JsonResponse(form_plugin.get_form_schema())
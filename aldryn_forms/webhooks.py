@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+Delivery of form submissions to webhooks.
+
+``WebhookAction`` stores the serialized fields of a submission as
+a ``WebhookDelivery`` row per url in ``ALDRYN_FORMS_WEBHOOK_URLS``
+in the submission transaction. The ``send_form_webhooks`` management
+command posts them as json over a keep-alive session and retries
+the failed posts with an exponential backoff.
+
+When ``ALDRYN_FORMS_WEBHOOK_BATCH_SIZE`` is greater than 1 the command
+posts the submissions as json lists of up to that many submissions.
+"""
+from collections import OrderedDict
+import json
+import logging
+import threading
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import six
+
+from . import retries
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+except ImportError:
+    requests = None
+
+
+logger = logging.getLogger(__name__)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_webhook_urls():
+    return getattr(settings, 'ALDRYN_FORMS_WEBHOOK_URLS', [])
+
+
+def get_timeout():
+    # connect and read timeouts in seconds
+    return getattr(settings, 'ALDRYN_FORMS_WEBHOOK_TIMEOUT', (3.05, 10))
+
+
+def get_batch_size():
+    return getattr(settings, 'ALDRYN_FORMS_WEBHOOK_BATCH_SIZE', 1)
+
+
+def get_max_attempts():
+    return getattr(settings, 'ALDRYN_FORMS_WEBHOOK_MAX_ATTEMPTS', 5)
+
+
+def get_retry_delay(attempts):
+    """
+    Returns the delay before retrying a delivery which failed
+    the given number of times.
+    """
+    return retries.get_retry_delay(
+        attempts,
+        base_delay=getattr(settings, 'ALDRYN_FORMS_WEBHOOK_RETRY_DELAY', 60),
+        max_delay=getattr(settings, 'ALDRYN_FORMS_WEBHOOK_MAX_RETRY_DELAY', 60 * 60 * 6),
+    )
+
+
+def check_requests():
+    if requests is None:
+        raise ImproperlyConfigured(
+            'Form webhooks require the requests library, install it with "pip install aldryn-forms[webhooks]".'
+        )
+
+
+def get_session():
+    """
+    Returns the session shared by the process, which keeps
+    the connections to the webhooks open between submissions.
+    """
+    global _session
+
+    check_requests()
+
+    with _session_lock:
+        if _session is None:
+            pool_size = getattr(settings, 'ALDRYN_FORMS_WEBHOOK_POOL_SIZE', 10)
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session = requests.Session()
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers['Content-Type'] = 'application/json'
+            _session = session
+    return _session
+
+
+def post(url, data):
+    """
+    Posts the json data to the url,
+    raises requests.RequestException if it fails.
+    """
+    if isinstance(data, six.text_type):
+        data = data.encode('utf-8')
+    response = get_session().post(url, data=data, timeout=get_timeout())
+    response.raise_for_status()
+
+
+def get_submission_payload(form):
+    return {
+        'form_plugin_id': form.form_plugin.pk,
+        'form_name': form.instance.name,
+        'language': form.instance.language,
+        'form_url': form.instance.form_url,
+        'fields': [field._asdict() for field in form.get_serialized_fields(is_confirmation=False)],
+    }
+
+
+def deliver(payload, urls=None):
+    """
+    Stores the payload as a delivery per webhook for the
+    send_form_webhooks command. The deliveries are part of the current
+    transaction, a rolled back submission isn't posted and the request
+    never waits for the webhooks.
+    """
+    from .models import WebhookDelivery
+
+    if urls is None:
+        urls = get_webhook_urls()
+
+    data = json.dumps(payload, cls=DjangoJSONEncoder)
+    WebhookDelivery.objects.bulk_create([WebhookDelivery(url=url, payload=data) for url in urls])
+
+
+def claim_pending_deliveries(limit):
+    """
+    Returns up to limit deliveries due and postpones their next
+    attempt so concurrent workers don't pick them up.
+    """
+    from .models import WebhookDelivery
+
+    lease = getattr(settings, 'ALDRYN_FORMS_WEBHOOK_LEASE', 60 * 10)
+    return retries.claim_due(WebhookDelivery, limit, lease=lease)
+
+
+def send_pending_deliveries(limit=100, max_attempts=None):
+    """
+    Posts up to limit pending deliveries, batched per url
+    when ALDRYN_FORMS_WEBHOOK_BATCH_SIZE is greater than 1.
+
+    Returns a (sent, failed) tuple with the number of deliveries posted
+    and the number of deliveries which failed to be posted.
+    """
+    from .models import WebhookDelivery
+
+    check_requests()
+
+    if max_attempts is None:
+        max_attempts = get_max_attempts()
+
+    deliveries = claim_pending_deliveries(limit)
+    batch_size = get_batch_size()
+    deliveries_by_url = OrderedDict()
+    sent = []
+    failed = []
+
+    for delivery in deliveries:
+        deliveries_by_url.setdefault(delivery.url, []).append(delivery)
+
+    for url, url_deliveries in deliveries_by_url.items():
+        for index in range(0, len(url_deliveries), batch_size):
+            batch = url_deliveries[index:index + batch_size]
+
+            if batch_size > 1:
+                data = u'[{}]'.format(u','.join(delivery.payload for delivery in batch))
+            else:
+                data = batch[0].payload
+
+            try:
+                post(url, data)
+            except requests.RequestException as error:
+                logger.exception('Could not post %s form submissions to %s.', len(batch), url)
+                failed.extend((delivery, error) for delivery in batch)
+            else:
+                sent.extend(batch)
+
+    retries.record_attempts(WebhookDelivery, sent, failed, max_attempts=max_attempts, retry_delay=get_retry_delay)
+    return len(sent), len(failed)
@@ -51,6 +51,9 @@ setup(
     license='LICENSE.txt',
     platforms=['OS Independent'],
     install_requires=REQUIREMENTS,
+    extras_require={
+        'webhooks': ['requests>=2.0'],
+    },
     classifiers=CLASSIFIERS,
     include_package_data=True,
     zip_safe=False,
@@ -0,0 +1,198 @@
+import threading
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.test import TransactionTestCase
+from django.test.utils import override_settings
+from django.utils import translation
+
+from aldryn_forms.action_backends import PipelineAction, Stage
+from aldryn_forms.action_backends_base import BaseAction
+from aldryn_forms.models import FormSubmission
+from aldryn_forms.utils import get_action_backend
+
+
+calls = []
+languages = []
+forms = []
+release_slow_action = threading.Event()
+
+
+class RecordingAction(BaseAction):
+    verbose_name = 'Recording'
+
+    def form_valid(self, cmsplugin, instance, request, form):
+        calls.append((form.name, threading.current_thread()))
+        languages.append(translation.get_language())
+        forms.append((form, request))
+
+
+class FailingAction(BaseAction):
+    verbose_name = 'Failing'
+
+    def form_valid(self, cmsplugin, instance, request, form):
+        FormSubmission.objects.create(name='rolled back', data='[]')
+        raise ValueError('Failing action')
+
+
+class SlowAction(BaseAction):
+    verbose_name = 'Slow'
+
+    def form_valid(self, cmsplugin, instance, request, form):
+        release_slow_action.wait(5)
+        calls.append(('slow', threading.current_thread()))
+
+
+class TestPipeline(PipelineAction):
+    verbose_name = 'Test pipeline'
+    stages = [
+        Stage(['failing', 'save']),
+        Stage(['failing', 'recording', 'slow'], parallel=True, after_commit=True, timeout=0.2),
+        Stage(['recording'], after_commit=True),
+    ]
+
+
+class BoundedPipeline(PipelineAction):
+    verbose_name = 'Bounded pipeline'
+    max_workers = 1
+    queue_size = 0
+    stages = [
+        Stage(['slow'], after_commit=True, timeout=0.1),
+        Stage(['recording'], after_commit=True, timeout=0.1),
+    ]
+
+
+class InvalidPipeline(PipelineAction):
+    verbose_name = 'Invalid pipeline'
+    stages = [Stage(['missing'])]
+
+
+class FormPluginStub(object):
+    pk = 1
+
+
+class CMSPluginStub(object):
+
+    def __init__(self):
+        self.messages = []
+
+    def send_success_message(self, instance, request):
+        self.messages.append((request, threading.current_thread()))
+
+
+class FormStub(object):
+    form_plugin = FormPluginStub()
+
+    def __init__(self, name):
+        self.name = name
+        self.request = object()
+        self.instance = FormSubmission(name=name)
+        self.cleaned_data = {'name': name}
+
+    def save(self):
+        return FormSubmission.objects.create(name=self.name, data='[]')
+
+
+@override_settings(ALDRYN_FORMS_ACTION_BACKENDS={
+    'default': 'aldryn_forms.action_backends.DefaultAction',
+    'save': 'aldryn_forms.action_backends.SaveAction',
+    'recording': 'tests.test_action_backends.RecordingAction',
+    'failing': 'tests.test_action_backends.FailingAction',
+    'slow': 'tests.test_action_backends.SlowAction',
+    'pipeline': 'tests.test_action_backends.TestPipeline',
+    'bounded': 'tests.test_action_backends.BoundedPipeline',
+    'invalid': 'tests.test_action_backends.InvalidPipeline',
+})
+class PipelineActionTestCase(TransactionTestCase):
+
+    def setUp(self):
+        super(PipelineActionTestCase, self).setUp()
+        del calls[:]
+        del languages[:]
+        del forms[:]
+        self.cmsplugin = CMSPluginStub()
+        self.request = object()
+        release_slow_action.clear()
+        self.addCleanup(release_slow_action.set)
+
+    def form_valid(self, key, form):
+        get_action_backend(key).form_valid(cmsplugin=self.cmsplugin, instance=None, request=self.request, form=form)
+
+    def wait_for_threads(self, key):
+        # the backends are shared by the tests, the next one gets a new pool
+        backend = get_action_backend(key)
+        backend.get_executor().shutdown(wait=True)
+        backend._executor = None
+
+    def test_stages(self):
+        with transaction.atomic():
+            self.form_valid('pipeline', FormStub('contact'))
+
+            # the failing action didn't prevent saving the submission
+            self.assertEqual(list(FormSubmission.objects.values_list('name', flat=True)), ['contact'])
+            self.assertEqual(calls, [])
+
+        # the slow action timed out, the stage after it still ran
+        self.assertEqual([name for name, thread in calls], ['contact', 'contact'])
+        self.assertNotEqual(calls[0][1], threading.current_thread())
+        self.assertNotEqual(calls[1][1], threading.current_thread())
+
+        release_slow_action.set()
+        self.wait_for_threads('pipeline')
+
+        self.assertEqual(len(calls), 3)
+        # the failing actions were rolled back
+        self.assertEqual(list(FormSubmission.objects.values_list('name', flat=True)), ['contact'])
+
+    def test_threads_get_a_copy_of_the_form(self):
+        form = FormStub('contact')
+
+        with transaction.atomic():
+            self.form_valid('pipeline', form)
+
+        release_slow_action.set()
+        self.wait_for_threads('pipeline')
+
+        self.assertEqual(len(forms), 2)
+
+        for snapshot, request in forms:
+            self.assertIsNot(snapshot, form)
+            self.assertIsNot(snapshot.instance, form.instance)
+            self.assertIsNot(snapshot.cleaned_data, form.cleaned_data)
+            self.assertEqual(snapshot.cleaned_data, {'name': 'contact'})
+            self.assertIsNone(snapshot.request)
+            self.assertIsNone(request)
+
+        # the success message is sent once, in the request thread
+        self.assertEqual(self.cmsplugin.messages, [(self.request, threading.current_thread())])
+
+    def test_threads_use_the_request_language(self):
+        with translation.override('de'):
+            with transaction.atomic():
+                self.form_valid('pipeline', FormStub('contact'))
+
+        release_slow_action.set()
+        self.wait_for_threads('pipeline')
+
+        self.assertEqual(languages, ['de', 'de'])
+
+    def test_tasks_are_skipped_when_the_queue_is_full(self):
+        with transaction.atomic():
+            self.form_valid('bounded', FormStub('contact'))
+
+        # the timed out slow action still holds the only thread
+        release_slow_action.set()
+        self.wait_for_threads('bounded')
+
+        self.assertEqual([name for name, thread in calls], ['slow'])
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.form_valid('invalid', FormStub('contact'))
+
+    def test_stages_have_a_default_timeout(self):
+        self.assertEqual(Stage(['recording'], after_commit=True).timeout, 10)
+
+    def test_parallel_stage_must_run_after_commit(self):
+        with self.assertRaises(ImproperlyConfigured):
+            Stage(['recording'], parallel=True)
@@ -0,0 +1,118 @@
+from datetime import timedelta
+
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core.urlresolvers import reverse
+from django.test import TransactionTestCase
+from django.utils import timezone
+
+from aldryn_forms.admin.base import FormNameListFilter
+from aldryn_forms.admin.changelist import KeysetChangeList
+from aldryn_forms.models import FormSubmission
+
+
+class KeysetChangeListTestCase(TransactionTestCase):
+
+    def setUp(self):
+        super(KeysetChangeListTestCase, self).setUp()
+        self.model_admin = admin.site._registry[FormSubmission]
+        self.model_admin.keyset_pagination = True
+        self.model_admin.list_per_page = 2
+
+        get_user_model().objects.create_superuser('admin', 'admin@example.com', 'admin')
+        self.client.login(username='admin', password='admin')
+        self.url = reverse('admin:aldryn_forms_formsubmission_changelist')
+
+        now = timezone.now()
+        self.submissions = []
+
+        for index in range(5):
+            submission = FormSubmission.objects.create(name='contact-{}'.format(index), data='[]')
+            # two submissions share the same date
+            sent_at = now - timedelta(minutes=min(index, 3))
+            FormSubmission.objects.filter(pk=submission.pk).update(sent_at=sent_at)
+            self.submissions.append(submission.pk)
+
+    def tearDown(self):
+        del self.model_admin.keyset_pagination
+        del self.model_admin.list_per_page
+        super(KeysetChangeListTestCase, self).tearDown()
+
+    def get_changelist(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.context['cl']
+
+    def test_pages(self):
+        # newest first, the submissions sharing a date are ordered by id
+        expected = self.submissions[:3] + self.submissions[3:][::-1]
+        changelist = self.get_changelist(self.url)
+
+        self.assertIsInstance(changelist, KeysetChangeList)
+        self.assertIsNone(changelist.date_hierarchy)
+        # SQLite has no estimates, the rows aren't counted
+        self.assertIsNone(changelist.estimated_count)
+        self.assertEqual(changelist.result_count, 2)
+        self.assertEqual([obj.pk for obj in changelist.result_list], expected[:2])
+        self.assertIsNone(changelist.newer_url)
+
+        changelist = self.get_changelist(self.url + changelist.older_url)
+        self.assertEqual([obj.pk for obj in changelist.result_list], expected[2:4])
+
+        older_url = changelist.older_url
+        newer_url = changelist.newer_url
+
+        changelist = self.get_changelist(self.url + older_url)
+        self.assertEqual([obj.pk for obj in changelist.result_list], expected[4:])
+        self.assertIsNone(changelist.older_url)
+
+        changelist = self.get_changelist(self.url + newer_url)
+        self.assertEqual([obj.pk for obj in changelist.result_list], expected[:2])
+        self.assertIsNone(changelist.newer_url)
+
+    def test_only_list_fields_are_loaded(self):
+        changelist = self.get_changelist(self.url)
+
+        self.assertEqual(changelist.result_list[0].get_deferred_fields(), set(['data', 'data_json', 'recipients', 'form_url', 'inserted_at', 'spool_uuid']))
+
+    def test_filters_are_kept(self):
+        changelist = self.get_changelist(self.url + '?name=contact-1')
+
+        self.assertEqual([obj.pk for obj in changelist.result_list], self.submissions[1:2])
+        self.assertEqual(changelist.result_count, 1)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url + '?older=invalid')
+
+        # the admin redirects to the changelist with an error flag
+        self.assertEqual(response.status_code, 302)
+
+
+class FormNameListFilterTestCase(TransactionTestCase):
+
+    def setUp(self):
+        super(FormNameListFilterTestCase, self).setUp()
+        get_user_model().objects.create_superuser('admin', 'admin@example.com', 'admin')
+        self.client.login(username='admin', password='admin')
+        self.url = reverse('admin:aldryn_forms_formsubmission_changelist')
+
+        FormSubmission.objects.create(name='contact', language='en', data='[]')
+        FormSubmission.objects.create(name='contact', language='de', data='[]')
+        FormSubmission.objects.create(name='newsletter', language='en', data='[]')
+
+    def get_name_filter(self, changelist):
+        for list_filter in changelist.filter_specs:
+            if isinstance(list_filter, FormNameListFilter):
+                return list_filter
+        self.fail('The form name filter is missing')
+
+    def test_lookups_are_read_from_counts(self):
+        response = self.client.get(self.url)
+        name_filter = self.get_name_filter(response.context['cl'])
+
+        self.assertEqual(name_filter.lookup_choices, [('contact', 'contact (2)'), ('newsletter', 'newsletter (1)')])
+
+    def test_filter(self):
+        response = self.client.get(self.url + '?name=contact')
+
+        self.assertEqual(response.context['cl'].result_count, 2)
@@ -1,12 +1,22 @@
 from cms.api import add_plugin, create_page
-from cms.test_utils.testcases import CMSTestCase
+from cms.test_utils.testcases import BaseCMSTestCase, CMSTestCase
+from django.contrib.messages.storage.fallback import FallbackStorage
 from django.core import mail
+from django.core.cache import cache
 from django.contrib.auth.models import User
+from django.test import RequestFactory, TransactionTestCase
 
-from aldryn_forms.models import FormSubmission
+from aldryn_forms.cache import form_class_cache
+from aldryn_forms.models import FormPlugin, FormSubmission
+from aldryn_forms.utils import (
+    SUBMISSION_TOKEN_PENDING,
+    claim_submission_token,
+    get_plugin_tree,
+    get_submission_token_state,
+)
 
 
-class FormPluginTestCase(CMSTestCase):
+class FormPluginTestCase(BaseCMSTestCase, TransactionTestCase):
     def setUp(self):
         super(FormPluginTestCase, self).setUp()
 
@@ -57,7 +67,228 @@ class FormPluginTestCase(CMSTestCase):
         self.assertEquals(len(mail.outbox), 0)
 
 
-class EmailNotificationFormPluginTestCase(CMSTestCase):
+class IdempotencyTokenTestCase(BaseCMSTestCase, TransactionTestCase):
+    def setUp(self):
+        super(IdempotencyTokenTestCase, self).setUp()
+        cache.clear()
+
+        page = create_page('test page', 'test_page.html', 'en', published=True)
+        placeholder = page.placeholders.get(slot='content')
+        self.form_plugin = add_plugin(placeholder, 'FormPlugin', 'en', name='contact', action_backend='default')
+        self.form_plugin.recipients.add(User.objects.create_superuser('username', 'email@example.com', 'password'))
+        add_plugin(placeholder, 'EmailField', 'en', target=self.form_plugin, name='email', label='Email', required=True)
+
+    def process_form(self, data):
+        request = RequestFactory().post('/', data)
+        request.session = {}
+        request._messages = FallbackStorage(request)
+        instance = get_plugin_tree(FormPlugin, pk=self.form_plugin.pk)
+        return instance.get_plugin_class_instance().process_form(instance, request)
+
+    def get_token(self):
+        request = RequestFactory().get('/')
+        instance = get_plugin_tree(FormPlugin, pk=self.form_plugin.pk)
+        plugin = instance.get_plugin_class_instance()
+        form = plugin.get_form_class(instance)(**plugin.get_form_kwargs(instance, request))
+        return form['idempotency_token'].value()
+
+    def test_repeated_submission_is_processed_once(self):
+        token = self.get_token()
+        self.assertNotEqual(token, self.get_token())
+
+        form = self.process_form({'email': 'visitor@example.com', 'idempotency_token': token})
+        self.assertTrue(form.is_valid())
+        self.assertFalse(form.is_duplicate)
+
+        with self.assertNumQueries(3):
+            # only loading the form plugin tree
+            form = self.process_form({'email': 'visitor@example.com', 'idempotency_token': token})
+
+        self.assertTrue(form.is_valid())
+        self.assertTrue(form.is_duplicate)
+        self.assertEqual(FormSubmission.objects.count(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+
+        self.process_form({'email': 'visitor@example.com', 'idempotency_token': self.get_token()})
+        self.assertEqual(FormSubmission.objects.count(), 2)
+
+    def test_invalid_submission_can_be_corrected(self):
+        token = self.get_token()
+
+        form = self.process_form({'email': '', 'idempotency_token': token})
+        self.assertFalse(form.is_valid())
+
+        form = self.process_form({'email': 'visitor@example.com', 'idempotency_token': token})
+        self.assertTrue(form.is_valid())
+        self.assertFalse(form.is_duplicate)
+        self.assertEqual(FormSubmission.objects.count(), 1)
+
+    def test_invalid_retry_of_accepted_submission(self):
+        token = self.get_token()
+        self.process_form({'email': 'visitor@example.com', 'idempotency_token': token})
+
+        form = self.process_form({'email': '', 'idempotency_token': token})
+
+        self.assertTrue(form.is_duplicate)
+        self.assertEqual(FormSubmission.objects.count(), 1)
+
+    def test_invalid_submission_does_not_claim_the_token(self):
+        token = self.get_token()
+        self.process_form({'email': '', 'idempotency_token': token})
+
+        self.assertIsNone(get_submission_token_state(self.form_plugin.pk, token))
+
+    def test_duplicate_of_pending_submission_is_not_accepted(self):
+        token = self.get_token()
+        self.assertIsNone(claim_submission_token(self.form_plugin.pk, token))
+
+        form = self.process_form({'email': 'visitor@example.com', 'idempotency_token': token})
+
+        self.assertFalse(form.is_valid())
+        self.assertFalse(form.is_duplicate)
+        self.assertFalse(FormSubmission.objects.exists())
+        self.assertEqual(get_submission_token_state(self.form_plugin.pk, token), SUBMISSION_TOKEN_PENDING)
+
+    def test_submissions_without_token_are_always_processed(self):
+        for token in ('', 'not a token'):
+            self.process_form({'email': 'visitor@example.com', 'idempotency_token': token})
+            self.process_form({'email': 'visitor@example.com', 'idempotency_token': token})
+
+        self.assertEqual(FormSubmission.objects.count(), 4)
+
+
+class FormClassCacheTestCase(CMSTestCase):
+    def setUp(self):
+        super(FormClassCacheTestCase, self).setUp()
+        form_class_cache.clear()
+
+        self.page = create_page('test page', 'test_page.html', 'en', published=True)
+        self.placeholder = self.page.placeholders.get(slot='content')
+        self.form_plugin = add_plugin(self.placeholder, 'FormPlugin', 'en', name='form')
+        self.field = add_plugin(self.placeholder, 'TextField', 'en', target=self.form_plugin, name='name', label='name')
+
+    def get_form_class(self):
+        instance = get_plugin_tree(FormPlugin, pk=self.form_plugin.pk)
+        plugin = instance.get_plugin_class_instance()
+        return plugin.get_form_class(instance)
+
+    def test_form_class_is_reused(self):
+        form_class = self.get_form_class()
+
+        self.assertIs(self.get_form_class(), form_class)
+        self.assertIn('name', form_class.base_fields)
+
+    def test_form_class_is_rebuilt_when_a_field_is_added(self):
+        form_class = self.get_form_class()
+
+        add_plugin(self.placeholder, 'EmailField', 'en', target=self.form_plugin, name='email', label='email')
+        new_form_class = self.get_form_class()
+
+        self.assertIsNot(new_form_class, form_class)
+        self.assertIn('email', new_form_class.base_fields)
+
+    def test_form_class_is_rebuilt_when_a_field_is_changed(self):
+        form_class = self.get_form_class()
+
+        self.field.label = 'full name'
+        self.field.save()
+        new_form_class = self.get_form_class()
+
+        self.assertIsNot(new_form_class, form_class)
+        self.assertEqual(new_form_class.base_fields['name'].label, 'full name')
+
+    def test_form_class_is_rebuilt_when_a_field_is_deleted(self):
+        self.get_form_class()
+
+        self.field.delete()
+
+        self.assertNotIn('name', self.get_form_class().base_fields)
+
+    def test_form_version_changes_when_an_option_is_changed(self):
+        field = add_plugin(self.placeholder, 'SelectField', 'en', target=self.form_plugin, name='kind', label='kind')
+        versions = [get_plugin_tree(FormPlugin, pk=self.form_plugin.pk).get_form_version()]
+
+        option = field.option_set.create(value='one')
+        versions.append(get_plugin_tree(FormPlugin, pk=self.form_plugin.pk).get_form_version())
+
+        option.delete()
+        versions.append(get_plugin_tree(FormPlugin, pk=self.form_plugin.pk).get_form_version())
+
+        # other processes can't be evicted, their entries become stale
+        self.assertEqual(len(set(versions)), 3)
+
+
+class ChoiceFieldOptionsTestCase(CMSTestCase):
+    def setUp(self):
+        super(ChoiceFieldOptionsTestCase, self).setUp()
+        form_class_cache.clear()
+
+        self.page = create_page('test page', 'test_page.html', 'en', published=True)
+        self.placeholder = self.page.placeholders.get(slot='content')
+
+    def create_form(self, field_count):
+        form_plugin = add_plugin(self.placeholder, 'FormPlugin', 'en', name='form')
+        data = {}
+
+        for index in range(field_count):
+            for plugin_type in ('SelectField', 'RadioSelectField', 'MultipleSelectField'):
+                name = '{}_{}'.format(plugin_type.lower(), index)
+                field = add_plugin(self.placeholder, plugin_type, 'en', target=form_plugin, name=name, label=name)
+                field.option_set.create(value='one')
+                option = field.option_set.create(value='two', default_value=True)
+                data[name] = [option.pk] if plugin_type == 'MultipleSelectField' else option.pk
+        return form_plugin, data
+
+    def process_form(self, form_plugin, data):
+        request = RequestFactory().post('/', data)
+        instance = get_plugin_tree(FormPlugin, pk=form_plugin.pk)
+        plugin = instance.get_plugin_class_instance()
+        form_class = plugin.get_form_class(instance)
+        form = form_class(**plugin.get_form_kwargs(instance, request))
+        self.assertTrue(form.is_valid(), form.errors)
+        # render all choices
+        form.as_p()
+        return form
+
+    def test_options_are_loaded_in_a_single_query(self):
+        small_form, small_data = self.create_form(field_count=1)
+        big_form, big_data = self.create_form(field_count=5)
+
+        # root plugin, descendants, one query per plugin type and options
+        with self.assertNumQueries(6):
+            self.process_form(small_form, small_data)
+
+        with self.assertNumQueries(6):
+            self.process_form(big_form, big_data)
+
+    def test_cleaned_data_contains_options(self):
+        form_plugin, data = self.create_form(field_count=1)
+
+        form = self.process_form(form_plugin, data)
+
+        self.assertEqual(form.cleaned_data['selectfield_0'].value, 'two')
+        self.assertEqual(form.cleaned_data['radioselectfield_0'].value, 'two')
+        self.assertEqual([option.value for option in form.cleaned_data['multipleselectfield_0']], ['two'])
+        self.assertEqual(
+            dict(form.get_serialized_field_choices()),
+            {'selectfield_0': 'two', 'radioselectfield_0': 'two', 'multipleselectfield_0': 'two'},
+        )
+
+    def test_invalid_option_is_rejected(self):
+        form_plugin, data = self.create_form(field_count=1)
+        other_form, other_data = self.create_form(field_count=1)
+        data['selectfield_0'] = other_data['selectfield_0']
+
+        request = RequestFactory().post('/', data)
+        instance = get_plugin_tree(FormPlugin, pk=form_plugin.pk)
+        plugin = instance.get_plugin_class_instance()
+        form = plugin.get_form_class(instance)(**plugin.get_form_kwargs(instance, request))
+
+        self.assertFalse(form.is_valid())
+        self.assertIn('selectfield_0', form.errors)
+
+
+class EmailNotificationFormPluginTestCase(BaseCMSTestCase, TransactionTestCase):
     def setUp(self):
         super(EmailNotificationFormPluginTestCase, self).setUp()
 
@@ -0,0 +1,220 @@
+from datetime import timedelta
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.management import call_command
+from django.core.urlresolvers import reverse
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import override_settings
+from django.utils import timezone
+from django.utils.six import StringIO
+
+from aldryn_forms.admin.exporter import Exporter
+from aldryn_forms.admin.forms import FormExportStep1Form
+from aldryn_forms.exports import claim_export_job, get_export_storage, process_export_jobs
+from aldryn_forms.models import ExportJob, FormSubmission
+
+from .test_exporter import ExporterTestMixin
+
+
+class FailingStorage(FileSystemStorage):
+
+    def _save(self, name, content):
+        raise IOError('No space left on device')
+
+
+class ExportJobTestMixin(ExporterTestMixin):
+
+    def setUp(self):
+        super(ExportJobTestMixin, self).setUp()
+        self.export_root = tempfile.mkdtemp()
+        export_settings = self.settings(ALDRYN_FORMS_EXPORT_ROOT=self.export_root)
+        export_settings.enable()
+        self.addCleanup(export_settings.disable)
+        self.addCleanup(shutil.rmtree, self.export_root)
+
+    def create_job(self, file_type='csv', **kwargs):
+        job = ExportJob(
+            form_name='contact',
+            language='en',
+            file_type=file_type,
+            filename='export.{}'.format(file_type),
+            **kwargs
+        )
+        job.set_fields(['Name-textfield:1', 'Email-emailfield:1'])
+        job.save()
+        return job
+
+
+class ExportJobTestCase(ExportJobTestMixin, TestCase):
+
+    def test_process_export_jobs(self):
+        self.create_submissions(3)
+        self.create_submissions(2, name='newsletter')
+        job = self.create_job()
+
+        stdout = StringIO()
+        call_command('process_form_exports', stdout=stdout)
+        job.refresh_from_db()
+
+        self.assertEqual(stdout.getvalue().strip(), 'Processed 1 exports, 0 failed.')
+        self.assertEqual(job.status, ExportJob.STATUS_DONE)
+        self.assertEqual((job.processed, job.total, job.progress), (3, 3, 100))
+        self.assertIsNotNone(job.finished_at)
+
+        with get_export_storage().open(job.result.name, 'rb') as export_file:
+            lines = export_file.read().decode('utf-8').splitlines()
+        self.assertEqual(lines[0], 'Name,Email')
+        self.assertEqual(len(lines), 4)
+
+    def test_xlsx_export_job(self):
+        self.create_submissions(2)
+        job = self.create_job(file_type='xlsx')
+
+        self.assertEqual(process_export_jobs(), (1, 0))
+        job.refresh_from_db()
+        self.assertTrue(job.result.name.endswith('.xlsx'))
+
+    def test_failed_export_job(self):
+        job = self.create_job()
+        ExportJob.objects.filter(pk=job.pk).update(fields='invalid')
+
+        self.assertEqual(process_export_jobs(), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual(job.status, ExportJob.STATUS_FAILED)
+        self.assertTrue(job.error)
+
+    def test_progress_is_kept_when_the_job_fails(self):
+        self.create_submissions(3)
+        job = self.create_job()
+
+        with self.settings(ALDRYN_FORMS_EXPORT_STORAGE='tests.test_export_jobs.FailingStorage'):
+            self.assertEqual(process_export_jobs(), (0, 1))
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ExportJob.STATUS_FAILED)
+        self.assertEqual(job.processed, 3)
+
+    def test_storage_must_be_configured(self):
+        with self.settings(ALDRYN_FORMS_EXPORT_ROOT=None):
+            with self.assertRaises(ImproperlyConfigured):
+                call_command('process_form_exports', stdout=StringIO())
+
+    def test_jobs_are_processed_once(self):
+        self.create_job()
+        self.create_job()
+
+        self.assertEqual(process_export_jobs(max_jobs=1), (1, 0))
+        self.assertEqual(process_export_jobs(), (1, 0))
+        self.assertEqual(process_export_jobs(), (0, 0))
+
+    def test_progress_is_reported_per_chunk(self):
+        self.create_submissions(5)
+        progress = []
+        exporter = Exporter(queryset=FormSubmission.objects.all(), progress_callback=progress.append)
+        exporter.chunk_size = 2
+
+        list(exporter.iter_rows(fields=['Name-textfield:1']))
+
+        self.assertEqual(progress, [2, 4])
+
+    def test_result_is_deleted_with_the_job(self):
+        job = self.create_job()
+        process_export_jobs()
+        job.refresh_from_db()
+        name = job.result.name
+
+        job.delete()
+
+        self.assertFalse(get_export_storage().exists(name))
+
+    def test_result_is_stored_privately(self):
+        job = self.create_job()
+        process_export_jobs()
+        job.refresh_from_db()
+
+        self.assertNotIn('export', job.result.name.split('/')[-1])
+        self.assertTrue(get_export_storage().exists(job.result.name))
+        self.assertFalse(default_storage.exists(job.result.name))
+
+    def test_expired_lease_is_reclaimed(self):
+        job = self.create_job()
+        self.assertEqual(claim_export_job(), job)
+        self.assertIsNone(claim_export_job())
+
+        ExportJob.objects.filter(pk=job.pk).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(process_export_jobs(), (1, 0))
+        job.refresh_from_db()
+
+        self.assertEqual(job.status, ExportJob.STATUS_DONE)
+        self.assertEqual(job.attempts, 2)
+
+    @override_settings(ALDRYN_FORMS_EXPORT_JOB_MAX_ATTEMPTS=1)
+    def test_job_fails_after_max_attempts(self):
+        job = self.create_job()
+        claim_export_job()
+        ExportJob.objects.filter(pk=job.pk).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(process_export_jobs(), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual(job.status, ExportJob.STATUS_FAILED)
+
+
+class ExportJobAdminTestCase(ExportJobTestMixin, TransactionTestCase):
+    prefix = 'form_export_wizard_view'
+
+    def setUp(self):
+        super(ExportJobAdminTestCase, self).setUp()
+        get_user_model().objects.create_superuser('admin', 'admin@example.com', 'admin')
+        self.client.login(username='admin', password='admin')
+
+    def test_background_option_requires_setting(self):
+        self.assertNotIn('background', FormExportStep1Form().fields)
+
+        with self.settings(ALDRYN_FORMS_EXPORT_JOBS=True):
+            self.assertIn('background', FormExportStep1Form().fields)
+
+    @override_settings(ALDRYN_FORMS_EXPORT_JOBS=True)
+    def test_wizard_queues_export_job(self):
+        self.create_submissions(2)
+        url = reverse('admin:aldryn_forms_formsubmission_export')
+
+        self.client.post(url, {
+            self.prefix + '-current_step': '0',
+            '0-form_name': 'contact',
+            '0-language': 'en',
+            '0-file_type': 'csv',
+            '0-background': 'on',
+        })
+        response = self.client.post(url, {
+            self.prefix + '-current_step': '1',
+            '1-current_fields': ['Name-textfield:1'],
+        })
+
+        job = ExportJob.objects.get()
+        self.assertRedirects(response, reverse('admin:aldryn_forms_exportjob_change', args=[job.pk]))
+        self.assertEqual(job.status, ExportJob.STATUS_PENDING)
+        self.assertEqual(job.get_fields(), ['Name-textfield:1'])
+        self.assertEqual(job.created_by.username, 'admin')
+
+    def test_download(self):
+        self.create_submissions(1)
+        job = self.create_job()
+        url = reverse('admin:aldryn_forms_exportjob_download', args=[job.pk])
+
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+        process_export_jobs()
+        response = self.client.get(url)
+
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn('export.csv', response['Content-Disposition'])
+        self.assertEqual(b''.join(response.streaming_content).decode('utf-8').splitlines()[0], 'Name,Email')
+
+        changelist = self.client.get(reverse('admin:aldryn_forms_exportjob_changelist'))
+        self.assertContains(changelist, url)
+        change_view = self.client.get(reverse('admin:aldryn_forms_exportjob_change', args=[job.pk]))
+        self.assertContains(change_view, '100% (1 / 1)')
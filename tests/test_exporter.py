@@ -0,0 +1,470 @@
+import io
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from importlib import import_module
+from io import BytesIO
+from unittest import skipUnless
+
+from django.apps import apps
+from django.core.management import call_command
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import override_settings
+from django.utils import timezone
+from django.utils.six import StringIO
+from openpyxl import load_workbook
+
+from aldryn_forms.admin.exporter import Exporter, IncrementalExporter, ParallelExporter
+from aldryn_forms.export_workers import assemble_row, get_field_ids
+from aldryn_forms.admin.forms import form_choices
+from aldryn_forms.models import ExportCursor, FormSubmission, SubmittedField
+
+
+class ExporterTestMixin(object):
+
+    def create_submissions(self, count, name='contact'):
+        for index in range(count):
+            data = [
+                {'name': 'textfield_1', 'label': 'Name', 'field_occurrence': 1, 'value': u'N\xe4me {}'.format(index)},
+                {'name': 'emailfield_1', 'label': 'Email', 'field_occurrence': 1, 'value': 'user{}@example.com'.format(index)},
+            ]
+            FormSubmission.objects.create(name=name, language='en', data=json.dumps(data))
+
+
+class ExporterTestCase(ExporterTestMixin, TestCase):
+
+    def get_exporter(self, chunk_size):
+        exporter = Exporter(queryset=FormSubmission.objects.filter(name='contact'))
+        exporter.chunk_size = chunk_size
+        exporter.csv_rows_per_chunk = 2
+        return exporter
+
+    def test_iter_submissions_in_chunks(self):
+        self.create_submissions(5)
+        self.create_submissions(2, name='other')
+        exporter = self.get_exporter(chunk_size=2)
+        expected = list(FormSubmission.objects.filter(name='contact').order_by('-pk').values_list('pk', flat=True))
+
+        # three chunks, the last one is shorter than the chunk size
+        with self.assertNumQueries(3):
+            self.assertEqual([submission.pk for submission in exporter.iter_submissions()], expected)
+
+    def test_iter_csv(self):
+        self.create_submissions(3)
+        exporter = self.get_exporter(chunk_size=2)
+
+        chunks = list(exporter.iter_csv(fields=['Email-emailfield:1', 'Name-textfield:1']))
+
+        # headers, two rows, the remaining row
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(''.join(chunks), (
+            u'Email,Name\r\n'
+            u'user2@example.com,N\xe4me 2\r\n'
+            u'user1@example.com,N\xe4me 1\r\n'
+            u'user0@example.com,N\xe4me 0\r\n'
+        ))
+
+    def test_get_dataset(self):
+        self.create_submissions(3)
+        exporter = self.get_exporter(chunk_size=2)
+
+        dataset = exporter.get_dataset(fields=['Name-textfield:1', 'Unknown-textfield:1'])
+
+        self.assertEqual(dataset.headers, ['Name', 'Unknown'])
+        self.assertEqual(list(dataset), [(u'N\xe4me 2', ''), (u'N\xe4me 1', ''), (u'N\xe4me 0', '')])
+
+    def test_get_row(self):
+        exporter = self.get_exporter(chunk_size=2)
+        submission = FormSubmission(data=json.dumps([
+            {'name': 'textfield_1', 'label': 'Name', 'field_occurrence': 1, 'value': 'first'},
+            {'name': 'textfield_2', 'label': 'Name', 'field_occurrence': 1, 'value': 'second'},
+            {'name': 'textfield_3', 'label': '', 'field_occurrence': 1, 'value': 'no label'},
+        ]))
+        columns = exporter.get_columns(['textfield_3:1', 'Unknown-textfield:1', 'Name-textfield:2', 'Name-textfield:1'])
+
+        self.assertEqual(exporter.get_row(submission, columns), ['no label', '', 'second', 'first'])
+
+    def test_write_xlsx_splits_sheets(self):
+        self.create_submissions(5)
+        exporter = self.get_exporter(chunk_size=2)
+        exporter.xlsx_max_rows = 3
+        fileobj = BytesIO()
+
+        exporter.write_xlsx(fields=['Name-textfield:1'], fileobj=fileobj)
+
+        workbook = load_workbook(fileobj)
+        self.assertEqual(workbook.sheetnames, ['Submissions', 'Submissions 2', 'Submissions 3'])
+        rows = [[[cell.value for cell in row] for row in sheet.rows] for sheet in workbook.worksheets]
+        self.assertEqual(rows, [
+            [['Name'], [u'N\xe4me 4'], [u'N\xe4me 3']],
+            [['Name'], [u'N\xe4me 2'], [u'N\xe4me 1']],
+            [['Name'], [u'N\xe4me 0']],
+        ])
+
+    def test_write_xlsx_without_rows(self):
+        exporter = self.get_exporter(chunk_size=2)
+        fileobj = BytesIO()
+
+        exporter.write_xlsx(fields=['Name-textfield:1'], fileobj=fileobj)
+
+        workbook = load_workbook(fileobj)
+        self.assertEqual([[cell.value for cell in row] for row in workbook.active.rows], [['Name']])
+
+
+class ParallelExporterTestCase(ExporterTestMixin, TestCase):
+    fields = ['Email-emailfield:1', 'Name-textfield:1', 'Name-textfield:2', 'hidden_1:1', 'Missing-textfield:1']
+
+    def setUp(self):
+        super(ParallelExporterTestCase, self).setUp()
+        self.create_submissions(5)
+        data = [
+            {'name': 'textfield_1', 'label': 'Name', 'field_occurrence': 1, 'value': 'first'},
+            {'name': 'textfield_2', 'label': 'Name', 'field_occurrence': 1, 'value': 'second'},
+            {'name': 'hidden_1', 'label': '', 'field_occurrence': 1, 'value': 'hidden'},
+        ]
+        FormSubmission.objects.create(name='contact', language='en', data=json.dumps(data))
+        self.expected = list(self.get_exporter(Exporter).iter_rows(self.fields))
+
+    def get_exporter(self, exporter_class, **kwargs):
+        exporter = exporter_class(queryset=FormSubmission.objects.filter(name='contact'), **kwargs)
+        exporter.chunk_size = 2
+        return exporter
+
+    def test_field_ids_match_form_data(self):
+        submission = FormSubmission.objects.latest('pk')
+        form_data = submission.get_raw_form_data()
+
+        self.assertEqual(get_field_ids(form_data), [field.field_id for field in submission.get_form_data()])
+        self.assertEqual(
+            assemble_row(submission.data, self.get_exporter(Exporter).get_columns(self.fields)),
+            ['', 'first', 'second', 'hidden', ''],
+        )
+
+    def test_serial_rows(self):
+        progress = []
+        exporter = self.get_exporter(ParallelExporter, workers=1, progress_callback=progress.append)
+
+        self.assertEqual(list(exporter.iter_rows(self.fields)), self.expected)
+        self.assertEqual(progress, [2, 4, 6])
+
+    def test_parallel_rows_keep_their_order(self):
+        exporter = self.get_exporter(ParallelExporter, workers=2)
+        exporter.chunk_size = 1
+
+        self.assertEqual(list(exporter.iter_rows(self.fields)), self.expected)
+
+    def test_csv(self):
+        exporter = self.get_exporter(ParallelExporter, workers=2)
+
+        self.assertEqual(
+            ''.join(exporter.iter_csv(self.fields)),
+            ''.join(self.get_exporter(Exporter).iter_csv(self.fields)),
+        )
+
+
+@override_settings(ALDRYN_FORMS_INCREMENTAL_EXPORT_DELAY=0)
+class IncrementalExporterTestCase(ExporterTestMixin, TestCase):
+
+    def setUp(self):
+        super(IncrementalExporterTestCase, self).setUp()
+        self.cursor = ExportCursor.objects.create(consumer='bi', form_name='contact', language='en')
+        self.inserted_at = timezone.now() - timedelta(hours=1)
+
+    def create_submissions(self, count, name='contact'):
+        super(IncrementalExporterTestCase, self).create_submissions(count, name=name)
+        # the submissions created last share the same date
+        self.inserted_at += timedelta(minutes=1)
+        FormSubmission.objects.filter(inserted_at__gt=self.inserted_at).update(inserted_at=self.inserted_at)
+
+    def export(self, chunk_size=2):
+        exporter = IncrementalExporter(cursor=self.cursor)
+        exporter.chunk_size = chunk_size
+        rows = list(exporter.iter_rows(fields=['Name-textfield:1']))
+        exporter.save_cursor()
+        return [row[0] for row in rows]
+
+    def test_only_new_submissions_are_exported(self):
+        self.create_submissions(3)
+        self.create_submissions(1, name='newsletter')
+
+        self.assertEqual(self.export(), [u'N\xe4me 0', u'N\xe4me 1', u'N\xe4me 2'])
+        self.assertEqual(self.export(), [])
+
+        self.create_submissions(2)
+
+        self.assertEqual(self.export(), [u'N\xe4me 0', u'N\xe4me 1'])
+        self.cursor.refresh_from_db()
+        self.assertEqual(self.cursor.last_id, FormSubmission.objects.filter(name='contact').latest('pk').pk)
+
+    def test_chunks_are_read_after_the_cursor(self):
+        self.create_submissions(5)
+        self.export(chunk_size=5)
+        self.create_submissions(4)
+
+        # two full chunks and an empty one, the new submissions share the same date
+        with self.assertNumQueries(3):
+            exporter = IncrementalExporter(cursor=self.cursor)
+            exporter.chunk_size = 2
+            self.assertEqual(len(list(exporter.iter_submissions())), 4)
+
+    def test_recent_submissions_are_delayed(self):
+        self.create_submissions(2)
+        FormSubmission.objects.update(inserted_at=timezone.now())
+
+        with self.settings(ALDRYN_FORMS_INCREMENTAL_EXPORT_DELAY=60):
+            self.assertEqual(self.export(), [])
+
+    def test_inserted_at_migration(self):
+        self.create_submissions(2)
+        FormSubmission.objects.update(inserted_at=timezone.now())
+
+        migration = import_module('aldryn_forms.migrations.0019_exportcursor')
+        migration.set_inserted_at(apps, SchemaEditorStub())
+
+        for submission in FormSubmission.objects.all():
+            self.assertEqual(submission.inserted_at, submission.sent_at)
+
+    def test_export_form_submissions_command(self):
+        self.create_submissions(2)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        output = os.path.join(directory, 'export.csv')
+        stdout = StringIO()
+        args = ['--consumer=bi', '--form=contact', '--language=en', '--output=' + output]
+
+        call_command('export_form_submissions', *args, stdout=stdout)
+
+        self.assertEqual(stdout.getvalue().strip(), 'Exported 2 submissions.')
+
+        with io.open(output, encoding='utf-8') as export_file:
+            self.assertEqual(export_file.read().splitlines(), [
+                'Name,Email',
+                u'N\xe4me 0,user0@example.com',
+                u'N\xe4me 1,user1@example.com',
+            ])
+
+        call_command('export_form_submissions', *args, stdout=stdout)
+        self.assertIn('Exported 0 submissions.', stdout.getvalue())
+
+        call_command('export_form_submissions', '--reset', '--fields=Email-emailfield:1', *args, stdout=stdout)
+
+        with io.open(output, encoding='utf-8') as export_file:
+            self.assertEqual(export_file.read().splitlines()[0], 'Email')
+        self.assertIn('Exported 2 submissions.', stdout.getvalue().splitlines()[-1])
+
+
+class SchemaEditorStub(object):
+    connection = connection
+
+
+class FieldsForExportTestCase(TestCase):
+
+    def create_submission(self, labels, language='en'):
+        data = [
+            {'name': 'textfield_{}'.format(index), 'label': label, 'field_occurrence': 1, 'value': 'value'}
+            for index, label in enumerate(labels, start=1)
+        ]
+        return FormSubmission.objects.create(name='contact', language=language, data=json.dumps(data))
+
+    def get_fields_for_export(self):
+        exporter = Exporter(queryset=FormSubmission.objects.filter(name='contact', language='en'))
+        current_fields, old_fields = exporter.get_fields_for_export()
+        return [field.field_id for field in current_fields], [field.field_id for field in old_fields]
+
+    @override_settings(ALDRYN_FORMS_FIELD_REGISTRY_RESOLUTION=0)
+    def create_submissions(self):
+        # the registry keeps the exact time fields were last seen
+        self.create_submission(['Name', 'Phone'])
+        self.create_submission(['Name', 'Phone', 'Fax'])
+        self.create_submission(['Name', 'City'], language='de')
+        self.create_submission(['Name', 'Email', ''])
+
+    def test_submissions_register_fields(self):
+        self.create_submission(['Name', 'Phone'])
+        self.create_submission(['Name', 'Phone', 'Fax'])
+        self.create_submission(['Name', 'City'], language='de')
+        self.create_submission(['Name', 'Email', ''])
+
+        registered = SubmittedField.objects.filter(language='en').order_by('pk')
+        self.assertEqual(
+            [field.field_id for field in registered],
+            ['Name-textfield:1', 'Phone-textfield:1', 'Fax-textfield:1', 'Email-textfield:1'],
+        )
+        # not rewritten by every submission
+        self.assertEqual(registered[0].last_seen_at, FormSubmission.objects.filter(language='en').last().sent_at)
+
+        registered.update(last_seen_at=timezone.now() - timedelta(days=2))
+        submission = self.create_submission(['Name'])
+
+        self.assertEqual(registered.get(field_id='Name-textfield:1').last_seen_at, submission.sent_at)
+        self.assertLess(registered.get(field_id='Phone-textfield:1').last_seen_at, submission.sent_at)
+
+    def test_fields_for_export(self):
+        self.create_submissions()
+
+        # latest submission, oldest submission date, registry
+        with self.assertNumQueries(4):
+            fields = self.get_fields_for_export()
+
+        self.assertEqual(fields, (
+            ['Name-textfield:1', 'Email-textfield:1'],
+            ['Phone-textfield:1', 'Fax-textfield:1'],
+        ))
+
+    def test_fields_for_export_without_registry(self):
+        self.create_submissions()
+        expected = self.get_fields_for_export()
+        SubmittedField.objects.all().delete()
+
+        self.assertEqual(self.get_fields_for_export(), expected)
+
+    def test_build_form_field_registry(self):
+        self.create_submissions()
+        expected = list(SubmittedField.objects.order_by('pk').values_list(
+            'form_name', 'language', 'field_id', 'first_seen_at', 'last_seen_at',
+        ))
+        SubmittedField.objects.filter(field_id='Phone-textfield:1').update(first_seen_at=expected[1][4])
+        SubmittedField.objects.filter(field_id='Name-textfield:1').delete()
+
+        call_command('build_form_field_registry', chunk_size=2, stdout=StringIO())
+
+        self.assertEqual(
+            sorted(SubmittedField.objects.values_list('form_name', 'language', 'field_id', 'first_seen_at', 'last_seen_at')),
+            sorted(expected),
+        )
+
+    def test_registry_migration(self):
+        self.create_submissions()
+        fields = ('form_name', 'language', 'field_id', 'name', 'label', 'field_occurrence', 'first_seen_at', 'last_seen_at')
+        expected = sorted(SubmittedField.objects.values_list(*fields))
+        SubmittedField.objects.all().delete()
+
+        migration = import_module('aldryn_forms.migrations.0013_submittedfield')
+        migration.register_submitted_fields(apps, SchemaEditorStub())
+
+        self.assertEqual(sorted(SubmittedField.objects.values_list(*fields)), expected)
+
+
+class ExportWizardTestCase(ExporterTestMixin, TransactionTestCase):
+    prefix = 'form_export_wizard_view'
+
+    def setUp(self):
+        super(ExportWizardTestCase, self).setUp()
+        self.create_superuser()
+        self.client.login(username='admin', password='admin')
+        self.url = reverse('admin:aldryn_forms_formsubmission_export')
+
+    def create_superuser(self):
+        from django.contrib.auth import get_user_model
+
+        return get_user_model().objects.create_superuser('admin', 'admin@example.com', 'admin')
+
+    def export(self, file_type):
+        self.client.post(self.url, {
+            self.prefix + '-current_step': '0',
+            '0-form_name': 'contact',
+            '0-language': 'en',
+            '0-file_type': file_type,
+        })
+        return self.client.post(self.url, {
+            self.prefix + '-current_step': '1',
+            '1-current_fields': ['Name-textfield:1', 'Email-emailfield:1'],
+        })
+
+    def test_form_choices_are_read_from_counts(self):
+        self.create_submissions(2)
+        FormSubmission.objects.create(name='newsletter', data='[]')
+
+        with self.assertNumQueries(1):
+            choices = list(form_choices(FormSubmission))
+
+        self.assertEqual(choices, [('contact', 'contact'), ('newsletter', 'newsletter')])
+
+    def test_csv_export_is_streamed(self):
+        self.create_submissions(2)
+
+        response = self.export(file_type='csv')
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn('.csv', response['Content-Disposition'])
+        content = b''.join(response.streaming_content).decode('utf-8')
+        self.assertEqual(content.splitlines()[0], 'Name,Email')
+        self.assertEqual(len(content.splitlines()), 3)
+
+    def test_xlsx_export(self):
+        self.create_submissions(2)
+
+        response = self.export(file_type='xlsx')
+
+        self.assertTrue(response.streaming)
+        self.assertIn('.xlsx', response['Content-Disposition'])
+        workbook = load_workbook(BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(len(list(workbook.active.rows)), 3)
+
+    def test_xls_export(self):
+        self.create_submissions(2)
+
+        response = self.export(file_type='xls')
+
+        self.assertFalse(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/vnd.ms-excel')
+        self.assertIn('.xls', response['Content-Disposition'])
+
+
+@skipUnless(os.environ.get('ALDRYN_FORMS_BENCHMARK'), 'Set ALDRYN_FORMS_BENCHMARK=1 to run benchmarks')
+class ExporterBenchmarkTestCase(TestCase):
+    field_count = 50
+
+    def setUp(self):
+        super(ExporterBenchmarkTestCase, self).setUp()
+        data = [
+            {'name': 'textfield_{}'.format(index), 'label': 'Field {}'.format(index), 'field_occurrence': 1, 'value': 'value'}
+            for index in range(self.field_count)
+        ]
+        self.data = json.dumps(data)
+        self.fields = ['Field {}-textfield:1'.format(index) for index in range(self.field_count)]
+
+    def time_rows(self, count):
+        exporter = Exporter(queryset=FormSubmission.objects.none())
+        columns = exporter.get_columns(self.fields)
+        submissions = [FormSubmission(data=self.data) for index in range(count)]
+        start = time.time()
+
+        for submission in submissions:
+            exporter.get_row(submission, columns)
+        return time.time() - start
+
+    def time_parallel_export(self, workers):
+        exporter = ParallelExporter(queryset=FormSubmission.objects.all(), workers=workers)
+        start = time.time()
+
+        for row in exporter.iter_rows(self.fields):
+            pass
+        return time.time() - start
+
+    def test_parallel_export_scales_with_workers(self):
+        workers = min(4, multiprocessing.cpu_count())
+
+        if workers < 2:
+            self.skipTest('A single cpu is available')
+
+        FormSubmission.objects.bulk_create(FormSubmission(data=self.data) for index in range(100000))
+
+        serial = self.time_parallel_export(workers=1)
+        parallel = self.time_parallel_export(workers=workers)
+
+        self.assertLess(parallel, serial)
+
+    def test_rows_scale_linearly(self):
+        small = self.time_rows(10000)
+        large = self.time_rows(100000)
+
+        # ten times the rows shouldn't take much more than ten times as long
+        self.assertLess(large, small * 10 * 1.5)
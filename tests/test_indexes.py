@@ -0,0 +1,95 @@
+from datetime import timedelta
+from unittest import skipUnless
+
+from django.db import connection
+from django.db.models import Q
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from aldryn_forms.models import FormSubmission, FormSubmissionValue
+
+
+SUPPORTED_VENDORS = ('sqlite', 'postgresql')
+
+
+@skipUnless(connection.vendor in SUPPORTED_VENDORS, 'EXPLAIN output is only checked on SQLite and PostgreSQL')
+class FormSubmissionIndexesTestCase(TestCase):
+    """
+    Checks the common FormSubmission queries are answered using
+    the expected index and without sorting the results.
+    """
+
+    def get_index_name(self, columns, model=FormSubmission):
+        table = model._meta.db_table
+
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, table)
+
+        for name, constraint in constraints.items():
+            if constraint['index'] and constraint['columns'] == columns:
+                return name
+        self.fail('No index on {}'.format(', '.join(columns)))
+
+    def explain(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # the test tables are too small for the planner to prefer indexes
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute('EXPLAIN ' + sql, params)
+            else:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return '\n'.join(str(row[-1]) for row in cursor.fetchall())
+
+    def assertUsesIndex(self, queryset, columns):
+        plan = self.explain(queryset)
+        self.assertIn(self.get_index_name(columns), plan)
+
+        if connection.vendor == 'postgresql':
+            self.assertNotIn('Sort', plan)
+        else:
+            self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_export_query(self):
+        now = timezone.now()
+        queryset = FormSubmission.objects.filter(
+            name='contact',
+            language='en',
+            sent_at__gte=now - timedelta(days=7),
+            sent_at__lt=now,
+        )
+
+        self.assertUsesIndex(queryset, ['name', 'language', 'sent_at'])
+
+    def test_changelist_query(self):
+        self.assertUsesIndex(FormSubmission.objects.order_by('-sent_at', '-pk')[:100], ['sent_at', 'id'])
+
+    def test_changelist_keyset_query(self):
+        now = timezone.now()
+        queryset = (
+            FormSubmission
+            .objects
+            .filter(Q(sent_at__lt=now) | Q(sent_at=now, pk__lt=100))
+            .order_by('-sent_at', '-pk')[:100]
+        )
+
+        self.assertUsesIndex(queryset, ['sent_at', 'id'])
+
+    def test_changelist_name_filter_query(self):
+        queryset = FormSubmission.objects.filter(name='contact')[:100]
+
+        self.assertUsesIndex(queryset, ['name', 'sent_at'])
+
+    def test_changelist_name_and_language_filter_query(self):
+        queryset = FormSubmission.objects.filter(name='contact', language='en')[:100]
+
+        self.assertUsesIndex(queryset, ['name', 'language', 'sent_at'])
+
+    @override_settings(ALDRYN_FORMS_JSON_DATA_STORAGE=False)
+    def test_field_value_query(self):
+        queryset = FormSubmission.objects.with_field_value('email', 'visitor@example.com')
+        index_name = self.get_index_name(['name', 'value_prefix'], model=FormSubmissionValue)
+
+        self.assertIn(index_name, self.explain(queryset))
@@ -1,12 +1,22 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals, print_function, division
+import json
 
 from cms.api import add_plugin
 from cms.models import Placeholder
-from django.db import IntegrityError
-from django.test import TestCase
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import override_settings
+from django.utils.six import StringIO
+from filer.models import Folder
 
-from aldryn_forms.models import Option
+from aldryn_forms.cache import form_schema_cache
+from aldryn_forms.models import (
+    FormPlugin, FormSubmission, FormSubmissionCount, FormSubmissionValue, Option, SerializedFormField,
+    _json1_extension,
+)
+from aldryn_forms.utils import get_plugin_tree
 
 
 class OptionTestCase(TestCase):
@@ -89,3 +99,277 @@ class OptionTestCase(TestCase):
         self.assertEquals(option1.position, 960)  # We force a value for it on Option.save
 
         self.assertRaises(IntegrityError, Option.objects.update, position=None)  # See? Not nullable
+
+
+class FormFieldsTestCase(TestCase):
+    def setUp(self):
+        super(FormFieldsTestCase, self).setUp()
+        self.placeholder = Placeholder.objects.create(slot='test')
+        form_plugin = add_plugin(self.placeholder, 'FormPlugin', 'en', name='form')
+        fieldset = add_plugin(self.placeholder, 'Fieldset', 'en', target=form_plugin)
+        self.name_field = add_plugin(self.placeholder, 'TextField', 'en', target=fieldset, label='Name')
+        self.email_field = add_plugin(self.placeholder, 'EmailField', 'en', target=form_plugin, name='email')
+        self.form_plugin = get_plugin_tree(FormPlugin, pk=form_plugin.pk)
+
+    def test_form_fields_are_computed_once(self):
+        fields = self.form_plugin.get_form_fields()
+
+        with self.assertNumQueries(0):
+            self.assertIs(self.form_plugin.get_form_fields(), fields)
+            self.form_plugin.get_form_field_name(self.email_field)
+            list(self.form_plugin.get_form_fields_as_choices())
+
+    def test_form_fields_indexes(self):
+        fields = self.form_plugin.get_form_fields()
+
+        self.assertEqual([field.name for field in fields], ['textfield_1', 'email'])
+        self.assertEqual(fields.get_by_name('email').plugin_instance.pk, self.email_field.pk)
+        self.assertEqual(fields.get_by_pk(self.name_field.pk).name, 'textfield_1')
+        self.assertEqual([field.name for field in fields.get_by_label('Name')], ['textfield_1'])
+        self.assertEqual(fields.get_by_label('unknown'), ())
+        self.assertEqual(self.form_plugin.get_form_field_name(self.name_field), 'textfield_1')
+
+    def test_form_fields_are_immutable(self):
+        fields = self.form_plugin.get_form_fields()
+
+        with self.assertRaises(AttributeError):
+            fields.foo = 'bar'
+
+    def test_form_fields_are_reset_with_form_elements(self):
+        fields = self.form_plugin.get_form_fields()
+
+        self.form_plugin._form_elements = None
+
+        self.assertIsNot(self.form_plugin.get_form_fields(), fields)
+        self.assertEqual(len(self.form_plugin.get_form_fields()), 2)
+
+
+class FormSchemaTestCase(TestCase):
+    def setUp(self):
+        super(FormSchemaTestCase, self).setUp()
+        form_schema_cache.clear()
+        self.placeholder = Placeholder.objects.create(slot='test')
+        self.form = add_plugin(self.placeholder, 'FormPlugin', 'en', name='form')
+        add_plugin(
+            self.placeholder, 'TextField', 'en', target=self.form,
+            name='name', label='Name', required=True, min_value=2, max_value=20,
+        )
+        self.select = add_plugin(self.placeholder, 'SelectField', 'en', target=self.form, name='color')
+        self.option = Option.objects.create(field=self.select, value='red', default_value=True)
+        add_plugin(
+            self.placeholder, 'ImageField', 'en', target=self.form,
+            name='photo', max_width=800, upload_to=Folder.objects.create(name='uploads'),
+        )
+        add_plugin(self.placeholder, 'CaptchaField', 'en', target=self.form, name='captcha')
+
+    def get_form_plugin(self):
+        return get_plugin_tree(FormPlugin, pk=self.form.pk)
+
+    def test_form_schema(self):
+        schema = self.get_form_plugin().get_form_schema()
+
+        self.assertEqual(schema['id'], self.form.pk)
+        self.assertEqual(schema['name'], 'form')
+        self.assertEqual(schema['fields'], [
+            {
+                'name': 'name',
+                'label': 'Name',
+                'type': 'textfield',
+                'required': True,
+                'input_type': 'text',
+                'min_length': 2,
+                'max_length': 20,
+            },
+            {
+                'name': 'color',
+                'label': '',
+                'type': 'selectfield',
+                'required': False,
+                'options': [{'value': self.option.pk, 'label': 'red', 'default': True}],
+            },
+            {
+                'name': 'photo',
+                'label': '',
+                'type': 'imagefield',
+                'required': False,
+                'max_width': 800,
+            },
+        ])
+
+    def test_form_schema_is_cached_per_version(self):
+        schema = self.get_form_plugin().get_form_schema()
+        form_plugin = self.get_form_plugin()
+
+        with self.assertNumQueries(0):
+            self.assertIs(form_plugin.get_form_schema(), schema)
+
+        Option.objects.create(field=self.select, value='blue')
+
+        options = self.get_form_plugin().get_form_schema()['fields'][1]['options']
+        self.assertEqual([option['label'] for option in options], ['red', 'blue'])
+
+
+class FormSubmissionValueTestCase(TestCase):
+
+    def create_submission(self, country, email):
+        data = [
+            {'name': 'country', 'label': 'Country', 'field_occurrence': 1, 'value': country},
+            {'name': 'email', 'label': 'Email', 'field_occurrence': 1, 'value': email},
+        ]
+        return FormSubmission.objects.create(name='contact', data=json.dumps(data))
+
+    def test_values_are_stored_on_save(self):
+        submission = self.create_submission('SK', 'a@example.com')
+
+        self.assertEqual(
+            sorted(submission.values.values_list('field_id', 'name', 'label', 'value')),
+            [('Country-:1', 'country', 'Country', 'SK'), ('Email-:1', 'email', 'Email', 'a@example.com')],
+        )
+
+        submission.data = json.dumps([{'name': 'country', 'label': 'Country', 'field_occurrence': 1, 'value': 'CZ'}])
+        submission.save()
+
+        self.assertEqual(list(submission.values.values_list('value', flat=True)), ['CZ'])
+
+    def test_with_field_value(self):
+        slovak = self.create_submission('SK', 'a@example.com')
+        czech = self.create_submission('CZ', 'B@example.com')
+
+        self.assertEqual(list(FormSubmission.objects.with_field_value('country', 'SK')), [slovak])
+        self.assertEqual(list(FormSubmission.objects.with_field_value('email', 'b@example.com', lookup='iexact')), [czech])
+        self.assertEqual(list(FormSubmission.objects.with_field_value('email', 'SK')), [])
+
+    def test_build_form_submission_values(self):
+        submissions = [self.create_submission('SK', 'a@example.com') for index in range(3)]
+        FormSubmissionValue.objects.filter(submission__in=submissions[1:]).delete()
+
+        call_command('build_form_submission_values', chunk_size=1, stdout=StringIO())
+
+        self.assertEqual(FormSubmission.objects.with_field_value('country', 'SK').count(), 3)
+        self.assertEqual(FormSubmissionValue.objects.count(), 6)
+
+
+class FormSubmissionCountTestCase(TransactionTestCase):
+
+    def get_counts(self):
+        return sorted(FormSubmissionCount.objects.values_list('name', 'language', 'count'))
+
+    def test_counts_are_maintained(self):
+        first = FormSubmission.objects.create(name='contact', language='en', data='[]')
+        FormSubmission.objects.create(name='contact', language='en', data='[]')
+        FormSubmission.objects.create(name='contact', language='de', data='[]')
+        newsletter = FormSubmission.objects.create(name='newsletter', language='en', data='[]')
+        # updates aren't counted
+        first.save()
+
+        self.assertEqual(
+            self.get_counts(),
+            [('contact', 'de', 1), ('contact', 'en', 2), ('newsletter', 'en', 1)],
+        )
+
+        first.delete()
+        newsletter.delete()
+
+        self.assertEqual(self.get_counts(), [('contact', 'de', 1), ('contact', 'en', 1)])
+
+        FormSubmission.objects.filter(name='contact').delete()
+
+        self.assertEqual(self.get_counts(), [])
+
+    def test_counts_are_updated_after_commit(self):
+        with transaction.atomic():
+            FormSubmission.objects.create(name='contact', language='en', data='[]')
+            self.assertEqual(self.get_counts(), [])
+
+        self.assertEqual(self.get_counts(), [('contact', 'en', 1)])
+
+        with self.assertRaises(ValueError):
+            with transaction.atomic():
+                FormSubmission.objects.create(name='contact', language='en', data='[]')
+                raise ValueError
+
+        self.assertEqual(self.get_counts(), [('contact', 'en', 1)])
+
+    def test_get_form_names(self):
+        FormSubmission.objects.create(name='newsletter', language='en', data='[]')
+        FormSubmission.objects.create(name='contact', language='en', data='[]')
+        FormSubmission.objects.create(name='contact', language='de', data='[]')
+
+        self.assertEqual(list(FormSubmissionCount.get_form_names()), [('contact', 2), ('newsletter', 1)])
+
+
+class SerializedForm(object):
+
+    def __init__(self, fields):
+        self.fields = fields
+
+    def get_serialized_fields(self, is_confirmation=False):
+        return self.fields
+
+
+@override_settings(ALDRYN_FORMS_JSON_DATA_STORAGE=True)
+class FormSubmissionJSONDataTestCase(TestCase):
+
+    def create_submission(self, country):
+        submission = FormSubmission(name='contact')
+        submission.set_form_data(SerializedForm([
+            SerializedFormField(name='country', label='Country', field_occurrence=1, value=country),
+            SerializedFormField(name='note', label='', field_occurrence=1, value=''),
+        ]))
+        submission.save()
+        return submission
+
+    def test_data_is_stored_in_both_columns(self):
+        submission = self.create_submission('SK')
+
+        submission = FormSubmission.objects.get(pk=submission.pk)
+        self.assertEqual(submission.data_json, json.loads(submission.data))
+        self.assertEqual(submission.data_json[0]['value'], 'SK')
+
+    def test_form_data_is_read_without_queries(self):
+        self.create_submission('SK')
+
+        with self.settings(ALDRYN_FORMS_JSON_DATA_STORAGE=False):
+            # not synced to the json column
+            self.create_submission('CZ')
+
+        submissions = FormSubmission.objects.only('pk', *FormSubmission.get_form_data_fields()).order_by('pk')
+
+        with self.assertNumQueries(1):
+            form_data = [submission.get_form_data() for submission in submissions]
+
+        self.assertEqual([field.field_id for field in form_data[0]], ['Country-:1', 'note:1'])
+        self.assertEqual([data[0].value for data in form_data], ['SK', 'CZ'])
+
+    def test_with_field_value_queries_json_column(self):
+        slovak = self.create_submission('SK')
+        self.create_submission('CZ')
+        FormSubmissionValue.objects.all().delete()
+
+        queryset = FormSubmission.objects.with_field_value('country', 'SK')
+
+        self.assertIn('json_each', str(queryset.query))
+        self.assertEqual(list(queryset), [slovak])
+        self.assertEqual(FormSubmission.objects.with_field('country').count(), 2)
+        self.assertEqual(FormSubmission.objects.with_field('unknown').count(), 0)
+
+    def test_with_field_value_without_json1_extension(self):
+        slovak = self.create_submission('SK')
+        self.create_submission('CZ')
+        _json1_extension[connection.alias] = False
+        self.addCleanup(_json1_extension.clear)
+
+        queryset = FormSubmission.objects.with_field_value('country', 'SK')
+
+        self.assertNotIn('json_each', str(queryset.query))
+        self.assertEqual(list(queryset), [slovak])
+
+    def test_sync_form_submission_json(self):
+        with self.settings(ALDRYN_FORMS_JSON_DATA_STORAGE=False):
+            submission = self.create_submission('SK')
+
+        self.assertIsNone(FormSubmission.objects.get(pk=submission.pk).data_json)
+
+        call_command('sync_form_submission_json', chunk_size=1, stdout=StringIO())
+
+        self.assertEqual(FormSubmission.objects.with_field_value('country', 'SK').get(), submission)
@@ -0,0 +1,140 @@
+from datetime import timedelta
+from smtplib import SMTPException
+
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.core import mail
+from django.core.mail import EmailMultiAlternatives
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.test import RequestFactory, TransactionTestCase
+from django.test.utils import override_settings
+from django.utils import timezone
+from django.utils.six import StringIO
+
+from cms.api import add_plugin, create_page
+from cms.test_utils.testcases import BaseCMSTestCase
+
+from aldryn_forms.models import FormPlugin, FormSubmission, OutboxMessage
+from aldryn_forms.outbox import send_pending_messages
+from aldryn_forms.utils import get_plugin_tree
+
+
+class FailingEmailBackend(BaseEmailBackend):
+
+    def send_messages(self, email_messages):
+        raise SMTPException('Connection unexpectedly closed')
+
+
+@override_settings(ALDRYN_FORMS_EMAIL_OUTBOX=True)
+class OutboxTestCase(BaseCMSTestCase, TransactionTestCase):
+
+    def setUp(self):
+        super(OutboxTestCase, self).setUp()
+        page = create_page('test page', 'test_page.html', 'en', published=True)
+        placeholder = page.placeholders.get(slot='content')
+        self.form_plugin = add_plugin(placeholder, 'FormPlugin', 'en', name='contact', action_backend='default')
+        self.form_plugin.recipients.add(self.get_superuser())
+        add_plugin(
+            placeholder,
+            'EmailField',
+            'en',
+            target=self.form_plugin,
+            name='email',
+            email_send_notification=True,
+            email_subject='Thank you',
+        )
+
+    def submit_form(self):
+        request = RequestFactory().post('/', {'email': 'visitor@example.com'})
+        request.session = {}
+        request._messages = FallbackStorage(request)
+        instance = get_plugin_tree(FormPlugin, pk=self.form_plugin.pk)
+        form = instance.get_plugin_class_instance().process_form(instance, request)
+        self.assertTrue(form.is_valid(), form.errors)
+        return form
+
+    def test_submission_queues_emails(self):
+        self.submit_form()
+
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(FormSubmission.objects.count(), 1)
+        self.assertEqual(
+            sorted(message.subject for message in OutboxMessage.objects.all()),
+            ['Thank you', '[Form submission] contact'],
+        )
+        self.assertFalse(OutboxMessage.objects.exclude(status=OutboxMessage.STATUS_PENDING).exists())
+
+    def test_email_message_round_trip(self):
+        email = EmailMultiAlternatives(
+            subject='Subject',
+            body='Body',
+            from_email='Site <site@example.com>',
+            to=['to@example.com'],
+            cc=['cc@example.com'],
+            bcc=['bcc@example.com'],
+            reply_to=['reply@example.com'],
+            headers={'X-Form': 'contact'},
+        )
+        email.attach_alternative('<p>Body</p>', 'text/html')
+
+        message = OutboxMessage.from_email_message(email)
+        message.save()
+        restored = OutboxMessage.objects.get(pk=message.pk).get_email_message()
+
+        for attr in ('subject', 'body', 'from_email', 'to', 'cc', 'bcc', 'reply_to', 'extra_headers', 'alternatives'):
+            self.assertEqual(getattr(restored, attr), getattr(email, attr))
+
+    def test_send_pending_messages(self):
+        self.submit_form()
+
+        self.assertEqual(send_pending_messages(), (2, 0))
+
+        self.assertEqual(len(mail.outbox), 2)
+        confirmation = [message for message in mail.outbox if message.subject == 'Thank you'][0]
+        self.assertEqual(confirmation.to, ['visitor@example.com'])
+        self.assertEqual(OutboxMessage.objects.filter(status=OutboxMessage.STATUS_SENT).count(), 2)
+        # sent messages are not sent again
+        self.assertEqual(send_pending_messages(), (0, 0))
+
+    def test_failed_messages_are_retried_with_backoff(self):
+        self.submit_form()
+
+        self.assertEqual(send_pending_messages(connection=FailingEmailBackend(), max_attempts=2), (0, 2))
+
+        message = OutboxMessage.objects.first()
+        self.assertEqual(message.status, OutboxMessage.STATUS_PENDING)
+        self.assertEqual(message.attempts, 1)
+        self.assertEqual(message.last_error, 'Connection unexpectedly closed')
+        self.assertGreater(message.next_attempt_at, timezone.now())
+        # not due yet
+        self.assertEqual(send_pending_messages(), (0, 0))
+
+        OutboxMessage.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(send_pending_messages(connection=FailingEmailBackend(), max_attempts=2), (0, 2))
+        self.assertEqual(OutboxMessage.objects.filter(status=OutboxMessage.STATUS_FAILED).count(), 2)
+
+    def test_send_form_emails_command(self):
+        self.submit_form()
+        stdout = StringIO()
+
+        call_command('send_form_emails', batch_size=1, stdout=stdout)
+
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(stdout.getvalue().strip(), 'Sent 2 emails, 0 failed.')
+
+    @override_settings(ALDRYN_FORMS_EMAIL_OUTBOX=False)
+    def test_emails_are_sent_right_away_when_outbox_is_disabled(self):
+        self.submit_form()
+
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    @override_settings(
+        ALDRYN_FORMS_EMAIL_OUTBOX=False,
+        EMAIL_BACKEND='tests.test_outbox.FailingEmailBackend',
+    )
+    def test_failing_mail_server_does_not_roll_back_the_submission(self):
+        self.submit_form()
+
+        self.assertEqual(FormSubmission.objects.count(), 1)
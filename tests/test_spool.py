@@ -0,0 +1,165 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.core import mail
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import transaction
+from django.test import RequestFactory, TransactionTestCase
+from django.utils import timezone
+from django.utils.six import StringIO
+
+from cms.api import add_plugin, create_page
+from cms.test_utils.testcases import BaseCMSTestCase
+
+from aldryn_forms.admin.exporter import IncrementalExporter
+from aldryn_forms.models import ExportCursor, FormPlugin, FormSubmission, FormSubmissionCount, SubmittedField
+from aldryn_forms.spool import flush_spool, get_spool
+from aldryn_forms.utils import get_plugin_tree
+
+
+class BufferedActionTestCase(BaseCMSTestCase, TransactionTestCase):
+
+    def setUp(self):
+        super(BufferedActionTestCase, self).setUp()
+        spool_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, spool_dir)
+
+        spool_settings = self.settings(
+            ALDRYN_FORMS_SUBMISSION_SPOOL_PATH=os.path.join(spool_dir, 'submissions.sqlite3'),
+            ALDRYN_FORMS_ACTION_BACKENDS={
+                'default': 'aldryn_forms.action_backends.DefaultAction',
+                'buffered': 'aldryn_forms.action_backends.BufferedAction',
+            },
+        )
+        spool_settings.enable()
+        self.addCleanup(spool_settings.disable)
+
+        page = create_page('test page', 'test_page.html', 'en', published=True)
+        placeholder = page.placeholders.get(slot='content')
+        self.form_plugin = add_plugin(
+            placeholder,
+            'FormPlugin',
+            'en',
+            name='contact',
+            action_backend='buffered',
+        )
+        self.form_plugin.recipients.add(self.get_superuser())
+        add_plugin(placeholder, 'EmailField', 'en', target=self.form_plugin, name='email', label='Email')
+
+    def submit_form(self, email='visitor@example.com'):
+        request = RequestFactory().post('/', {'email': email})
+        request.session = {}
+        request._messages = FallbackStorage(request)
+        instance = get_plugin_tree(FormPlugin, pk=self.form_plugin.pk)
+        form = instance.get_plugin_class_instance().process_form(instance, request)
+        self.assertTrue(form.is_valid(), form.errors)
+        return form
+
+    def test_submissions_are_spooled_then_flushed(self):
+        self.submit_form()
+        self.submit_form(email='other@example.com')
+
+        self.assertFalse(FormSubmission.objects.exists())
+        self.assertEqual(get_spool().count(), 2)
+        self.assertEqual(len(mail.outbox), 2)
+
+        self.assertEqual(flush_spool(batch_size=1), 2)
+
+        submissions = FormSubmission.objects.order_by('pk')
+        self.assertEqual(
+            [submission.get_form_data()[0].value for submission in submissions],
+            ['visitor@example.com', 'other@example.com'],
+        )
+        self.assertEqual(len(submissions[0].get_recipients()), 1)
+        self.assertEqual(
+            list(FormSubmission.objects.with_field_value('email', 'other@example.com')),
+            [submissions[1]],
+        )
+        self.assertEqual(list(FormSubmissionCount.get_form_names()), [('contact', 2)])
+        self.assertEqual(list(SubmittedField.objects.values_list('form_name', 'label')), [('contact', 'Email')])
+        self.assertEqual(get_spool().count(), 0)
+
+        stdout = StringIO()
+        call_command('flush_form_submissions', stdout=stdout)
+        self.assertEqual(stdout.getvalue().strip(), 'Stored 0 submissions.')
+
+    def test_stored_submissions_are_skipped(self):
+        self.submit_form()
+        self.submit_form(email='other@example.com')
+        payloads = [payload for spool_id, payload in get_spool().read(10)]
+
+        self.assertEqual(flush_spool(), 2)
+
+        # a flush died after storing the first submission, before removing it
+        get_spool().append(payloads[0])
+
+        self.assertEqual(flush_spool(), 0)
+        self.assertEqual(FormSubmission.objects.count(), 2)
+        self.assertEqual(list(FormSubmissionCount.get_form_names()), [('contact', 2)])
+        self.assertEqual(get_spool().count(), 0)
+
+    def test_submissions_are_spooled_after_commit(self):
+        with transaction.atomic():
+            self.submit_form()
+            self.assertEqual(get_spool().count(), 0)
+
+        self.assertEqual(get_spool().count(), 1)
+
+        with transaction.atomic():
+            self.submit_form(email='other@example.com')
+            transaction.set_rollback(True)
+
+        self.assertEqual(get_spool().count(), 1)
+
+    def test_spool_path_is_required(self):
+        with self.settings(ALDRYN_FORMS_SUBMISSION_SPOOL_PATH=None):
+            with self.assertRaises(ImproperlyConfigured):
+                get_spool()
+
+
+class BulkSaveTestCase(TransactionTestCase):
+
+    def test_bulk_save(self):
+        sent_at = timezone.now() - timedelta(days=2)
+        data = '[{"name": "email", "label": "Email", "field_occurrence": 1, "value": "%s"}]'
+        submissions = [
+            FormSubmission(name='contact', language='en', data=data % email, sent_at=sent_at + timedelta(days=index))
+            for index, email in enumerate(['first@example.com', 'second@example.com'])
+        ]
+
+        FormSubmission.bulk_save(submissions)
+
+        self.assertEqual(
+            list(FormSubmission.objects.order_by('pk').values_list('sent_at', flat=True)),
+            [sent_at, sent_at + timedelta(days=1)],
+        )
+        self.assertEqual(FormSubmission.objects.with_field_value('email', 'second@example.com').get(), submissions[1])
+        self.assertEqual(list(FormSubmissionCount.get_form_names()), [('contact', 2)])
+
+        field = SubmittedField.objects.get()
+        self.assertEqual((field.first_seen_at, field.last_seen_at), (sent_at, sent_at + timedelta(days=1)))
+
+    def test_flushed_submissions_are_exported_incrementally(self):
+        cursor = ExportCursor.objects.create(consumer='bi', form_name='contact', language='en')
+        data = '[{"name": "email", "label": "Email", "field_occurrence": 1, "value": "%s"}]'
+        FormSubmission.objects.create(name='contact', language='en', data=data % 'first@example.com')
+
+        with self.settings(ALDRYN_FORMS_INCREMENTAL_EXPORT_DELAY=0):
+            exporter = IncrementalExporter(cursor=cursor)
+            self.assertEqual(len(list(exporter.iter_submissions())), 1)
+            exporter.save_cursor()
+
+            # flushed after the export, sent before it
+            sent_at = timezone.now() - timedelta(hours=1)
+            FormSubmission.bulk_save([
+                FormSubmission(name='contact', language='en', data=data % 'second@example.com', sent_at=sent_at),
+            ])
+
+            exporter = IncrementalExporter(cursor=cursor)
+            submissions = list(exporter.iter_submissions())
+
+        self.assertEqual([submission.get_form_data()[0].value for submission in submissions], ['second@example.com'])
@@ -1,11 +1,16 @@
 from django.core.exceptions import ImproperlyConfigured
 from django.utils.translation import ugettext_lazy as _
 from django.test import override_settings
+from cms.api import add_plugin
+from cms.models import Placeholder
 from cms.test_utils.testcases import CMSTestCase
 
 from aldryn_forms.action_backends import DefaultAction, EmailAction, NoAction
 from aldryn_forms.action_backends_base import BaseAction
-from aldryn_forms.utils import get_action_backends, action_backend_choices
+from aldryn_forms.models import FormPlugin
+from aldryn_forms.utils import (
+    action_backend_choices, get_action_backend, get_action_backends, get_plugin_tree, reload_action_backends,
+)
 
 
 class FakeValidBackend(BaseAction):
@@ -102,6 +107,35 @@ class GetActionsTestCase(CMSTestCase):
         self.assertRaises(ImproperlyConfigured, get_action_backends)
 
 
+class ActionBackendRegistryTestCase(CMSTestCase):
+
+    def test_instances_are_shared(self):
+        backend = get_action_backend('default')
+
+        self.assertIsInstance(backend, DefaultAction)
+        self.assertIs(get_action_backend('default'), backend)
+
+    def test_registry_is_not_changed_through_copies(self):
+        backends = get_action_backends()
+        backends['default'] = FakeValidBackend
+
+        self.assertEqual(get_action_backends()['default'], DefaultAction)
+
+    def test_reloaded_on_setting_change(self):
+        backends = {'default': 'tests.test_utils.FakeValidBackend'}
+
+        with self.settings(ALDRYN_FORMS_ACTION_BACKENDS=backends):
+            self.assertIsInstance(get_action_backend('default'), FakeValidBackend)
+
+        self.assertIsInstance(get_action_backend('default'), DefaultAction)
+
+    def test_reload_action_backends(self):
+        backend = get_action_backend('default')
+
+        self.assertEqual(reload_action_backends()['default'], DefaultAction)
+        self.assertIsNot(get_action_backend('default'), backend)
+
+
 class ActionChoicesTestCase(CMSTestCase):
     def test_default_backends(self):
         expected = [
@@ -127,3 +161,36 @@ class ActionChoicesTestCase(CMSTestCase):
         choices = action_backend_choices()
 
         self.assertEquals(choices, expected)
+
+
+class GetPluginTreeTestCase(CMSTestCase):
+    def setUp(self):
+        self.placeholder = Placeholder.objects.create(slot='test')
+
+    def create_form(self, depth):
+        form_plugin = add_plugin(self.placeholder, 'FormPlugin', 'en', name='form')
+        parent = form_plugin
+
+        for level in range(depth):
+            parent = add_plugin(self.placeholder, 'Fieldset', 'en', target=parent, legend=str(level))
+        add_plugin(self.placeholder, 'TextField', 'en', target=parent, label='nested')
+        return form_plugin
+
+    def test_nested_fields_are_loaded(self):
+        form_plugin = self.create_form(depth=3)
+
+        tree = get_plugin_tree(FormPlugin, pk=form_plugin.pk)
+
+        labels = [field.label for field in tree.get_form_fields()]
+        self.assertEqual(labels, ['nested'])
+
+    def test_query_count_does_not_depend_on_depth(self):
+        shallow_form = self.create_form(depth=1)
+        deep_form = self.create_form(depth=5)
+
+        # root plugin, descendants and one query per plugin model
+        with self.assertNumQueries(4):
+            get_plugin_tree(FormPlugin, pk=shallow_form.pk)
+
+        with self.assertNumQueries(4):
+            get_plugin_tree(FormPlugin, pk=deep_form.pk)
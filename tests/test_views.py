@@ -1,18 +1,26 @@
+import json
 import sys
 from unittest import skipIf, skipUnless
 
 from django import VERSION as DJANGO_VERSION
+from django.contrib.auth.models import AnonymousUser
+from django.core import mail
 from django.core.urlresolvers import clear_url_caches
+from django.test import RequestFactory, TransactionTestCase
 
 from cms.api import add_plugin, create_page
 from cms.appresolver import clear_app_resolvers
-from cms.test_utils.testcases import CMSTestCase
+from cms.models import Title
+from cms.test_utils.testcases import BaseCMSTestCase
+
+from aldryn_forms.models import FormPlugin, FormSubmission
+from aldryn_forms.views import is_public_form_plugin
 
 
 DJANGO_111 = DJANGO_VERSION[:2] >= (1, 11)
 
 
-class SubmitFormViewTest(CMSTestCase):
+class SubmitFormViewTest(BaseCMSTestCase, TransactionTestCase):
 
     def setUp(self):
         self.APP_MODULE = 'aldryn_forms.cms_apps.FormsApp'
@@ -127,3 +135,109 @@ class SubmitFormViewTest(CMSTestCase):
             'form_plugin_id': public_page_form_plugin.id,
         })
         self.assertRedirects(response, self.redirect_url, fetch_redirect_response=False)  # noqa: E501
+
+    def test_form_without_success_url_is_processed_once(self):
+        self.form_plugin.redirect_type = ''
+        self.form_plugin.url = None
+        self.form_plugin.recipients.add(self.get_superuser())
+        self.form_plugin.save()
+        self.page.publish('en')
+        public_page_form_plugin = self.get_public_form_plugin()
+
+        response = self.client.post(self.page.get_absolute_url('en'), {
+            'form_plugin_id': public_page_form_plugin.id,
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(FormSubmission.objects.count(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def get_public_form_plugin(self):
+        return (
+            self
+            .page
+            .publisher_public
+            .placeholders
+            .first()
+            .cmsplugin_set
+            .get(plugin_type='FormPlugin')
+        )
+
+    def test_json_submission_success(self):
+        public_page_form_plugin = self.get_public_form_plugin()
+
+        response = self.client.post(self.page.get_absolute_url('en') + 'json/', {
+            'form_plugin_id': public_page_form_plugin.id,
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content.decode('utf-8')), {
+            'success': True,
+            'redirect_url': self.redirect_url,
+        })
+        self.assertEqual(
+            FormSubmission.objects.get().form_url,
+            'http://testserver' + self.page.get_absolute_url('en'),
+        )
+
+    def test_json_submission_errors(self):
+        add_plugin(
+            self.placeholder,
+            'TextField',
+            'en',
+            target=self.form_plugin,
+            name='full_name',
+            label='Full name',
+            required=True,
+        )
+        self.page.publish('en')
+        public_page_form_plugin = self.get_public_form_plugin()
+
+        response = self.client.post(self.page.get_absolute_url('en') + 'json/', {
+            'form_plugin_id': public_page_form_plugin.id,
+        })
+
+        self.assertEqual(response.status_code, 400)
+        data = json.loads(response.content.decode('utf-8'))
+        self.assertFalse(data['success'])
+        self.assertEqual(list(data['errors']), ['full_name'])
+        self.assertEqual(FormSubmission.objects.count(), 0)
+
+    def test_json_submission_invalid_form_plugin(self):
+        response = self.client.post(self.page.get_absolute_url('en') + 'json/', {
+            'form_plugin_id': 'x',
+        })
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_form_schema(self):
+        public_page_form_plugin = self.get_public_form_plugin()
+        url = '{}{}/schema/'.format(self.page.get_absolute_url('en'), public_page_form_plugin.id)
+
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(data['id'], public_page_form_plugin.id)
+        self.assertEqual(data['fields'], [])
+
+    def test_form_schema_of_unpublished_form_plugin(self):
+        url = '{}{}/schema/'.format(self.page.get_absolute_url('en'), self.form_plugin.id)
+
+        # the draft version
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+        public_page_form_plugin = self.get_public_form_plugin()
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        self.assertTrue(is_public_form_plugin(request, public_page_form_plugin))
+
+        Title.objects.filter(page=self.page.publisher_public).update(published=False)
+        public_page_form_plugin = FormPlugin.objects.get(pk=public_page_form_plugin.pk)
+
+        self.assertFalse(is_public_form_plugin(request, public_page_form_plugin))
+
+    def test_form_schema_invalid_form_plugin(self):
+        response = self.client.get(self.page.get_absolute_url('en') + '0/schema/')
+
+        self.assertEqual(response.status_code, 404)
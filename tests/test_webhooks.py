@@ -0,0 +1,169 @@
+import json
+import threading
+from unittest import skipIf
+
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.core.management import call_command
+from django.db import transaction
+from django.test import RequestFactory, TransactionTestCase
+from django.test.utils import override_settings
+from django.utils.six import StringIO
+from django.utils.six.moves import BaseHTTPServer, socketserver
+
+from cms.api import add_plugin, create_page
+from cms.test_utils.testcases import BaseCMSTestCase
+
+from aldryn_forms import webhooks
+from aldryn_forms.models import FormPlugin, FormSubmission, WebhookDelivery
+from aldryn_forms.utils import get_plugin_tree
+
+
+class WebhookRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.server.requests.append((self.path, self.headers['Content-Type'], json.loads(body.decode('utf-8'))))
+        self.server.connections.add(self.client_address)
+        self.send_response(self.server.status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class WebhookServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """
+    Records the posted json and responds with the given status.
+    """
+    # keep-alive connections are handled until the test process exits
+    daemon_threads = True
+
+    def __init__(self):
+        BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', 0), WebhookRequestHandler)
+        self.requests = []
+        self.connections = set()
+        self.status = 200
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}/hook/'.format(self.server_port)
+
+
+@skipIf(webhooks.requests is None, 'requests is not installed')
+class WebhookTestCase(BaseCMSTestCase, TransactionTestCase):
+
+    def setUp(self):
+        super(WebhookTestCase, self).setUp()
+        self.server = WebhookServer()
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        webhook_settings = self.settings(
+            ALDRYN_FORMS_WEBHOOK_URLS=[self.server.url],
+            ALDRYN_FORMS_ACTION_BACKENDS={
+                'default': 'aldryn_forms.action_backends.DefaultAction',
+                'webhook': 'aldryn_forms.action_backends.WebhookAction',
+            },
+        )
+        webhook_settings.enable()
+        self.addCleanup(webhook_settings.disable)
+
+        page = create_page('test page', 'test_page.html', 'en', published=True)
+        placeholder = page.placeholders.get(slot='content')
+        self.form_plugin = add_plugin(placeholder, 'FormPlugin', 'en', name='contact', action_backend='webhook')
+        add_plugin(placeholder, 'EmailField', 'en', target=self.form_plugin, name='email', label='Email')
+
+    def submit_form(self, email='visitor@example.com'):
+        request = RequestFactory().post('/', {'email': email})
+        request.session = {}
+        request._messages = FallbackStorage(request)
+        instance = get_plugin_tree(FormPlugin, pk=self.form_plugin.pk)
+        form = instance.get_plugin_class_instance().process_form(instance, request)
+        self.assertTrue(form.is_valid(), form.errors)
+        return form
+
+    def test_submission_is_posted(self):
+        self.submit_form()
+        self.submit_form(email='other@example.com')
+
+        # the request only stores the deliveries
+        self.assertEqual(self.server.requests, [])
+        self.assertEqual(WebhookDelivery.objects.count(), 2)
+        self.assertEqual(webhooks.send_pending_deliveries(), (2, 0))
+
+        self.assertEqual(len(self.server.requests), 2)
+        path, content_type, payload = self.server.requests[0]
+        self.assertEqual(path, '/hook/')
+        self.assertEqual(content_type, 'application/json')
+        self.assertEqual(payload['form_name'], 'contact')
+        self.assertEqual(payload['form_plugin_id'], self.form_plugin.pk)
+        self.assertEqual(
+            [(field['name'], field['value']) for field in payload['fields']],
+            [('email', 'visitor@example.com')],
+        )
+        # the webhook action doesn't store submissions
+        self.assertFalse(FormSubmission.objects.exists())
+        # the connection is kept alive between submissions
+        self.assertEqual(len(self.server.connections), 1)
+        self.assertEqual(
+            set(WebhookDelivery.objects.values_list('status', flat=True)),
+            {WebhookDelivery.STATUS_SENT},
+        )
+
+    def test_failed_posts_are_retried(self):
+        self.server.status = 503
+
+        with self.settings(ALDRYN_FORMS_WEBHOOK_RETRY_DELAY=0):
+            self.submit_form()
+
+            self.assertEqual(webhooks.send_pending_deliveries(max_attempts=2), (0, 1))
+            delivery = WebhookDelivery.objects.get()
+            self.assertEqual((delivery.status, delivery.attempts), (WebhookDelivery.STATUS_PENDING, 1))
+            self.assertIn('503', delivery.last_error)
+
+            self.assertEqual(webhooks.send_pending_deliveries(max_attempts=2), (0, 1))
+            delivery.refresh_from_db()
+            self.assertEqual(delivery.status, WebhookDelivery.STATUS_FAILED)
+
+            WebhookDelivery.objects.update(status=WebhookDelivery.STATUS_PENDING)
+            self.server.status = 200
+            stdout = StringIO()
+            call_command('send_form_webhooks', stdout=stdout)
+
+        self.assertEqual(stdout.getvalue().strip(), 'Posted 1 submissions, 0 failed.')
+        self.assertEqual(WebhookDelivery.objects.get().status, WebhookDelivery.STATUS_SENT)
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(self.server.requests[-1][2]['fields'][0]['value'], 'visitor@example.com')
+
+    def test_deliveries_are_rolled_back_with_the_submission(self):
+        with transaction.atomic():
+            self.submit_form()
+            transaction.set_rollback(True)
+
+        self.assertFalse(WebhookDelivery.objects.exists())
+
+        with transaction.atomic():
+            self.submit_form()
+
+        self.assertEqual(webhooks.send_pending_deliveries(), (1, 0))
+        self.assertEqual(len(self.server.requests), 1)
+
+    @override_settings(ALDRYN_FORMS_WEBHOOK_BATCH_SIZE=2)
+    def test_batched_submissions(self):
+        for index in range(3):
+            self.submit_form(email='visitor{}@example.com'.format(index))
+
+        self.assertEqual(self.server.requests, [])
+        self.assertEqual(webhooks.send_pending_deliveries(), (3, 0))
+
+        batches = [payload for path, content_type, payload in self.server.requests]
+        self.assertEqual([len(batch) for batch in batches], [2, 1])
+        self.assertEqual(
+            [submission['fields'][0]['value'] for batch in batches for submission in batch],
+            ['visitor0@example.com', 'visitor1@example.com', 'visitor2@example.com'],
+        )